@@ -36,17 +36,10 @@ class MockNoOpLogger:
 mock_logger_module = type(sys)("bsky_feed_generator.server.logger")
 mock_logger_module.logger = MockNoOpLogger()
 
-# Ensure the parent modules exist in sys.modules before placing the mock.
-# This helps if tests are run from a context where these haven't been created yet
-# (e.g. if pytest is run directly on the benchmarks directory without the project root in PYTHONPATH explicitly).
-if "bsky_feed_generator" not in sys.modules:
-    # Create a dummy bsky_feed_generator module
-    sys.modules["bsky_feed_generator"] = type(sys)("bsky_feed_generator")
-
-if "bsky_feed_generator.server" not in sys.modules:
-    # Create a dummy bsky_feed_generator.server module
-    sys.modules["bsky_feed_generator.server"] = type(sys)("bsky_feed_generator.server")
-
+# The parent packages are not replaced by empty stand-ins: the ingest and
+# serving benchmarks import the real bsky_feed_generator.server modules, which
+# a stand-in package without __path__ would make unimportable. The import
+# system uses the mock below once it gets to the logger module either way.
 sys.modules["bsky_feed_generator.server.logger"] = mock_logger_module
 # print("benchmarks/conftest.py: Logger mock applied to sys.modules.") # Optional: for debugging
 # --- End Logger Mocking ---
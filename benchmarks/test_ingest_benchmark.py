@@ -0,0 +1,212 @@
+"""End-to-end ingestion benchmark: websocket frames -> decode -> filter -> SQLite.
+
+Replays INGEST_BENCHMARK_FRAME_LOG (a frame log recorded with
+scripts/record_firehose.py, or a FIREHOSE_RECORD_DIR recording) or
+INGEST_BENCHMARK_FRAMES synthetic commits through the real ingest pipeline,
+once per decode mode, as relay frames and as the Jetstream events Jetstream
+would send for them (only those of the collections the callback subscribes
+to), and reports:
+
+- commits/s: frames (or events) submitted until the last post is committed to SQLite
+- p50/p99 latency: from handing a commit to the pipeline until its callback
+  returned (its posts are then queued for the next writer flush); frames are
+  submitted as fast as the pipeline accepts them, so this includes queueing
+- peak RSS of this process (decode workers in process mode are not included)
+
+Each runs with posts handed to the filters as lightweight views and as full
+pydantic models (STREAM_LAZY_RECORDS). test_post_decode compares the two on
+decoding and filtering alone: CPU time per commit, and the memory allocated
+for the ops of a whole batch.
+"""
+
+import json
+import logging
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pytest
+from atproto import models
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# never benchmark against a real database; other settings may come from .env
+os.environ["DATABASE_URI"] = os.path.join(tempfile.mkdtemp(), "ingest_benchmark.db")
+for name, value in {
+    "HANDLE": "benchmark.bsky.social",
+    "PASSWORD": "benchmark",
+    "HOSTNAME": "localhost",
+    "RECORD_NAME": "benchmark",
+    "DISPLAY_NAME": "Benchmark",
+    "CUSTOM_FILTER_FUNCTION": "example_custom_filters.spongebob_filter",
+}.items():
+    os.environ.setdefault(name, value)
+
+from bsky_feed_generator.server import data_stream  # noqa: E402
+from bsky_feed_generator.server.config import settings  # noqa: E402
+from bsky_feed_generator.server.data_filter import (  # noqa: E402
+    matching_feeds_batch,
+    operations_callback,
+)
+from bsky_feed_generator.server.database import Post  # noqa: E402
+from bsky_feed_generator.server.frame_log import decode_frame, read_recording  # noqa: E402
+from bsky_feed_generator.server.hot_feed import hot_feeds  # noqa: E402
+from bsky_feed_generator.server.jetstream import JetstreamClient  # noqa: E402
+from bsky_feed_generator.server.pipeline import CursorCheckpointer  # noqa: E402
+from bsky_feed_generator.server.relay_simulator import jetstream_events  # noqa: E402
+from bsky_feed_generator.server.synthetic_frames import synthetic_frames  # noqa: E402
+from bsky_feed_generator.server.writer import writer  # noqa: E402
+
+FRAME_LOG = os.environ.get("INGEST_BENCHMARK_FRAME_LOG")
+FRAME_COUNT = int(os.environ.get("INGEST_BENCHMARK_FRAMES", "20000"))
+SERVICE = "ingest-benchmark"
+
+
+@pytest.fixture(scope="module")
+def frames() -> list[bytes]:
+    if FRAME_LOG:
+        return [data for _, data in read_recording(FRAME_LOG)]
+    return [data for _, data in synthetic_frames(FRAME_COUNT)]
+
+
+@pytest.fixture(scope="module")
+def jetstream_messages(frames) -> list[str]:
+    # Jetstream filters by collection server-side
+    wanted = operations_callback.collections
+    return [
+        message
+        for _, message in jetstream_events(enumerate(frames))
+        if json.loads(message)["commit"]["collection"] in wanted
+    ]
+
+
+@pytest.fixture(autouse=True)
+def quiet_logs():
+    # filters log every post at DEBUG; with pytest --log-level=DEBUG that
+    # would dominate the measurement
+    logger = logging.getLogger("bsky_feed_generator")
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    yield
+    logger.setLevel(level)
+
+
+def _peak_rss_mib() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def replay(frames: list, source: str) -> dict:
+    Post.delete().execute()
+    hot_feeds.reset()
+    submitted: dict[int, float] = {}
+    latencies: list[float] = []
+
+    if source == "jetstream":
+        # what the Jetstream client does with each message
+        decode, parse = data_stream._decode_jetstream_event, JetstreamClient()._event
+    else:
+        decode, parse = data_stream._decode_frame, decode_frame
+
+    started = time.perf_counter()
+    with data_stream._ingest(SERVICE, operations_callback, decode=decode) as pipeline:
+        finish = pipeline.tracker.finish
+
+        def timed_finish(seq: int) -> int | None:
+            latencies.append(time.perf_counter() - submitted.pop(seq))
+            return finish(seq)
+
+        pipeline.tracker.finish = timed_finish
+        checkpointer = CursorCheckpointer(
+            pipeline.tracker,
+            lambda watermark: writer.checkpoint(SERVICE, watermark),
+            every_events=settings.CURSOR_CHECKPOINT_EVENTS,
+            every_seconds=settings.CURSOR_CHECKPOINT_INTERVAL,
+        )
+        for data in frames:
+            frame = parse(data)
+            submitted[frame.body["seq"]] = time.perf_counter()
+            pipeline.submit(frame)
+            checkpointer.tick()
+    # leaving _ingest drained the pipeline and the writer's last flush
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "commits": len(frames),
+        "posts_stored": Post.select().count(),
+        "seconds": round(elapsed, 3),
+        "commits_per_second": round(len(frames) / elapsed),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+        "peak_rss_mib": round(_peak_rss_mib(), 1),
+    }
+
+
+def _lazy_records(monkeypatch, records: str) -> None:
+    lazy = records == "view"
+    monkeypatch.setattr(settings, "STREAM_LAZY_RECORDS", lazy)
+    # spawned decode workers load their settings from the environment
+    monkeypatch.setenv("STREAM_LAZY_RECORDS", str(lazy).lower())
+
+
+@pytest.mark.parametrize("records", ["view", "model"])
+@pytest.mark.parametrize("decode_mode", ["thread", "process"])
+@pytest.mark.parametrize("source", ["firehose", "jetstream"])
+def test_ingest_throughput(
+    source, decode_mode, records, frames, jetstream_messages, benchmark, monkeypatch
+):
+    monkeypatch.setattr(settings, "STREAM_DECODE_MODE", decode_mode)
+    _lazy_records(monkeypatch, records)
+    messages = jetstream_messages if source == "jetstream" else frames
+
+    result = benchmark.pedantic(replay, args=(messages, source), rounds=1, iterations=1)
+
+    assert result["commits"] == len(messages)
+    assert result["posts_stored"] > 0 or FRAME_LOG
+    benchmark.extra_info.update(result)
+    print(f"\n{source}, {decode_mode}, {records}: {result}")
+
+
+def decode_and_filter(messages: list) -> list[dict]:
+    """What a thread-mode worker does before the writer: decode and match every commit."""
+    collections = operations_callback.collections
+    all_ops = []
+    for message in messages:
+        if decoded := data_stream._decode_frame(message, collections):
+            ops = decoded[1]
+            matching_feeds_batch(ops[models.ids.AppBskyFeedPost]["created"])
+            all_ops.append(ops)
+    return all_ops
+
+
+@pytest.mark.parametrize("records", ["view", "model"])
+def test_post_decode(records, frames, benchmark, monkeypatch):
+    _lazy_records(monkeypatch, records)
+    messages = [decode_frame(data) for data in frames]
+
+    benchmark.pedantic(decode_and_filter, args=(messages,), rounds=5, iterations=1)
+
+    tracemalloc.start()
+    try:
+        all_ops = decode_and_filter(messages)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {
+        "allocated_peak_mib": round(peak / 2**20, 2),
+        "retained_mib": round(retained / 2**20, 2),
+    }
+    assert all_ops
+    if benchmark.stats:
+        mean = benchmark.stats.stats.mean
+        result["us_per_commit"] = round(mean / len(messages) * 1e6, 2)
+    benchmark.extra_info.update(result)
+    print(f"\n{records}: {result}")
@@ -0,0 +1,208 @@
+"""getFeedSkeleton load benchmark against a local SQLite file.
+
+Seeds one feed partition per size in SERVING_BENCHMARK_ROWS (default
+"10000,100000"; up to 10M works, seeding takes about a minute per million
+rows) and drives the same code path as both web apps (`xrpc`) from
+SERVING_BENCHMARK_CONCURRENCY threads (default "1,8"). Each run makes
+SERVING_BENCHMARK_REQUESTS requests and reports requests/s and latency
+percentiles for three access patterns:
+
+- first_page: everyone refreshing the top of the feed
+- cursor_walk: clients scrolling from the top, stopping after ~5 pages
+- deep_page: pages at cursors spread uniformly over the whole feed
+
+Each runs with the response cache and hot feed as configured ("cached") and
+with both disabled ("sqlite"), which measures the index alone. Set
+SERVING_BENCHMARK_DB to keep the seeded file between runs, e.g. to compare
+index changes; partitions already holding the right row count are reused.
+"""
+
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+SIZES = [
+    int(n) for n in os.environ.get("SERVING_BENCHMARK_ROWS", "10000,100000").split(",")
+]
+CONCURRENCY = [
+    int(n) for n in os.environ.get("SERVING_BENCHMARK_CONCURRENCY", "1,8").split(",")
+]
+REQUESTS = int(os.environ.get("SERVING_BENCHMARK_REQUESTS", "2000"))
+LIMIT = 30
+_FEED_URI = "at://did:plc:benchmark/app.bsky.feed.generator/rows-{}"
+
+# never benchmark against a real database; other settings may come from .env
+os.environ["DATABASE_URI"] = os.environ.get("SERVING_BENCHMARK_DB") or os.path.join(
+    tempfile.mkdtemp(), "serving_benchmark.db"
+)
+os.environ["FEEDS"] = json.dumps([{"uri": _FEED_URI.format(size)} for size in SIZES])
+for name, value in {
+    "HANDLE": "benchmark.bsky.social",
+    "PASSWORD": "benchmark",
+    "HOSTNAME": "localhost",
+    "RECORD_NAME": "benchmark",
+    "DISPLAY_NAME": "Benchmark",
+}.items():
+    os.environ.setdefault(name, value)
+
+from bsky_feed_generator.server import xrpc  # noqa: E402
+from bsky_feed_generator.server.algos.feed import encode_cursor  # noqa: E402
+from bsky_feed_generator.server.database import writer_connection  # noqa: E402
+from bsky_feed_generator.server.hot_feed import hot_feeds  # noqa: E402
+from bsky_feed_generator.server.response_cache import response_cache  # noqa: E402
+
+if _FEED_URI.format(SIZES[0]) not in xrpc.algos:
+    # settings were loaded by another benchmark module of this session
+    pytest.skip(
+        "run the serving benchmark in its own pytest session", allow_module_level=True
+    )
+
+_SEED_CHUNK = 100_000
+
+
+def seed(size: int) -> str:
+    """Fill the partition for `size` with `size` posts; returns its feed key."""
+    feed = f"rows-{size}"
+    conn = writer_connection()
+    try:
+        (count,) = conn.execute(
+            "SELECT COUNT(*) FROM post WHERE feed = ?", (feed,)
+        ).fetchone()
+        if count == size:
+            return feed
+        rng = random.Random(size)
+        indexed_at = datetime(2025, 1, 1)
+        conn.execute("BEGIN")
+        conn.execute("DELETE FROM post WHERE feed = ?", (feed,))
+        for start in range(0, size, _SEED_CHUNK):
+            rows = []
+            for i in range(start, min(start + _SEED_CHUNK, size)):
+                # bursts of posts in the same millisecond exercise the cid tie-break
+                indexed_at += timedelta(milliseconds=rng.choice((0, 1, 5, 50, 500)))
+                rows.append(
+                    (
+                        feed,
+                        f"at://did:plc:{rng.getrandbits(96):024x}/app.bsky.feed.post/{i}",
+                        f"bafyrei{rng.getrandbits(200):052x}",
+                        str(indexed_at),
+                    )
+                )
+            conn.executemany(
+                "INSERT INTO post (feed, uri, cid, indexed_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return feed
+
+
+def _deep_cursors(feed: str, count: int = 1000) -> list[str]:
+    conn = writer_connection()
+    try:
+        rows = conn.execute(
+            "SELECT indexed_at, cid FROM post WHERE feed = ? ORDER BY random() LIMIT ?",
+            (feed, count),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [encode_cursor(datetime.fromisoformat(at), cid) for at, cid in rows]
+
+
+@pytest.fixture(scope="module")
+def feeds() -> dict[int, list[str]]:
+    """Seeded size -> sample of deep-page cursors."""
+    return {size: _deep_cursors(seed(size)) for size in SIZES}
+
+
+def _request(feed_uri: str, cursor: str | None) -> bytes:
+    # what app.py and asgi.py do for getFeedSkeleton
+    body = xrpc.cached_feed_skeleton(feed_uri, cursor, LIMIT)
+    if body is None:
+        body = xrpc.build_feed_skeleton(feed_uri, cursor, LIMIT)
+    return body
+
+
+def _client(
+    feed_uri: str, pattern: str, deep_cursors: list[str], requests: int, seed: int
+):
+    rng = random.Random(seed)
+    latencies = []
+    cursor = None
+    for _ in range(requests):
+        if pattern == "deep_page":
+            cursor = rng.choice(deep_cursors)
+        started = time.perf_counter()
+        body = _request(feed_uri, cursor)
+        latencies.append(time.perf_counter() - started)
+        if pattern == "cursor_walk":
+            # scroll on, or start over at the top after ~5 pages on average
+            next_cursor = json.loads(body)["cursor"]
+            cursor = (
+                next_cursor if rng.random() > 0.2 and next_cursor != "eof" else None
+            )
+    return latencies
+
+
+def load(size: int, pattern: str, concurrency: int, deep_cursors: list[str]) -> dict:
+    feed_uri = _FEED_URI.format(size)
+    _request(feed_uri, None)  # warm the hot feed
+    per_client = REQUESTS // concurrency
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        runs = [
+            pool.submit(_client, feed_uri, pattern, deep_cursors, per_client, seed)
+            for seed in range(concurrency)
+        ]
+        latencies = sorted(latency for run in runs for latency in run.result())
+    elapsed = time.perf_counter() - started
+
+    def percentile(p: float) -> float:
+        return round(
+            latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 3
+        )
+
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+@pytest.mark.parametrize("mode", ["cached", "sqlite"])
+@pytest.mark.parametrize("concurrency", CONCURRENCY)
+@pytest.mark.parametrize("pattern", ["first_page", "cursor_walk", "deep_page"])
+@pytest.mark.parametrize("size", SIZES)
+def test_feed_skeleton_load(
+    size, pattern, concurrency, mode, feeds, benchmark, monkeypatch
+):
+    if mode == "sqlite":
+        monkeypatch.setattr(response_cache, "max_bytes", 0)
+        monkeypatch.setattr(hot_feeds, "size", 0)
+    response_cache.bump()
+    hot_feeds.reset()
+
+    result = benchmark.pedantic(
+        load, args=(size, pattern, concurrency, feeds[size]), rounds=1, iterations=1
+    )
+
+    assert result["requests"] == REQUESTS // concurrency * concurrency
+    benchmark.extra_info.update(result)
+    print(f"\n{size} rows, {pattern}, {concurrency} threads, {mode}: {result}")
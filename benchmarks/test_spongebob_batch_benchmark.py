@@ -0,0 +1,82 @@
+import os
+import random
+import sys
+
+import pytest
+from atproto import models
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from example_custom_filters import spongebob_filter, spongebob_filter_batch  # noqa
+
+from test_spongebob_filter_benchmark import (  # noqa
+    DUMMY_CREATED_AT,
+    dummy_created_post,
+    test_cases,
+)
+
+BATCH_SIZE = 1000
+
+_WORDS = (
+    "the quick brown fox jumps over lazy dog bluesky feed post today really "
+    "Great News about Python https://example.com/some/path #hashtag www.test.org "
+    "héllo wörld 日本語 🦋 🎉"
+).split()
+_SPONGEBOB = ["sPoNgEbOb", "tHiS iS fInE", "wHaTeVeR", "aBcDeFg"]
+
+
+def _corpus(size: int, spongebob_ratio: float = 0.02) -> list:
+    """Firehose-like post texts, roughly `spongebob_ratio` of them alternating case."""
+    rng = random.Random(42)
+    records = []
+    for _ in range(size):
+        words = rng.choices(_WORDS, k=rng.randint(3, 40))
+        if rng.random() < spongebob_ratio:
+            words.insert(rng.randrange(len(words)), rng.choice(_SPONGEBOB))
+        records.append(
+            models.AppBskyFeedPost.Record(
+                text=" ".join(words), created_at=DUMMY_CREATED_AT
+            )
+        )
+    return records
+
+
+RECORDS = _corpus(BATCH_SIZE)
+CREATED_POSTS = [dummy_created_post] * BATCH_SIZE
+
+
+def _scalar(records, created_posts):
+    return [spongebob_filter(r, p) for r, p in zip(records, created_posts)]
+
+
+def test_batch_agrees_with_scalar_on_all_cases():
+    records = [
+        models.AppBskyFeedPost.Record(text=text or "", created_at=DUMMY_CREATED_AT)
+        for text, _ in (case.values for case in test_cases)
+    ]
+    posts = [dummy_created_post] * len(records)
+    assert spongebob_filter_batch(records, posts) == [
+        expected for _, expected in (case.values for case in test_cases)
+    ]
+    assert spongebob_filter_batch(RECORDS, CREATED_POSTS) == _scalar(
+        RECORDS, CREATED_POSTS
+    )
+
+
+@pytest.mark.parametrize(
+    "filter_batch",
+    [
+        pytest.param(_scalar, id="scalar (per post)"),
+        pytest.param(spongebob_filter_batch, id="batch (bytes scan)"),
+    ],
+)
+def test_spongebob_throughput(filter_batch, benchmark):
+    mask = benchmark(filter_batch, RECORDS, CREATED_POSTS)
+
+    assert len(mask) == BATCH_SIZE
+    if benchmark.stats:
+        benchmark.extra_info["posts_per_second"] = round(
+            BATCH_SIZE / benchmark.stats.stats.mean
+        )
@@ -8,7 +8,7 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from example_custom_filters import spongebob_filter  # noqa
+from example_custom_filters import spongebob_filter, spongebob_filter_regex  # noqa
 
 test_cases = [
     pytest.param("sPoNgEbObTeXt", True, id="Simple positive"),
@@ -70,8 +70,15 @@ DUMMY_CREATED_AT = "2023-01-01T00:00:00Z"
 dummy_created_post = {"uri": "dummy_uri", "cid": "dummy_cid", "author": "dummy_author"}
 
 
+@pytest.mark.parametrize(
+    "filter_function",
+    [
+        pytest.param(spongebob_filter, id="loop"),
+        pytest.param(spongebob_filter_regex, id="regex"),
+    ],
+)
 @pytest.mark.parametrize("text_content, expected_result", test_cases)
-def test_spongebob_case(text_content, expected_result, benchmark):
+def test_spongebob_case(text_content, expected_result, filter_function, benchmark):
     # pytest-benchmark will run this multiple times and collect stats
 
     # Prepare the record for the filter
@@ -85,7 +92,7 @@ def test_spongebob_case(text_content, expected_result, benchmark):
 
     # Benchmark the filter function
     # The result of spongebob_filter will be returned by benchmark()
-    actual_result = benchmark(spongebob_filter, current_record, dummy_created_post)
+    actual_result = benchmark(filter_function, current_record, dummy_created_post)
 
     # Assert correctness
     assert actual_result == expected_result, f"Failed for text: '{text_content}'"
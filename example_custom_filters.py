@@ -1,4 +1,6 @@
 import re
+import string
+from bisect import bisect_right
 
 from atproto import models
 
@@ -8,6 +10,25 @@ from atproto import models
 MIN_SPONGEBOB_LEN = 7
 URL_RE = re.compile(r"https?://\S+|www\.\S+|[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}/\S+")
 HASHTAG_RE = re.compile(r"#\w+")
+# MIN_SPONGEBOB_LEN (7) ASCII letters of alternating case: "AaAaAa" followed by an
+# uppercase letter, or preceded by a lowercase one. Starting on an uppercase
+# letter lets the regex engine skip quickly through ordinary text.
+SPONGEBOB_RE = re.compile(r"[A-Z][a-z][A-Z][a-z][A-Z][a-z](?:[A-Z]|(?<=[a-z].{6}))")
+# Byte translation table reducing text to its letter cases: ASCII lowercase -> "a",
+# ASCII uppercase -> "A", anything else -> " ". In the reduced text, a Spongebob
+# span is one of the two _SPONGEBOB_RUNS.
+_CASE_TABLE = bytes(
+    ord("a")
+    if chr(c) in string.ascii_lowercase
+    else ord("A")
+    if chr(c) in string.ascii_uppercase
+    else ord(" ")
+    for c in range(256)
+)
+_SPONGEBOB_RUNS = (
+    ("aA" * MIN_SPONGEBOB_LEN)[:MIN_SPONGEBOB_LEN].encode(),
+    ("Aa" * MIN_SPONGEBOB_LEN)[:MIN_SPONGEBOB_LEN].encode(),
+)
 
 
 def _is_spongebob_word(s: str) -> bool:
@@ -115,6 +136,69 @@ def spongebob_filter(record: models.AppBskyFeedPost.Record, created_post: dict)
     return False
 
 
+def spongebob_filter_regex(
+    record: models.AppBskyFeedPost.Record, created_post: dict
+) -> bool:
+    """
+    Same result as `spongebob_filter`, found with SPONGEBOB_RE instead of a
+    per-character loop. Select it with
+    CUSTOM_FILTER_FUNCTION="example_custom_filters.spongebob_filter_regex".
+
+    A Spongebob word is exactly a SPONGEBOB_RE match (whitespace is never part
+    of one). Removing URLs and hashtags never joins two runs of letters, so a
+    text without a match is rejected by a single search over the original
+    text; URLs and hashtags are only stripped from texts that have one.
+    """
+    text = record.text
+
+    if not text or text[:6].lower() == "macro:":
+        return False
+
+    if not SPONGEBOB_RE.search(text):
+        return False
+
+    return SPONGEBOB_RE.search(HASHTAG_RE.sub("", URL_RE.sub("", text))) is not None
+
+
+def spongebob_filter_batch(
+    records: list[models.AppBskyFeedPost.Record], created_posts: list[dict]
+) -> list[bool]:
+    """
+    Batch version of `spongebob_filter`, returning one result per record.
+
+    All texts are joined, encoded to ASCII (one byte per character, so offsets
+    are kept) and reduced with _CASE_TABLE, so candidates are found by a
+    `bytes.find` over the whole batch instead of a Python loop per character.
+    Every text `spongebob_filter` accepts contains a run, and removing URLs and
+    hashtags never creates one, so only texts with a run need checking, with
+    `spongebob_filter_regex`.
+    """
+    texts = [record.text or "" for record in records]
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text) + 1
+    cases = "\n".join(texts).encode("ascii", "replace").translate(_CASE_TABLE)
+
+    mask = [False] * len(records)
+    pos = 0
+    while True:
+        hits = [hit for run in _SPONGEBOB_RUNS if (hit := cases.find(run, pos)) >= 0]
+        if not hits:
+            break
+        i = bisect_right(starts, min(hits)) - 1
+        mask[i] = spongebob_filter_regex(records[i], created_posts[i])
+        if i + 1 == len(starts):
+            break
+        pos = starts[i + 1]
+    return mask
+
+
+# operations_callback calls `filter_batch` instead, when a filter provides one
+spongebob_filter.filter_batch = spongebob_filter_batch  # type: ignore[attr-defined]
+
+
 # Example of another filter you could add to this file for testing or use:
 # def another_example_filter(record: models.AppBskyFeedPost.Record, created_post: dict) -> bool:
 #     """Includes posts containing the word 'test' only if they are not replies."""
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Record frames from the live firehose into a frame log for offline replay.
+
+usage: record_firehose.py OUTPUT [FRAMES]
+
+OUTPUT is gzip-compressed if its name ends in ".gz". The log can be replayed
+with scripts/replay_firehose.py or benchmarks/test_ingest_benchmark.py
+(INGEST_BENCHMARK_FRAME_LOG=OUTPUT). To record while ingesting, set
+FIREHOSE_RECORD_DIR instead.
+"""
+
+import sys
+
+from atproto import FirehoseSubscribeReposClient, firehose_models
+
+from bsky_feed_generator.server.frame_log import FrameLogWriter, encode_frame
+
+
+def record(path: str, count: int) -> None:
+    client = FirehoseSubscribeReposClient()
+
+    with FrameLogWriter(path) as log:
+
+        def on_message(message: firehose_models.MessageFrame) -> None:
+            if log.frames >= count:
+                client.stop()
+                return
+            log.write(message.body.get("seq", 0), encode_frame(message))
+            if log.frames % 1000 == 0:
+                print(f"{log.frames}/{count} frames")
+
+        client.start(on_message)
+
+    print(f"Recorded {log.frames} frames to {path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    record(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""Replay recorded firehose frames through the feed's filters into the database.
+
+usage: replay_firehose.py PATH [--cursor SEQ] [--service NAME]
+
+PATH is a FIREHOSE_RECORD_DIR recording or a frame log. Frames are processed
+as fast as the pipeline takes them. With --service (e.g. the SERVICE_DID, to
+backfill before going live) the cursor is saved under that name as frames are
+processed, and a later replay or subscription resumes after it.
+"""
+
+import argparse
+import logging
+
+from bsky_feed_generator.server import data_stream
+from bsky_feed_generator.server.data_filter import operations_callback
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="recording directory or frame log")
+    parser.add_argument("--cursor", type=int, help="replay only frames after SEQ")
+    parser.add_argument("--service", help="save the cursor under this service name")
+    args = parser.parse_args()
+    # the per-post INFO log would dominate a replay
+    logging.getLogger("bsky_feed_generator").setLevel(logging.WARNING)
+
+    count = data_stream.replay(
+        args.path, operations_callback, name=args.service, cursor=args.cursor
+    )
+    print(f"Replayed {count} commits from {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,16 @@
+from functools import partial
+
+from bsky_feed_generator.server.config import settings
+from bsky_feed_generator.server.feeds import DEFAULT_FEED
+
 from . import feed
 
-algos = {
-    feed.uri: feed.handler
-}
+if settings.FEEDS:
+    algos = {
+        config.uri: partial(feed.handler, feed=config.key) for config in settings.FEEDS
+    }
+    # feed URI -> storage partition
+    partitions = {config.uri: config.key for config in settings.FEEDS}
+else:
+    algos = {feed.uri: feed.handler}
+    partitions = {feed.uri: DEFAULT_FEED}
@@ -1,42 +1,51 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from bsky_feed_generator.server.config import settings
-from bsky_feed_generator.server.database import Post
+from bsky_feed_generator.server.database import feed_page
+from bsky_feed_generator.server.feeds import DEFAULT_FEED
+from bsky_feed_generator.server.hot_feed import hot_feeds
 
 uri = settings.FEED_URI
 CURSOR_EOF = "eof"
 
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
 
-def handler(cursor: str | None, limit: int) -> dict:
-    if not uri:
-        return {"cursor": CURSOR_EOF, "feed": []}
 
-    posts = (
-        Post.select()
-        .order_by(Post.cid.desc())
-        .order_by(Post.indexed_at.desc())
-        .limit(limit)
-    )
+def encode_cursor(indexed_at: datetime, cid: str) -> str:
+    # integer arithmetic keeps the round trip exact; indexed_at is naive UTC
+    return f"{(indexed_at - _EPOCH) // _MILLISECOND}::{cid}"
 
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    cursor_parts = cursor.split("::")
+    if len(cursor_parts) != 2:
+        raise ValueError("Malformed cursor")
+
+    indexed_at, cid = cursor_parts
+    return _EPOCH + int(indexed_at) * _MILLISECOND, cid
+
+
+def handler(cursor: str | None, limit: int, feed: str | None = None) -> dict:
+    """A page of `feed` (a FEEDS partition), or of the FEED_URI feed by default."""
+    if feed is None:
+        if not uri:
+            return {"cursor": CURSOR_EOF, "feed": []}
+        feed = DEFAULT_FEED
+
+    before = None
     if cursor:
         if cursor == CURSOR_EOF:
             return {"cursor": CURSOR_EOF, "feed": []}
-        cursor_parts = cursor.split("::")
-        if len(cursor_parts) != 2:
-            raise ValueError("Malformed cursor")
-
-        indexed_at, cid = cursor_parts
-        indexed_at = datetime.fromtimestamp(int(indexed_at) / 1000)
-        posts = posts.where(
-            ((Post.indexed_at == indexed_at) & (Post.cid < cid))  # type: ignore
-            | (Post.indexed_at < indexed_at)  # type: ignore
-        )
+        before = decode_cursor(cursor)
 
-    feed = [{"post": post.uri} for post in posts]
+    items = hot_feeds[feed].page(before, limit) if hot_feeds.size else None
+    if items is None:
+        items = feed_page(feed, before, limit)
 
     cursor = CURSOR_EOF
-    last_post = posts[-1] if posts else None
-    if last_post:
-        cursor = f"{int(last_post.indexed_at.timestamp() * 1000)}::{last_post.cid}"
+    if items:
+        indexed_at, cid, _ = items[-1]
+        cursor = encode_cursor(indexed_at, cid)
 
-    return {"cursor": cursor, "feed": feed}
+    return {"cursor": cursor, "feed": [{"post": item_uri} for *_, item_uri in items]}
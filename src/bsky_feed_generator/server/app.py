@@ -1,43 +1,42 @@
 import signal
 import sys
 import threading
-from datetime import datetime, timezone
+import time
+from datetime import timezone
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 
-from bsky_feed_generator.server import data_stream
-from bsky_feed_generator.server.algos import algos
+from bsky_feed_generator.server import data_stream, metrics, xrpc
 from bsky_feed_generator.server.config import settings
 from bsky_feed_generator.server.data_filter import operations_callback
-from bsky_feed_generator.server.database import db
+from bsky_feed_generator.server.response_cache import response_cache
+from bsky_feed_generator.server.retention import retention
+from bsky_feed_generator.server.writer import writer
 
 app = Flask(__name__)
 
 
-@app.before_request
-def before_request():
-    """Ensure fresh database connection for each request"""
-    if db.is_closed():
-        db.connect()
-
-
-@app.teardown_request
-def teardown_request(exception=None):
-    """Close database connection after each request"""
-    if not db.is_closed():
-        db.close()
+stream_stop_event = threading.Event()
+stream_thread: threading.Thread | None = None
+
+
+def start_data_stream() -> None:
+    """Start the firehose consumer thread, unless it is already running."""
+    global stream_thread
+    if stream_thread and stream_thread.is_alive():
+        return
+    stream_thread = threading.Thread(
+        target=data_stream.run,
+        args=(
+            settings.SERVICE_DID,
+            operations_callback,
+            stream_stop_event,
+        ),
+    )
+    stream_thread.start()
 
 
-stream_stop_event = threading.Event()
-stream_thread = threading.Thread(
-    target=data_stream.run,
-    args=(
-        settings.SERVICE_DID,
-        operations_callback,
-        stream_stop_event,
-    ),
-)
-stream_thread.start()
+start_data_stream()
 
 
 def sigint_handler(*_):
@@ -56,45 +55,21 @@ def index():
 
 @app.route("/.well-known/did.json", methods=["GET"])
 def did_json():
-    service_did = settings.SERVICE_DID
-    hostname = settings.HOSTNAME
-    if not service_did or not service_did.endswith(str(hostname)):
+    document = xrpc.did_document()
+    if document is None:
         return "", 404
 
-    return jsonify(
-        {
-            "@context": ["https://www.w3.org/ns/did/v1"],
-            "id": service_did,
-            "service": [
-                {
-                    "id": "#bsky_fg",
-                    "type": "BskyFeedGenerator",
-                    "serviceEndpoint": f"https://{hostname}",
-                }
-            ],
-        }
-    )
+    return jsonify(document)
 
 
 @app.route("/xrpc/app.bsky.feed.describeFeedGenerator", methods=["GET"])
 def describe_feed_generator():
-    feeds = [{"uri": uri} for uri in algos.keys()]
-    response = {
-        "encoding": "application/json",
-        "body": {"did": settings.SERVICE_DID, "feeds": feeds},
-    }
-    return jsonify(response)
+    return jsonify(xrpc.describe_feed_generator())
 
 
 @app.route("/xrpc/app.bsky.feed.getFeedSkeleton", methods=["GET"])
 def get_feed_skeleton():
     feed_param = request.args.get("feed", default=None, type=str)
-    if feed_param is None:
-        return "Feed parameter missing", 400
-
-    algo = algos.get(feed_param)
-    if not algo:
-        return "Unsupported algorithm", 400
 
     # Example of how to check auth if giving user-specific results:
     """
@@ -105,20 +80,31 @@ def get_feed_skeleton():
         return 'Unauthorized', 401
     """
 
-    try:
-        cursor = request.args.get("cursor", default=None, type=str)
-        limit = request.args.get("limit", default=20, type=int)
-        body = algo(cursor, limit)
-    except ValueError:
-        return "Malformed cursor", 400
-
-    body["generation_timestamp_utc"] = datetime.now(timezone.utc).isoformat()
-
-    response = jsonify(body)
+    started = time.perf_counter()
+    cursor = request.args.get("cursor", default=None, type=str)
+    limit = request.args.get("limit", default=xrpc.DEFAULT_LIMIT, type=int)
+    data = xrpc.cached_feed_skeleton(feed_param, cursor, limit)
+    timer = xrpc.SKELETON_HIT
+    if data is None:
+        try:
+            data = xrpc.build_feed_skeleton(feed_param, cursor, limit)
+        except xrpc.XrpcError as e:
+            return e.message, e.status
+        timer = xrpc.SKELETON_MISS
+    timer.observe(time.perf_counter() - started)
+
+    response = Response(data, mimetype="application/json")
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
     return response
 
 
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        return "", 404
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route("/debug/posts", methods=["GET"])
 def debug_posts():
     import sqlite3
@@ -127,12 +113,7 @@ def debug_posts():
     from bsky_feed_generator.server.database import Post
 
     # Get posts via Peewee ORM
-    posts = (
-        Post.select()
-        .order_by(Post.indexed_at.desc())
-        .order_by(Post.cid.desc())
-        .limit(10)
-    )
+    posts = Post.select().order_by(Post.indexed_at.desc(), Post.cid.desc()).limit(10)
 
     orm_results = []
     for p in posts:
@@ -167,5 +148,8 @@ def debug_posts():
             "orm_results": orm_results,
             "sql_results": sql_results,
             "mismatch": orm_results != sql_results,
+            "writer": writer.stats(),
+            "response_cache": response_cache.stats(),
+            "retention": retention.stats(),
         }
     )
@@ -0,0 +1,164 @@
+"""ASGI app serving the feed endpoints with the firehose consumer on the same loop.
+
+Run with any ASGI server, e.g. `uvicorn bsky_feed_generator.server.asgi:app`, or
+set SERVER_MODE=asgi for `bsky_feed_generator`. Cached responses are answered on
+the event loop; cache misses run the feed algorithm in a worker thread.
+"""
+
+import asyncio
+import contextlib
+import json
+import time
+from urllib.parse import parse_qs
+
+from bsky_feed_generator.server import data_stream, metrics, xrpc
+from bsky_feed_generator.server.config import settings
+from bsky_feed_generator.server.data_filter import operations_callback
+from bsky_feed_generator.server.logger import logger
+
+_INDEX = "ATProto Feed Generator powered by The AT Protocol SDK for Python (https://github.com/MarshalX/atproto)."
+_NO_STORE = (b"cache-control", b"no-cache, no-store, must-revalidate")
+
+
+async def _respond(
+    send, status: int, body: bytes, content_type: bytes, *headers
+) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type),
+                (b"content-length", str(len(body)).encode()),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def _headers_only(send):
+    """Wrap `send` to answer a HEAD request: same headers, no body."""
+
+    async def send_headers(message) -> None:
+        if message["type"] == "http.response.body":
+            message = {**message, "body": b""}
+        await send(message)
+
+    return send_headers
+
+
+async def _text(send, status: int, text: str) -> None:
+    await _respond(send, status, text.encode(), b"text/html; charset=utf-8")
+
+
+async def _json(send, status: int, body: bytes, *headers) -> None:
+    await _respond(send, status, body, b"application/json", *headers)
+
+
+def _query_params(scope) -> dict[str, str]:
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return {key: values[0] for key, values in query.items()}
+
+
+def _limit(value: str | None) -> int:
+    try:
+        return int(value) if value is not None else xrpc.DEFAULT_LIMIT
+    except ValueError:
+        return xrpc.DEFAULT_LIMIT
+
+
+async def _index(scope, send) -> None:
+    await _text(send, 200, _INDEX)
+
+
+async def _did_json(scope, send) -> None:
+    document = xrpc.did_document()
+    if document is None:
+        await _text(send, 404, "")
+        return
+    await _json(send, 200, json.dumps(document).encode())
+
+
+async def _describe_feed_generator(scope, send) -> None:
+    await _json(send, 200, json.dumps(xrpc.describe_feed_generator()).encode())
+
+
+async def _get_feed_skeleton(scope, send) -> None:
+    params = _query_params(scope)
+    feed, cursor, limit = (
+        params.get("feed"),
+        params.get("cursor"),
+        _limit(params.get("limit")),
+    )
+
+    started = time.perf_counter()
+    data = xrpc.cached_feed_skeleton(feed, cursor, limit)
+    timer = xrpc.SKELETON_HIT
+    if data is None:
+        try:
+            data = await asyncio.to_thread(
+                xrpc.build_feed_skeleton, feed, cursor, limit
+            )
+        except xrpc.XrpcError as e:
+            await _text(send, e.status, e.message)
+            return
+        timer = xrpc.SKELETON_MISS
+    timer.observe(time.perf_counter() - started)
+    await _json(send, 200, data, _NO_STORE)
+
+
+async def _metrics(scope, send) -> None:
+    if not settings.METRICS_ENABLED:
+        await _text(send, 404, "Not Found")
+        return
+    body = metrics.registry.render().encode()
+    await _respond(send, 200, body, metrics.CONTENT_TYPE.encode())
+
+
+_ROUTES = {
+    "/": _index,
+    "/.well-known/did.json": _did_json,
+    "/xrpc/app.bsky.feed.describeFeedGenerator": _describe_feed_generator,
+    "/xrpc/app.bsky.feed.getFeedSkeleton": _get_feed_skeleton,
+    "/metrics": _metrics,
+}
+
+
+async def _lifespan(receive, send) -> None:
+    stop = asyncio.Event()
+    stream_task = None
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            stream_task = asyncio.create_task(
+                data_stream.run_async(settings.SERVICE_DID, operations_callback, stop)
+            )
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            logger.info("Stopping data stream...")
+            stop.set()
+            if stream_task:
+                stream_task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await stream_task
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send) -> None:
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    if scope["method"] == "HEAD":
+        send = _headers_only(send)
+
+    route = _ROUTES.get(scope["path"])
+    if route is None:
+        await _text(send, 404, "Not Found")
+    elif scope["method"] not in ("GET", "HEAD"):
+        await _text(send, 405, "Method Not Allowed")
+    else:
+        await route(scope, send)
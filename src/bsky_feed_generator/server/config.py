@@ -1,12 +1,15 @@
 from collections.abc import Callable
 from ipaddress import IPv4Address
 from pathlib import Path
-from typing import Any, ClassVar
+from typing import Any, ClassVar, Literal
 
 from atproto_client.models.string_formats import AtUri, Handle, RecordKey
 from pydantic import Field, ImportString, SecretStr, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from bsky_feed_generator.server.feeds import FeedConfig
+from bsky_feed_generator.server.filter_spec import FilterSpec
+
 
 class Settings(BaseSettings):
     model_config: ClassVar[SettingsConfigDict] = SettingsConfigDict(
@@ -29,15 +32,32 @@ class Settings(BaseSettings):
     LISTEN_HOST: IPv4Address = IPv4Address("0.0.0.0")
     LISTEN_PORT: int = 8080
     LOG_LEVEL: str = "INFO"
+    SERVER_MODE: Literal["wsgi", "asgi"] = Field(
+        default="wsgi",
+        description="'wsgi' serves the Flask app with waitress; 'asgi' serves the ASGI app with uvicorn and reads the firehose on its event loop",
+    )
+    METRICS_ENABLED: bool = Field(
+        default=True,
+        description="serve ingestion and serving metrics at /metrics in the Prometheus text format",
+    )
 
     # --- Feed Behavior Settings ---
     IGNORE_ARCHIVED_POSTS: bool = False
     IGNORE_REPLY_POSTS: bool = False
+    FILTER_SPEC: FilterSpec | None = Field(
+        default=None,
+        description="Optional declarative filter rules as JSON (see FilterSpec). They are compiled once and applied before CUSTOM_FILTER_FUNCTION; with no function configured, posts passing them are included.",
+    )
     CUSTOM_FILTER_FUNCTION: ImportString[Callable[..., bool]] | None = Field(
         default=None,
         description="Optional path to a custom filter function (e.g., 'my_module.my_filter_func') to decide post inclusion. The function should accept (record, created_post) and return bool.",
     )
 
+    FEEDS: list[FeedConfig] = Field(
+        default_factory=list,
+        description="Optional JSON list of feeds to serve from one firehose subscription, each {uri, filter, custom_filter_function}. Replaces FEED_URI, FILTER_SPEC and CUSTOM_FILTER_FUNCTION; IGNORE_* settings still apply to every feed. Record keys must be distinct: posts are stored by record key.",
+    )
+
     # --- Settings for publishing script ---
     RECORD_NAME: RecordKey = Field(default=..., description="record name of the feed")
     DISPLAY_NAME: str = Field(default=..., description="display name of the feed")
@@ -59,6 +79,138 @@ class Settings(BaseSettings):
     # --- Database Settings ---
     DATABASE_URI: str = "feed_database.db"  # For tests, can be set to ":memory:"
 
+    # --- Ingestion Pipeline Settings ---
+    STREAM_SOURCE: Literal["firehose", "jetstream"] = Field(
+        default="firehose",
+        description="'jetstream' ingests JSON events from JETSTREAM_URI instead of the relay's CBOR/CAR firehose",
+    )
+    FIREHOSE_URI: str | None = Field(
+        default=None,
+        description="websocket base URI of the relay to subscribe to, e.g. ws://127.0.0.1:8765/xrpc for the relay simulator; defaults to the Bluesky relay",
+    )
+    JETSTREAM_URI: str = Field(
+        default="wss://jetstream2.us-east.bsky.network/subscribe",
+        description="Jetstream subscribe endpoint used with STREAM_SOURCE=jetstream",
+    )
+    JETSTREAM_ZSTD_DICTIONARY: str | None = Field(
+        default=None,
+        description="path to Jetstream's zstd dictionary; when set, messages are requested zstd-compressed (needs the 'jetstream' extra)",
+    )
+    STREAM_WORKERS: int = Field(
+        default=2,
+        ge=1,
+        description="number of decode/filter worker lanes; commits are sharded across lanes by repo DID",
+    )
+    STREAM_QUEUE_SIZE: int = Field(
+        default=1000, ge=1, description="max firehose frames buffered per worker lane"
+    )
+    STREAM_BACKPRESSURE: Literal["block", "drop"] = Field(
+        default="block",
+        description="what the reader does when a lane is full: 'block' stalls the websocket, 'drop' discards the frame",
+    )
+    STREAM_DECODE_MODE: Literal["thread", "process"] = Field(
+        default="thread",
+        description="'process' decodes CARs and runs filters in STREAM_WORKERS worker processes instead of threads. It only helps when decoding and filtering need more than one core: start-up and per-batch pickling make it slower otherwise (see README)",
+    )
+    STREAM_LAZY_RECORDS: bool = Field(
+        default=True,
+        description="hand posts to filters as lightweight views that build the full pydantic record only when a field they lack is used",
+    )
+    STREAM_BATCH_SIZE: int = Field(
+        default=64,
+        ge=1,
+        description="max queued frames a worker handles per batch (one IPC round-trip in process mode)",
+    )
+
+    STREAM_CATCHUP_LAG: float = Field(
+        default=60,
+        ge=0,
+        description="enter catch-up mode once the newest commit received is more than this many seconds old (0 disables catch-up mode)",
+    )
+    STREAM_CATCHUP_EXIT_LAG: float = Field(
+        default=10,
+        ge=0,
+        description="return to live mode once that lag is back under this many seconds",
+    )
+    STREAM_CATCHUP_WRITE_BATCH_SIZE: int = Field(
+        default=5000, ge=1, description="WRITE_BATCH_SIZE while catching up"
+    )
+    STREAM_CATCHUP_WRITE_FLUSH_INTERVAL: float = Field(
+        default=5.0, gt=0, description="WRITE_FLUSH_INTERVAL while catching up"
+    )
+    STREAM_CATCHUP_SKIP_AGE: float = Field(
+        default=0,
+        ge=0,
+        description="while catching up, skip commits made more than this many seconds ago without decoding them, unless they delete records (0 keeps every commit)",
+    )
+
+    CURSOR_CHECKPOINT_EVENTS: int = Field(
+        default=1000,
+        ge=1,
+        description="save the firehose cursor at least every this many frames",
+    )
+    CURSOR_CHECKPOINT_INTERVAL: float = Field(
+        default=5.0,
+        gt=0,
+        description="save the firehose cursor at least every this many seconds",
+    )
+    FIREHOSE_RECORD_DIR: str | None = Field(
+        default=None,
+        description="directory to record every received firehose frame to, as compressed segments that `data_stream.replay` can feed back",
+    )
+    FIREHOSE_RECORD_SEGMENT_FRAMES: int = Field(
+        default=100_000, ge=1, description="frames per recording segment file"
+    )
+
+    # --- Feed Serving Settings ---
+    HOT_FEED_SIZE: int = Field(
+        default=1000,
+        ge=0,
+        description="newest feed items kept in memory to serve first pages without SQLite (0 disables)",
+    )
+    RESPONSE_CACHE_BYTES: int = Field(
+        default=16 * 1024 * 1024,
+        ge=0,
+        description="memory cap for cached getFeedSkeleton response bodies (0 disables)",
+    )
+
+    # --- Storage Write Settings ---
+    WRITE_BATCH_SIZE: int = Field(
+        default=500,
+        ge=1,
+        description="flush buffered post inserts/deletes once this many are pending",
+    )
+    WRITE_FLUSH_INTERVAL: float = Field(
+        default=1.0,
+        gt=0,
+        description="max seconds an accepted post or delete waits in the write buffer",
+    )
+
+    # --- Retention Settings ---
+    RETENTION_MAX_AGE_HOURS: float = Field(
+        default=0,
+        ge=0,
+        description="delete posts indexed more than this many hours ago (0 keeps them forever)",
+    )
+    RETENTION_MAX_POSTS: int = Field(
+        default=0,
+        ge=0,
+        description="keep at most this many of the newest posts per feed (0 means no limit)",
+    )
+    RETENTION_INTERVAL: float = Field(
+        default=600,
+        gt=0,
+        description="seconds between retention runs (deletes, incremental vacuum, WAL checkpoint)",
+    )
+    RETENTION_BATCH_SIZE: int = Field(
+        default=500, ge=1, description="max posts deleted per retention transaction"
+    )
+    COMPACT_INTERVAL: float = Field(
+        default=600,
+        ge=0,
+        description="seconds between incremental vacuums and WAL truncations, which run even with retention limits off (0 disables; retention runs still compact)",
+    )
+
     @field_validator("HOSTNAME", mode="before")
     @classmethod
     def _strip_quotes_from_hostname(cls, v: Any) -> Any:
@@ -88,6 +240,19 @@ class Settings(BaseSettings):
                 return v_lower[1:-1]
         return v
 
+    @field_validator("FEEDS")
+    @classmethod
+    def _unique_feed_keys(cls, feeds: list[FeedConfig]) -> list[FeedConfig]:
+        # posts are stored by record key, so two feeds sharing one would share posts
+        seen = {}
+        for feed in feeds:
+            if feed.key in seen:
+                raise ValueError(
+                    f"feeds {seen[feed.key]} and {feed.uri} share the record key {feed.key!r}"
+                )
+            seen[feed.key] = feed.uri
+        return feeds
+
     @field_validator("SERVICE_DID", mode="before")
     @classmethod
     def derive_service_did(cls, v: Any, info: Any) -> str | None:
@@ -1,14 +1,34 @@
 import datetime
 import logging
+import time
 from collections import defaultdict
 
 from atproto import models
 
+from bsky_feed_generator.server import metrics
 from bsky_feed_generator.server.config import settings
-from bsky_feed_generator.server.database import Post, db
+from bsky_feed_generator.server.data_stream import subscribes
+from bsky_feed_generator.server.feeds import DEFAULT_FEED
+from bsky_feed_generator.server.filter_spec import (
+    CompiledFilter,
+    FilterSpec,
+    is_archived,
+)
+from bsky_feed_generator.server.writer import writer
 
 logger = logging.getLogger(__name__)
 
+FILTER_SECONDS = metrics.histogram(
+    "feedgen_filter_batch_seconds",
+    "Time a feed's filters took over a batch of posts, custom filter included",
+    ["feed"],
+)
+FILTER_POSTS = metrics.counter(
+    "feedgen_filter_posts_total",
+    "Posts run through a feed's filters, by whether they passed",
+    ["feed", "result"],
+)
+
 
 def is_archive_post(record: "models.AppBskyFeedPost.Record") -> bool:
     # Sometimes users will import old posts from Twitter/X which con flood a feed with
@@ -20,112 +40,174 @@ def is_archive_post(record: "models.AppBskyFeedPost.Record") -> bool:
     #
     # See https://github.com/MarshalX/bluesky-feed-generator/pull/21
 
-    archived_threshold = datetime.timedelta(days=1)
-    created_at = datetime.datetime.fromisoformat(record.created_at)
-    now = datetime.datetime.now(datetime.timezone.utc)
+    return is_archived(record.created_at, datetime.timedelta(days=1))
 
-    return now - created_at > archived_threshold
 
+_DEFAULT_SPEC = FilterSpec()
+# id(spec) -> (spec, IGNORE_* flags it was compiled with, compiled filter)
+_compiled: dict[int, tuple[FilterSpec, tuple[bool, bool], CompiledFilter]] = {}
 
-def should_ignore_post(created_post: dict) -> bool:
-    record = created_post["record"]
-    uri = created_post["uri"]
 
-    if settings.IGNORE_ARCHIVED_POSTS and is_archive_post(record):
-        logger.debug(f"Ignoring archived post: {uri}")
-        return True
+def compiled_filter(spec: FilterSpec | None = None) -> CompiledFilter:
+    """`spec` (default FILTER_SPEC) combined with IGNORE_REPLY_POSTS/IGNORE_ARCHIVED_POSTS, compiled once."""
+    spec = spec or settings.FILTER_SPEC or _DEFAULT_SPEC
+    flags = (settings.IGNORE_REPLY_POSTS, settings.IGNORE_ARCHIVED_POSTS)
+    cached = _compiled.get(id(spec))
+    if cached is None or cached[0] is not spec or cached[1] != flags:
+        merged = spec.model_copy(
+            update={
+                "ignore_replies": spec.ignore_replies or flags[0],
+                "ignore_archived": spec.ignore_archived or flags[1],
+            }
+        )
+        cached = _compiled[id(spec)] = (spec, flags, merged.compile())
+    return cached[2]
 
-    if settings.IGNORE_REPLY_POSTS and record.reply:
-        logger.debug(f"Ignoring reply post: {uri}")
-        return True
 
+def _passes_custom_filter(custom_filter_function, created_post: dict) -> bool:
+    function_name = custom_filter_function.__name__ or "unknown"
+    try:
+        if custom_filter_function(created_post["record"], created_post):
+            return True
+    except Exception as e:
+        logger.error(
+            f"Error executing custom filter {function_name} for post {created_post['uri']}: {e}"
+        )
+        return False  # Skip post if custom filter errors
+
+    logger.debug(
+        f"Post {created_post['uri']} excluded by custom filter: {function_name}"
+    )
     return False
 
 
-def operations_callback(ops: defaultdict) -> None:
-    # Ensure we have a fresh connection for database operations
-    if not db.is_closed():
-        db.close()
-    db.connect()
-
-    try:
-        posts_to_create = []
-        for created_post in ops[models.ids.AppBskyFeedPost]["created"]:
-            record = created_post["record"]
-
-            ignored = should_ignore_post(created_post)
-            if ignored:
-                continue
-
-            post_passes_custom_filter = False
-
-            if settings.CUSTOM_FILTER_FUNCTION:
-                custom_filter_function = settings.CUSTOM_FILTER_FUNCTION
-                assert custom_filter_function is not None
-                function_name = custom_filter_function.__name__ or "unknown"
-                try:
-                    if custom_filter_function(record, created_post):
-                        post_passes_custom_filter = True
-                    else:
-                        logger.debug(
-                            f"Post {created_post['uri']} excluded by custom filter: {function_name}"
-                        )
-                        continue
-                except Exception as e:
-                    logger.error(
-                        f"Error executing custom filter {function_name} for post {created_post['uri']}: {e}"
-                    )
-                    continue  # Skip post if custom filter errors
-            else:
-                # No custom filter configured. By default, this means the post is not included by this logic path.
-                # If you want to include all posts that pass should_ignore_post when no custom filter is set,
-                # you would set post_passes_custom_filter = True here.
-                logger.debug(
-                    "No CUSTOM_FILTER_FUNCTION configured. Post will not be added by custom logic."
-                )
-                continue
-
-            if not post_passes_custom_filter:
-                continue
-
-            # Post passed all filters, prepare it for creation
-            reply_root = reply_parent = None
-            if record.reply:
-                reply_root = record.reply.root.uri
-                reply_parent = record.reply.parent.uri
-
-            post_dict = {
-                "uri": created_post["uri"],
-                "cid": created_post["cid"],
-                "reply_parent": reply_parent,
-                "reply_root": reply_root,
-                "text": record.text,  # TODO: Remove text before saving to DB, as it's not in the model
-            }
-            posts_to_create.append(post_dict)
-
-        posts_to_delete = ops[models.ids.AppBskyFeedPost]["deleted"]
-        if posts_to_delete:
-            post_uris_to_delete = [post["uri"] for post in posts_to_delete]
-            Post.delete().where(Post.uri.in_(post_uris_to_delete))  # type: ignore
-            logger.debug(f"Deleted from feed: {len(post_uris_to_delete)}")
-
-        if posts_to_create:
-            logger.debug(f"Adding {len(posts_to_create)} posts to feed.")
-            for post_dict_to_log in posts_to_create:
-                logger.info(
-                    f"Post: {post_dict_to_log['uri']} with text: {
-                        post_dict_to_log.get('text', '<Text not available>')
-                    }"
+def _custom_filter_mask(
+    custom_filter_function, created_posts: list[dict]
+) -> list[bool]:
+    """Run a custom filter over `created_posts`, through its `filter_batch` if it has one.
+
+    A batch filter is called as `filter_batch(records, created_posts)` and
+    returns one bool per post. If it raises, every post goes through the
+    per-post filter instead.
+    """
+    filter_batch = getattr(custom_filter_function, "filter_batch", None)
+    if filter_batch is not None:
+        try:
+            mask = list(
+                filter_batch([post["record"] for post in created_posts], created_posts)
+            )
+            if len(mask) != len(created_posts):
+                raise ValueError(
+                    f"returned {len(mask)} results for {len(created_posts)} posts"
                 )
-
-            with db.atomic():
-                for post_dict_for_db in posts_to_create:
-                    db_insert_dict = post_dict_for_db.copy()
-                    db_insert_dict.pop(
-                        "text"
-                    )  # TODO: Remove text before saving to DB, as it's not in the model
-                    Post.create(**db_insert_dict)
-    finally:
-        # Always close the connection after operations
-        if not db.is_closed():
-            db.close()
+            return mask
+        except Exception as e:
+            logger.error(
+                f"Error executing batch filter {custom_filter_function.__name__}: {e}"
+            )
+    return [
+        _passes_custom_filter(custom_filter_function, post) for post in created_posts
+    ]
+
+
+def matching_feeds_batch(created_posts: list[dict]) -> list[list[str]]:
+    """Storage partitions of every configured feed each post belongs in."""
+    matches: list[list[str]] = [[] for _ in created_posts]
+    if not created_posts:
+        return matches
+    if settings.FEEDS:
+        stages = [
+            (feed.key, compiled_filter(feed.filter), feed.custom_filter_function)
+            for feed in settings.FEEDS
+        ]
+    elif settings.CUSTOM_FILTER_FUNCTION or settings.FILTER_SPEC:
+        stages = [(DEFAULT_FEED, compiled_filter(), settings.CUSTOM_FILTER_FUNCTION)]
+    else:
+        # with neither filter rules nor a custom filter function configured,
+        # nothing selects posts for the feed
+        logger.debug(
+            "No CUSTOM_FILTER_FUNCTION configured. Post will not be added by custom logic."
+        )
+        return matches
+
+    for key, rules, custom_filter_function in stages:
+        started = time.perf_counter()
+        passed = rules.select(created_posts)
+        if custom_filter_function and passed:
+            mask = _custom_filter_mask(
+                custom_filter_function, [created_posts[i] for i in passed]
+            )
+            passed = [i for i, keep in zip(passed, mask) if keep]
+        for i in passed:
+            matches[i].append(key)
+        feed = key or "default"
+        FILTER_SECONDS.labels(feed).observe(time.perf_counter() - started)
+        FILTER_POSTS.labels(feed, "passed").inc(len(passed))
+        FILTER_POSTS.labels(feed, "rejected").inc(len(created_posts) - len(passed))
+    return matches
+
+
+def prefilter_ops(ops: defaultdict) -> dict:
+    """Reduce decoded ops to what `operations_callback` can act on.
+
+    Runs next to the decoder (e.g. in a worker process), so only posts that pass
+    some feed's filters and post deletes have to be shipped back. Kept posts
+    carry the feeds they matched under "feeds".
+    """
+    posts = ops[models.ids.AppBskyFeedPost]
+    created = [
+        {**post, "feeds": feeds}
+        for post, feeds in zip(posts["created"], matching_feeds_batch(posts["created"]))
+        if feeds
+    ]
+    if not created and not posts["deleted"]:
+        return {}
+    return {
+        models.ids.AppBskyFeedPost: {"created": created, "deleted": posts["deleted"]}
+    }
+
+
+@subscribes(models.ids.AppBskyFeedPost, prefilter=prefilter_ops)
+def operations_callback(ops: defaultdict) -> None:
+    created_posts = ops[models.ids.AppBskyFeedPost]["created"]
+    # prefiltered posts already carry their feeds; match the rest in one batch
+    unmatched = [post for post in created_posts if "feeds" not in post]
+    matched = iter(matching_feeds_batch(unmatched) if unmatched else ())
+
+    posts_to_create = []
+    for created_post in created_posts:
+        record = created_post["record"]
+
+        feeds = created_post.get("feeds")
+        if feeds is None:
+            feeds = next(matched)
+        if not feeds:
+            continue
+
+        # Post passed all filters, prepare it for creation
+        reply_root = reply_parent = None
+        if record.reply:
+            reply_root = record.reply.root.uri
+            reply_parent = record.reply.parent.uri
+
+        for feed in feeds:
+            posts_to_create.append(
+                {
+                    "feed": feed,
+                    "uri": created_post["uri"],
+                    "cid": created_post["cid"],
+                    "reply_parent": reply_parent,
+                    "reply_root": reply_root,
+                }
+            )
+        logger.debug(f"Post: {created_post['uri']} with text: {record.text}")
+
+    post_uris_to_delete = [
+        post["uri"] for post in ops[models.ids.AppBskyFeedPost]["deleted"]
+    ]
+
+    if posts_to_create or post_uris_to_delete:
+        logger.debug(
+            f"Queueing {len(posts_to_create)} posts to add and {len(post_uris_to_delete)} to delete."
+        )
+        writer.add(posts_to_create, post_uris_to_delete)
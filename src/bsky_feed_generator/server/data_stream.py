@@ -1,8 +1,18 @@
+import abc
+import asyncio
+import logging
+import multiprocessing
+import os
 import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
 
 from atproto import (
     CAR,
+    AsyncFirehoseSubscribeReposClient,
     AtUri,
     FirehoseSubscribeReposClient,
     firehose_models,
@@ -11,21 +21,87 @@ from atproto import (
 )
 from atproto.exceptions import FirehoseError
 
+from bsky_feed_generator.server import metrics
+from bsky_feed_generator.server.config import settings
 from bsky_feed_generator.server.database import SubscriptionState
+from bsky_feed_generator.server.frame_log import (
+    SegmentRecorder,
+    decode_frame,
+    read_recording,
+)
+from bsky_feed_generator.server.jetstream import (
+    AsyncJetstreamClient,
+    JetstreamClient,
+    JetstreamEvent,
+)
 from bsky_feed_generator.server.logger import logger
+from bsky_feed_generator.server.pipeline import (
+    CatchUpMonitor,
+    CursorCheckpointer,
+    IngestPipeline,
+    commit_time,
+)
+from bsky_feed_generator.server.records import PostView
+from bsky_feed_generator.server.retention import retention
+from bsky_feed_generator.server.writer import writer
 
 _INTERESTED_RECORDS = {
     models.AppBskyFeedLike: models.ids.AppBskyFeedLike,
     models.AppBskyFeedPost: models.ids.AppBskyFeedPost,
     models.AppBskyGraphFollow: models.ids.AppBskyGraphFollow,
 }
+_INTERESTED_COLLECTIONS = frozenset(_INTERESTED_RECORDS.values())
+
+DECODE_SECONDS = metrics.histogram(
+    "feedgen_decode_batch_seconds",
+    "Time spent decoding a worker batch of frames into ops",
+)
+
+
+def subscribes(*collections: str, prefilter=None):
+    """Declare which record collections an operations callback consumes.
+
+    Commits that touch none of `collections` are skipped before their CAR is
+    decoded, and records of other collections are never materialized. An
+    optional `prefilter` runs next to the decoder (see STREAM_DECODE_MODE) to
+    reduce the ops before they are handed back to the callback.
+    """
+
+    def decorator(operations_callback):
+        operations_callback.collections = frozenset(collections)
+        operations_callback.prefilter = prefilter
+        return operations_callback
 
+    return decorator
 
-def _get_ops_by_type(commit: models.ComAtprotoSyncSubscribeRepos.Commit) -> defaultdict:
-    operation_by_type = defaultdict(lambda: {"created": [], "deleted": []})
 
-    car = CAR.from_bytes(commit.blocks)  # type: ignore
-    for op in commit.ops:
+def _empty_ops() -> dict:
+    return {"created": [], "deleted": []}
+
+
+def _collection(path: str) -> str:
+    return path.split("/", 1)[0]
+
+
+def _get_ops_by_type(
+    commit: models.ComAtprotoSyncSubscribeRepos.Commit,
+    collections: frozenset[str] | None = None,
+) -> defaultdict:
+    operation_by_type = defaultdict(_empty_ops)
+
+    wanted_ops = [
+        op
+        for op in commit.ops
+        if collections is None or _collection(op.path) in collections
+    ]
+    car = None
+    if any(
+        op.action == "create" and _collection(op.path) in _INTERESTED_COLLECTIONS
+        for op in wanted_ops
+    ):
+        car = CAR.from_bytes(commit.blocks)  # type: ignore
+
+    for op in wanted_ops:
         if op.action == "update":
             # we are not interested in updates
             continue
@@ -33,7 +109,7 @@ def _get_ops_by_type(commit: models.ComAtprotoSyncSubscribeRepos.Commit) -> defa
         uri = AtUri.from_str(f"at://{commit.repo}/{op.path}")
 
         if op.action == "create":
-            if not op.cid:
+            if not op.cid or car is None:
                 continue
 
             create_info = {"uri": str(uri), "cid": str(op.cid), "author": commit.repo}
@@ -42,19 +118,9 @@ def _get_ops_by_type(commit: models.ComAtprotoSyncSubscribeRepos.Commit) -> defa
             if not record_raw_data:
                 continue
 
-            record = models.get_or_create(record_raw_data, strict=False)
-            if record is None:  # unknown record (out of bsky lexicon)
-                continue
-
-            for record_type, record_nsid in _INTERESTED_RECORDS.items():
-                if uri.collection == record_nsid and models.is_record_type(
-                    record,  # type: ignore
-                    record_type,
-                ):
-                    operation_by_type[record_nsid]["created"].append(
-                        {"record": record, **create_info}
-                    )
-                    break
+            _add_created(
+                operation_by_type, uri.collection, record_raw_data, create_info
+            )
 
         if op.action == "delete":
             operation_by_type[uri.collection]["deleted"].append({"uri": str(uri)})
@@ -62,10 +128,371 @@ def _get_ops_by_type(commit: models.ComAtprotoSyncSubscribeRepos.Commit) -> defa
     return operation_by_type
 
 
+def _add_created(
+    operation_by_type: defaultdict, collection: str, record_raw_data, create_info: dict
+) -> None:
+    if (
+        settings.STREAM_LAZY_RECORDS
+        and collection == models.ids.AppBskyFeedPost
+        and (view := PostView.parse(record_raw_data)) is not None
+    ):
+        operation_by_type[collection]["created"].append({"record": view, **create_info})
+        return
+
+    record = models.get_or_create(record_raw_data, strict=False)
+    if record is None:  # unknown record (out of bsky lexicon)
+        return
+
+    for record_type, record_nsid in _INTERESTED_RECORDS.items():
+        if collection == record_nsid and models.is_record_type(
+            record,  # type: ignore
+            record_type,
+        ):
+            operation_by_type[record_nsid]["created"].append(
+                {"record": record, **create_info}
+            )
+            break
+
+
+def _decode_frame(
+    message: firehose_models.MessageFrame,
+    collections: frozenset[str] | None = None,
+) -> tuple[int, defaultdict] | None:
+    if collections is not None and not any(
+        _collection(op["path"]) in collections for op in message.body.get("ops", ())
+    ):
+        # nothing the callback subscribes to; skip building the commit model
+        return None
+
+    commit = parse_subscribe_repos_message(message)
+    if not isinstance(commit, models.ComAtprotoSyncSubscribeRepos.Commit):
+        return None
+
+    logger.debug(
+        f"data_stream: Commit seq {commit.seq}, has blocks: {bool(commit.blocks)}"
+    )
+    if not commit.blocks:
+        return None
+    return commit.seq, _get_ops_by_type(commit, collections)
+
+
+def _decode_jetstream_event(
+    event: JetstreamEvent,
+    collections: frozenset[str] | None = None,
+) -> tuple[int, defaultdict] | None:
+    """The ops of a Jetstream commit event: the same dict `_decode_frame` builds."""
+    body = event.body
+    commit = body["commit"]
+    collection = commit["collection"]
+    if collections is not None and collection not in collections:
+        return None
+
+    operation_by_type = defaultdict(_empty_ops)
+    uri = f"at://{body['did']}/{collection}/{commit['rkey']}"
+    if commit["operation"] == "create":
+        if collection in _INTERESTED_COLLECTIONS:
+            create_info = {"uri": uri, "cid": commit["cid"], "author": body["did"]}
+            _add_created(operation_by_type, collection, commit["record"], create_info)
+    elif commit["operation"] == "delete":
+        operation_by_type[collection]["deleted"].append({"uri": uri})
+    return body["seq"], operation_by_type
+
+
+def _decode_frames(
+    messages: list[firehose_models.MessageFrame], collections, decode=_decode_frame
+) -> list[tuple[int, defaultdict]]:
+    """`(seq, ops)` of every message that decodes to ops, logging those that fail."""
+    results = []
+    with DECODE_SECONDS.time():
+        for message in messages:
+            try:
+                decoded = decode(message, collections)
+            except Exception as e:
+                logger.error(
+                    f"Failed to decode commit seq {message.body.get('seq')}, repo {message.body.get('repo')}: {e}",
+                    exc_info=True,
+                )
+                continue
+            if decoded:
+                results.append(decoded)
+    return results
+
+
+def _call(operations_callback, seq: int, ops: defaultdict) -> None:
+    try:
+        operations_callback(ops)
+    except Exception as e:
+        logger.error(
+            f"CRITICAL ERROR during operations_callback for commit seq {seq}: {e}",
+            exc_info=True,
+        )
+
+
+def _process_frames(
+    messages: list[firehose_models.MessageFrame],
+    operations_callback,
+    decode=_decode_frame,
+) -> None:
+    collections = getattr(operations_callback, "collections", None)
+    for seq, ops in _decode_frames(messages, collections, decode):
+        _call(operations_callback, seq, ops)
+
+
+def _decode_frames_in_worker(
+    messages: list[firehose_models.MessageFrame],
+    collections,
+    prefilter,
+    decode=_decode_frame,
+) -> tuple[list[tuple[int, dict]], list]:
+    """Runs in a decode worker process; returns only non-empty, pre-filtered ops.
+
+    The metrics recorded meanwhile come along for the main process to merge.
+    """
+    results = []
+    for seq, ops in _decode_frames(messages, collections, decode):
+        if ops := prefilter(ops) if prefilter else dict(ops):
+            results.append((seq, ops))
+    return results, metrics.registry.drain()
+
+
+def _process_frames_in_pool(
+    messages: list[firehose_models.MessageFrame],
+    executor,
+    operations_callback,
+    decode=_decode_frame,
+) -> None:
+    future = executor.submit(
+        _decode_frames_in_worker,
+        messages,
+        getattr(operations_callback, "collections", None),
+        getattr(operations_callback, "prefilter", None),
+        decode,
+    )
+    results, recorded = future.result()
+    metrics.registry.merge(recorded)
+    for seq, ops in results:
+        _call(operations_callback, seq, defaultdict(_empty_ops, ops))
+
+
+def _deletes_records(body: dict) -> bool:
+    if (ops := body.get("ops")) is not None:  # a relay commit
+        return any(op["action"] == "delete" for op in ops)
+    # a Jetstream event
+    return body.get("commit", {}).get("operation") == "delete"
+
+
+def _skippable_commit(max_age: float, frame: firehose_models.MessageFrame) -> bool:
+    """Whether catch-up mode may skip `frame`: made over `max_age` seconds ago, deleting nothing."""
+    made = commit_time(frame.body)
+    return (
+        made is not None
+        and time.time() - made > max_age
+        and not _deletes_records(frame.body)
+    )
+
+
+class _CatchUpMode:
+    """What catch-up mode changes, for `CatchUpMonitor` to switch on and off.
+
+    While catching up the writer flushes in bigger, rarer transactions, debug
+    logging is off, and with STREAM_CATCHUP_SKIP_AGE old commits are skipped
+    before their records are decoded.
+    """
+
+    def __init__(self, pipeline: IngestPipeline) -> None:
+        self.pipeline = pipeline
+        self._live: tuple[int, float, int] | None = None
+
+    def __call__(self, active: bool, lag: float | None) -> None:
+        package_logger = logging.getLogger("bsky_feed_generator")
+        if active:
+            seq = self.pipeline.last_seq
+            behind = ""
+            if seq is not None and writer.saved_cursor is not None:
+                behind = f", {seq - writer.saved_cursor} past the saved cursor"
+            logger.info(
+                f"DATA_STREAM: {lag:.0f}s behind the stream at seq {seq}{behind}; catching up"
+            )
+            self._live = (writer.max_batch, writer.max_delay, package_logger.level)
+            writer.max_batch = settings.STREAM_CATCHUP_WRITE_BATCH_SIZE
+            writer.max_delay = settings.STREAM_CATCHUP_WRITE_FLUSH_INTERVAL
+            if package_logger.getEffectiveLevel() < logging.INFO:
+                package_logger.setLevel(logging.INFO)
+            if settings.STREAM_CATCHUP_SKIP_AGE:
+                self.pipeline.skip = partial(
+                    _skippable_commit, settings.STREAM_CATCHUP_SKIP_AGE
+                )
+        elif self._live is not None:
+            self.pipeline.skip = None
+            writer.max_batch, writer.max_delay, level = self._live
+            package_logger.setLevel(level)
+            self._live = None
+            if lag is None:
+                logger.info("DATA_STREAM: Leaving catch-up mode")
+            else:
+                logger.info(
+                    f"DATA_STREAM: Caught up ({lag:.0f}s behind); back to live mode"
+                )
+
+
+@contextmanager
+def _ingest(name, operations_callback, backpressure=None, decode=_decode_frame):
+    """Start the writer, retention and a pipeline feeding `operations_callback`; drain them on exit.
+
+    `decode` turns a queued event into `(seq, ops)`, see `Source`.
+    """
+    executor = None
+    if settings.STREAM_DECODE_MODE == "process":
+        if (os.cpu_count() or 1) < 2:
+            logger.warning(
+                "STREAM_DECODE_MODE=process on a single CPU is slower than thread mode"
+            )
+        executor = ProcessPoolExecutor(
+            max_workers=settings.STREAM_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        handle_batch = partial(
+            _process_frames_in_pool,
+            executor=executor,
+            operations_callback=operations_callback,
+            decode=decode,
+        )
+    else:
+        handle_batch = partial(
+            _process_frames, operations_callback=operations_callback, decode=decode
+        )
+
+    pipeline = IngestPipeline(
+        handle_batch,
+        workers=settings.STREAM_WORKERS,
+        queue_size=settings.STREAM_QUEUE_SIZE,
+        backpressure=backpressure or settings.STREAM_BACKPRESSURE,
+        batch_size=settings.STREAM_BATCH_SIZE,
+    )
+    catch_up = None
+    if settings.STREAM_CATCHUP_LAG:
+        catch_up = CatchUpMonitor(
+            pipeline,
+            _CatchUpMode(pipeline),
+            enter_lag=settings.STREAM_CATCHUP_LAG,
+            exit_lag=settings.STREAM_CATCHUP_EXIT_LAG,
+        )
+    writer.start()
+    retention.start()
+    pipeline.start()
+    if catch_up:
+        catch_up.start()
+    try:
+        yield pipeline
+    finally:
+        if catch_up:
+            catch_up.stop()
+        pipeline.stop()
+        if executor:
+            executor.shutdown()
+        # everything queued is processed now; save the cursor with the final flush
+        if name is not None and pipeline.tracker.watermark is not None:
+            writer.checkpoint(name, pipeline.tracker.watermark)
+        retention.stop()
+        writer.stop()
+
+
+@contextmanager
+def _recorder(source):
+    """A SegmentRecorder for FIREHOSE_RECORD_DIR, or None if recording is off."""
+    if not settings.FIREHOSE_RECORD_DIR:
+        yield None
+        return
+    if not isinstance(source, FirehoseSource):
+        logger.warning(
+            f"FIREHOSE_RECORD_DIR is ignored: STREAM_SOURCE={settings.STREAM_SOURCE} cannot be recorded"
+        )
+        yield None
+        return
+    with SegmentRecorder(
+        settings.FIREHOSE_RECORD_DIR, settings.FIREHOSE_RECORD_SEGMENT_FRAMES
+    ) as recorder:
+        yield recorder
+
+
+def _record(recorder, message: firehose_models.MessageFrame) -> None:
+    if recorder is not None:
+        recorder.record(message)
+
+
 def run(name, operations_callback, stream_stop_event=None):
+    source = _source(operations_callback)
+    name += source.cursor_suffix
+    with (
+        _ingest(name, operations_callback, decode=source.decode) as pipeline,
+        _recorder(source) as recorder,
+    ):
+        _run_forever(name, pipeline, source, stream_stop_event, recorder)
+
+
+def replay(path, operations_callback, name=None, cursor=None) -> int:
+    """Feed recorded frames through `operations_callback` as fast as it takes them.
+
+    `path` is a FIREHOSE_RECORD_DIR recording or a single frame log. Frames go
+    through the same pipeline as `run`, blocking instead of dropping when it is
+    full; with STREAM_WORKERS=1 they are processed in recorded order. With
+    `name` the cursor is checkpointed under it like `run` does, and replay
+    starts after the saved cursor unless `cursor` is given, so it can backfill
+    the feed and be resumed. Returns the number of frames submitted.
+    """
+    submitted = 0
+    with _ingest(name, operations_callback, backpressure="block") as pipeline:
+        checkpointer = None
+        if name is not None:
+            if cursor is None:
+                cursor = _initial_cursor(name, pipeline)
+            checkpointer = CursorCheckpointer(
+                pipeline.tracker,
+                partial(writer.checkpoint, name),
+                every_events=settings.CURSOR_CHECKPOINT_EVENTS,
+                every_seconds=settings.CURSOR_CHECKPOINT_INTERVAL,
+                saved=cursor,
+            )
+        started = time.monotonic()
+        for _, data in read_recording(path, cursor):
+            submitted += pipeline.submit(decode_frame(data))
+            if checkpointer:
+                checkpointer.tick()
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Replayed {submitted} commits from {path} in {elapsed:.1f}s ({submitted / max(elapsed, 1e-9):.0f}/s)"
+    )
+    return submitted
+
+
+async def run_async(name, operations_callback, stream_stop_event=None):
+    """Like `run`, but reads the firehose on the running event loop.
+
+    Decoding and filtering still happen on the pipeline's workers; the loop only
+    receives frames and queues them. Cancel the task or set the
+    `asyncio.Event` `stream_stop_event` to stop.
+    """
+    source = _source(operations_callback)
+    name += source.cursor_suffix
+    with (
+        _ingest(name, operations_callback, decode=source.decode) as pipeline,
+        _recorder(source) as recorder,
+    ):
+        while stream_stop_event is None or not stream_stop_event.is_set():
+            try:
+                await _run_async(name, pipeline, source, stream_stop_event, recorder)
+            except Exception as e:
+                logger.error(
+                    f"Firehose error encountered: {e}. Attempting to reconnect...",
+                    exc_info=True,
+                )
+                await asyncio.sleep(5)
+
+
+def _run_forever(name, pipeline, source, stream_stop_event=None, recorder=None):
     while stream_stop_event is None or not stream_stop_event.is_set():
         try:
-            _run(name, operations_callback, stream_stop_event)
+            _run(name, pipeline, source, stream_stop_event, recorder)
         except FirehoseError as e:
             # Always log the full error when it occurs, then attempt reconnect
             logger.error(
@@ -91,21 +518,146 @@ def run(name, operations_callback, stream_stop_event=None):
                 time.sleep(5)
 
 
-def _run(name, operations_callback, stream_stop_event=None):
-    state = SubscriptionState.get_or_none(SubscriptionState.service == name)
-
-    params = None
-    if state:
-        params = models.ComAtprotoSyncSubscribeRepos.Params(cursor=state.cursor)
+def _initial_cursor(name, pipeline) -> int | None:
+    cursor = pipeline.tracker.watermark
+    if cursor is not None:
+        logger.info(
+            f"DATA_STREAM: Reconnecting service '{name}' from last processed seq: {cursor}"
+        )
+    elif state := SubscriptionState.get_or_none(SubscriptionState.service == name):
+        cursor = state.cursor
         logger.info(
-            f"DATA_STREAM: Found existing state for service '{name}'. Using cursor: {state.cursor}"
+            f"DATA_STREAM: Found existing state for service '{name}'. Using cursor: {cursor}"
         )
     else:
         logger.info(
             f"DATA_STREAM: No existing state found for service '{name}'. Will start with no cursor (from head)."
         )
+    return cursor
+
 
-    client = FirehoseSubscribeReposClient(params)
+def _subscribe_params(cursor: int | None):
+    if cursor is None:
+        return None
+    return models.ComAtprotoSyncSubscribeRepos.Params(cursor=cursor)
+
+
+def _client_kwargs() -> dict:
+    if settings.FIREHOSE_URI:
+        return {"base_uri": settings.FIREHOSE_URI}
+    return {}
+
+
+class Source(abc.ABC):
+    """An event stream `run` can ingest from, picked by STREAM_SOURCE.
+
+    `client` and `async_client` build clients with the interface of atproto's
+    firehose clients (`start(on_message)`, `stop()`, `update_params(params)`),
+    subscribed after `cursor`; `params(cursor)` are what `update_params` takes.
+    The events they pass to `on_message` need the `type` and `body` (with
+    `seq` and `repo`) of a firehose `MessageFrame`, which the pipeline uses,
+    and `decode` turns one into `(seq, ops)` for the operations callback. It
+    runs on the decode workers, so it must be a module-level function.
+    """
+
+    # appended to the service name the cursor is saved under, so sources with
+    # different cursor schemes never resume from each other's cursor
+    cursor_suffix = ""
+    decode = staticmethod(_decode_frame)
+
+    def __init__(self, collections: frozenset[str] | None = None) -> None:
+        self.collections = collections
+
+    @abc.abstractmethod
+    def params(self, cursor: int | None):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def client(self, cursor: int | None):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def async_client(self, cursor: int | None):
+        raise NotImplementedError
+
+
+class FirehoseSource(Source):
+    """The relay's `com.atproto.sync.subscribeRepos` at FIREHOSE_URI."""
+
+    def params(self, cursor: int | None):
+        return _subscribe_params(cursor)
+
+    def client(self, cursor: int | None):
+        return FirehoseSubscribeReposClient(self.params(cursor), **_client_kwargs())
+
+    def async_client(self, cursor: int | None):
+        return AsyncFirehoseSubscribeReposClient(
+            self.params(cursor), **_client_kwargs()
+        )
+
+
+class JetstreamSource(Source):
+    """The Jetstream instance at JETSTREAM_URI, sending only the subscribed collections."""
+
+    cursor_suffix = "#jetstream"
+    decode = staticmethod(_decode_jetstream_event)
+
+    def params(self, cursor: int | None):
+        return None if cursor is None else {"cursor": cursor}
+
+    def _client_kwargs(self) -> dict:
+        dictionary = None
+        if settings.JETSTREAM_ZSTD_DICTIONARY:
+            dictionary = Path(settings.JETSTREAM_ZSTD_DICTIONARY).read_bytes()
+        return {
+            "base_uri": settings.JETSTREAM_URI,
+            "collections": self.collections,
+            "dictionary": dictionary,
+        }
+
+    def client(self, cursor: int | None):
+        return JetstreamClient(self.params(cursor), **self._client_kwargs())
+
+    def async_client(self, cursor: int | None):
+        return AsyncJetstreamClient(self.params(cursor), **self._client_kwargs())
+
+
+SOURCES: dict[str, type[Source]] = {
+    "firehose": FirehoseSource,
+    "jetstream": JetstreamSource,
+}
+
+
+def _source(operations_callback) -> Source:
+    return SOURCES[settings.STREAM_SOURCE](
+        getattr(operations_callback, "collections", None)
+    )
+
+
+def _checkpointer(
+    name, pipeline, client, source, cursor: int | None
+) -> CursorCheckpointer:
+    def save(watermark: int) -> None:
+        logger.debug(f"Updated cursor for {name} to {watermark}")
+        client.update_params(source.params(watermark))
+        # persisted in the same transaction as the buffered posts it covers
+        writer.checkpoint(name, watermark)
+
+    # only the last seq the workers have fully processed is saved, so a restart
+    # never skips queued commits
+    return CursorCheckpointer(
+        pipeline.tracker,
+        save,
+        every_events=settings.CURSOR_CHECKPOINT_EVENTS,
+        every_seconds=settings.CURSOR_CHECKPOINT_INTERVAL,
+        saved=cursor,
+    )
+
+
+def _run(name, pipeline, source, stream_stop_event=None, recorder=None):
+    cursor = _initial_cursor(name, pipeline)
+    client = source.client(cursor)
+    checkpointer = _checkpointer(name, pipeline, client, source, cursor)
 
     def on_message_handler(message: firehose_models.MessageFrame) -> None:
         # stop on next message if requested
@@ -113,37 +665,29 @@ def _run(name, operations_callback, stream_stop_event=None):
             client.stop()
             return
 
-        commit = parse_subscribe_repos_message(message)
-        if not isinstance(commit, models.ComAtprotoSyncSubscribeRepos.Commit):
-            return
+        _record(recorder, message)
+        pipeline.submit(message)
+        checkpointer.tick()
 
-        # update stored state every ~1k events
-        if commit.seq % 1000 == 0:  # lower value could lead to performance issues
-            logger.debug(f"Updated cursor for {name} to {commit.seq}")
-            client.update_params(
-                models.ComAtprotoSyncSubscribeRepos.Params(cursor=commit.seq)
-            )
-            # Atomically create or update the subscription state
-            SubscriptionState.insert(service=name, cursor=commit.seq).on_conflict(
-                conflict_target=(SubscriptionState.service,),  # service is unique
-                action="UPDATE",
-                update={SubscriptionState.cursor: commit.seq},
-            ).execute()
-
-        logger.debug(
-            f"data_stream: Commit seq {commit.seq}, has blocks: {bool(commit.blocks)}"
-        )
-        if not commit.blocks:
+    client.start(on_message_handler)
+
+
+async def _run_async(name, pipeline, source, stream_stop_event=None, recorder=None):
+    cursor = await asyncio.to_thread(_initial_cursor, name, pipeline)
+    client = source.async_client(cursor)
+    checkpointer = _checkpointer(name, pipeline, client, source, cursor)
+
+    async def on_message_handler(message: firehose_models.MessageFrame) -> None:
+        if stream_stop_event and stream_stop_event.is_set():
+            await client.stop()
             return
-        try:
-            operations_callback(_get_ops_by_type(commit))
-        except Exception as e:
-            logger.error(
-                f"CRITICAL ERROR during operations_callback for commit seq {commit.seq}, repo {commit.repo}: {e}",
-                exc_info=True,
-            )
-            # Optionally, re-raise or stop the client if errors are too frequent or severe
-            # For now, logging the full traceback and continuing might allow us to see the problematic data
-            # client.stop() # to stop the firehose on error
 
-    client.start(on_message_handler)
+        _record(recorder, message)
+        if pipeline.would_block(message):
+            # wait for room off the loop so requests keep being served
+            await asyncio.to_thread(pipeline.submit, message)
+        else:
+            pipeline.submit(message)
+        checkpointer.tick()
+
+    await client.start(on_message_handler)
@@ -1,4 +1,7 @@
+import logging
 import os
+import sqlite3
+import threading
 from datetime import datetime
 from pathlib import Path
 
@@ -7,6 +10,8 @@ import peewee
 # Import settings from the new config location
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
 # Ensure the database directory exists
 db_path = Path(settings.DATABASE_URI)
 if db_path.name != settings.DATABASE_URI:  # True if DATABASE_URI includes a path
@@ -14,40 +19,168 @@ if db_path.name != settings.DATABASE_URI:  # True if DATABASE_URI includes a pat
     if not db_parent_dir.exists():
         os.makedirs(db_parent_dir, exist_ok=True)
 
-db = peewee.SqliteDatabase(settings.DATABASE_URI)
+# Applied to every connection as it is opened, not just the first one
+_PRAGMAS = {
+    # Set busy timeout to avoid lock errors
+    "busy_timeout": 5000,
+    # Ensure we read latest data
+    "read_uncommitted": 1,
+}
+
+# Every connection to ":memory:" opens a database of its own, which the writer
+# and reader threads would never see; they all share one in-memory database
+# instead, kept alive by the connection configure_db opens.
+_IN_MEMORY = settings.DATABASE_URI == ":memory:"
+_MEMORY_URI = "file::memory:?cache=shared"
+
+# peewee keeps one connection per thread open until it is closed explicitly
+db = peewee.SqliteDatabase(
+    _MEMORY_URI if _IN_MEMORY else settings.DATABASE_URI,
+    pragmas=_PRAGMAS,
+    uri=_IN_MEMORY,
+)
+
+_readers = threading.local()
 
 
 def configure_db():
     """Configure database with proper WAL settings"""
     db.connect(reuse_if_open=True)
-    # Enable WAL mode for better concurrency
+    # Let retention hand freed pages back to the filesystem. Only takes effect
+    # for new databases; migrate_db runs the VACUUM that converts existing ones.
+    db.execute_sql("PRAGMA auto_vacuum=INCREMENTAL")
+    # Enable WAL mode for better concurrency (persistent for the database file)
     db.execute_sql("PRAGMA journal_mode=WAL")
-    # Set busy timeout to avoid lock errors
-    db.execute_sql("PRAGMA busy_timeout=5000")
-    # Ensure we read latest data
-    db.execute_sql("PRAGMA read_uncommitted=1")
     # Auto-checkpoint at 1000 pages
     db.execute_sql("PRAGMA wal_autocheckpoint=1000")
 
 
+def _connect(uri: str, **kwargs) -> sqlite3.Connection:
+    conn = sqlite3.connect(uri, uri=True, isolation_level=None, **kwargs)
+    for pragma, value in _PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+
+def reader() -> sqlite3.Connection:
+    """This thread's long-lived, read-only connection for serving feeds.
+
+    Queries run through it should use constant SQL text so sqlite3's statement
+    cache hands back an already prepared statement.
+    """
+    conn = getattr(_readers, "conn", None)
+    if conn is None:
+        if _IN_MEMORY:
+            uri = _MEMORY_URI
+        else:
+            uri = f"{Path(settings.DATABASE_URI).resolve().as_uri()}?mode=ro"
+        conn = _readers.conn = _connect(uri)
+    return conn
+
+
+def writer_connection() -> sqlite3.Connection:
+    """A new read-write connection for a background writer (posts, retention).
+
+    It runs in autocommit mode; the owner brackets its writes in
+    BEGIN IMMEDIATE ... COMMIT itself.
+    """
+    if _IN_MEMORY:
+        uri = _MEMORY_URI
+    else:
+        uri = Path(settings.DATABASE_URI).resolve().as_uri()
+    # each owner serializes its own use, but may write from any thread
+    return _connect(uri, check_same_thread=False)
+
+
 class BaseModel(peewee.Model):
     class Meta:
         database = db
 
 
 class Post(BaseModel):
-    uri = peewee.CharField(index=True)
+    # storage partition: the feed's record key ("" for the single FEED_URI feed)
+    feed = peewee.CharField(default="")
+    uri = peewee.CharField()
     cid = peewee.CharField()
     reply_parent = peewee.CharField(null=True, default=None)
     reply_root = peewee.CharField(null=True, default=None)
     indexed_at = peewee.DateTimeField(default=datetime.utcnow)
 
 
+# A post is stored once per feed it belongs to. Deletes look rows up by uri alone,
+# so uri leads.
+Post.add_index(Post.uri, Post.feed, unique=True, name="post_uri_feed")
+# Covering index for feed pages: keyset pagination on (indexed_at, cid) within a
+# feed is an index range scan, and uri is read from the index without touching
+# the table.
+Post.add_index(
+    Post.feed,
+    Post.indexed_at.desc(),
+    Post.cid.desc(),
+    Post.uri,
+    name="post_feed_indexed_at_cid_uri",
+)
+
+
+_FEED_HEAD_SQL = (
+    "SELECT indexed_at, cid, uri FROM post WHERE feed = ?"
+    " ORDER BY indexed_at DESC, cid DESC LIMIT ?"
+)
+# row-value comparison lets SQLite seek straight into post_feed_indexed_at_cid_uri
+_FEED_PAGE_SQL = (
+    "SELECT indexed_at, cid, uri FROM post WHERE feed = ? AND (indexed_at, cid) < (?, ?)"
+    " ORDER BY indexed_at DESC, cid DESC LIMIT ?"
+)
+
+
+def feed_page(
+    feed: str, before: tuple[datetime, str] | None, limit: int
+) -> list[tuple[datetime, str, str]]:
+    """(indexed_at, cid, uri) of up to `limit` posts in `feed` older than `before`, newest first."""
+    if before is None:
+        rows = reader().execute(_FEED_HEAD_SQL, (feed, limit))
+    else:
+        indexed_at, cid = before
+        rows = reader().execute(_FEED_PAGE_SQL, (feed, str(indexed_at), cid, limit))
+    to_datetime = Post.indexed_at.python_value
+    return [(to_datetime(indexed_at), cid, uri) for indexed_at, cid, uri in rows]
+
+
 class SubscriptionState(BaseModel):
     service = peewee.CharField(unique=True)
     cursor = peewee.BigIntegerField()
 
 
-# Configure and create tables
+def migrate_db():
+    """Upgrade tables created by older versions in place, before create_tables."""
+    if not db.table_exists("post"):
+        return
+    if db.execute_sql("PRAGMA auto_vacuum").fetchone()[0] == 0:
+        # created before configure_db enabled incremental vacuum; a full VACUUM
+        # (once, rewriting the whole file) switches it over
+        logger.info("Vacuuming the database to enable incremental vacuum...")
+        db.execute_sql("VACUUM")
+    columns = {column.name for column in db.get_columns("post")}
+    post_indexes = {name for _, name, *_ in db.execute_sql("PRAGMA index_list(post)")}
+    with db.atomic():
+        if "feed" not in columns:
+            # rows written before multi-feed support belong to the FEED_URI feed
+            db.execute_sql(
+                "ALTER TABLE post ADD COLUMN feed VARCHAR(255) NOT NULL DEFAULT ''"
+            )
+        if "post_uri_feed" not in post_indexes:
+            # uri used to have a plain or unique index of its own; replayed
+            # commits may have left duplicates behind the plain one
+            db.execute_sql(
+                "DELETE FROM post WHERE id NOT IN"
+                " (SELECT MIN(id) FROM post GROUP BY uri, feed)"
+            )
+        for old_index in ("post_uri", "post_indexed_at_cid_uri"):
+            if old_index in post_indexes:
+                db.execute_sql(f"DROP INDEX {old_index}")
+
+
+# Configure, migrate and create tables (and any missing indexes)
 configure_db()
+migrate_db()
 db.create_tables([Post, SubscriptionState], safe=True)
@@ -0,0 +1,25 @@
+from collections.abc import Callable
+
+from atproto_client.models.string_formats import AtUri
+from pydantic import BaseModel, Field, ImportString
+
+from bsky_feed_generator.server.filter_spec import FilterSpec
+
+# storage partition of the single feed configured through FEED_URI
+DEFAULT_FEED = ""
+
+
+class FeedConfig(BaseModel):
+    """One feed served by this process (an entry of the FEEDS setting)."""
+
+    uri: AtUri
+    filter: FilterSpec = Field(default_factory=FilterSpec)
+    custom_filter_function: ImportString[Callable[..., bool]] | None = Field(
+        default=None,
+        description="optional final filter stage, called as (record, created_post) like CUSTOM_FILTER_FUNCTION",
+    )
+
+    @property
+    def key(self) -> str:
+        """The feed's storage partition: the record key of its URI."""
+        return self.uri.rsplit("/", 1)[-1]
@@ -0,0 +1,222 @@
+import datetime
+import re
+import time
+
+from pydantic import BaseModel, Field, field_validator
+
+
+class FilterSpec(BaseModel):
+    """Declarative rules deciding which posts a feed includes.
+
+    All configured rules must pass. Keywords match whole words, ignoring case;
+    patterns are regular expressions, checked when the spec is loaded. A post
+    passes the text stage if any keyword or pattern matches, or if none are
+    configured.
+    """
+
+    keywords: list[str] = Field(default_factory=list)
+    patterns: list[str] = Field(default_factory=list)
+    exclude_keywords: list[str] = Field(default_factory=list)
+    exclude_patterns: list[str] = Field(default_factory=list)
+    langs: list[str] = Field(
+        default_factory=list,
+        description="only posts tagged with one of these languages ('en' also matches 'en-US')",
+    )
+    authors: list[str] = Field(
+        default_factory=list, description="only posts by these DIDs"
+    )
+    exclude_authors: list[str] = Field(default_factory=list)
+    ignore_replies: bool = False
+    ignore_archived: bool = False
+    archive_threshold: datetime.timedelta = datetime.timedelta(days=1)
+
+    @field_validator("patterns", "exclude_patterns")
+    @classmethod
+    def _compile_patterns(cls, patterns: list[str]) -> list[str]:
+        try:
+            _merge([], patterns)
+        except re.error as e:
+            raise ValueError(f"invalid pattern {e.pattern!r}: {e}") from None
+        return patterns
+
+    def compile(self) -> "CompiledFilter":
+        return CompiledFilter(self)
+
+
+# Patterns that cannot go into an alternation with others: global flags such as
+# (?i) are only allowed at the start of the whole regex, and the alternation
+# renumbers groups under backreferences. Escaped backslashes before a digit
+# match too, which only costs such a pattern a search of its own.
+_STANDALONE = re.compile(r"^\(\?[aiLmsux]+\)|\\[1-9]|\(\?P=")
+
+
+def _merge(keywords: list[str], patterns: list[str]) -> tuple[re.Pattern, ...]:
+    """Regexes, any of which matching means one of `keywords` (as whole words) or `patterns` does.
+
+    Everything goes into one alternation except patterns that need a regex of
+    their own (see `_STANDALONE`).
+    """
+    alternatives = []
+    standalone = []
+    if keywords:
+        # longest first, so a keyword is not shadowed by its own prefix
+        words = sorted({re.escape(k) for k in keywords}, key=len, reverse=True)
+        alternatives.append(rf"(?i:(?<!\w)(?:{'|'.join(words)})(?!\w))")
+    for pattern in patterns:
+        if _STANDALONE.search(pattern):
+            standalone.append(re.compile(pattern))
+        else:
+            re.compile(pattern)  # so an error names the pattern, not the alternation
+            alternatives.append(f"(?:{pattern})")
+    if alternatives:
+        standalone.insert(0, re.compile("|".join(alternatives)))
+    return tuple(standalone)
+
+
+def _utc_key(created_at) -> str | None:
+    """`created_at` as a UTC "YYYY-MM-DDTHH:MM:SS" string, or None if it is not a datetime.
+
+    Such strings sort like the datetimes they stand for. Nearly every post is
+    stamped in UTC, whose prefix is the key as is; other offsets are parsed.
+    """
+    try:
+        # the separators at 4, 7, 10, 13 and 16, in one slice
+        if created_at[4:17:3] == "--T::" and (
+            created_at[-1] == "Z" or created_at[-6:] == "+00:00"
+        ):
+            return created_at[:19]
+        created = datetime.datetime.fromisoformat(created_at)
+    except (TypeError, ValueError):
+        return None
+    if created.tzinfo is not None:
+        created = created.astimezone(datetime.timezone.utc)
+    return created.replace(tzinfo=None).isoformat(timespec="seconds")
+
+
+# no UTC offset is larger, so a timestamp this far past the cutoff is after it
+_MAX_UTC_OFFSET = datetime.timedelta(hours=14)
+
+
+class ArchiveCutoff:
+    """Tells posts created more than `threshold` ago without parsing most dates.
+
+    RFC 3339 timestamps sort like the times they stand for, give or take the
+    UTC offset. A post stamped `_MAX_UTC_OFFSET` past the cutoff is recent
+    after one string comparison; only the rest are compared by `_utc_key`.
+    `refresh` reads the clock, at most once a second; filters call it once
+    per batch.
+    """
+
+    __slots__ = ("threshold", "_key", "_recent", "_expires")
+
+    def __init__(self, threshold: datetime.timedelta) -> None:
+        self.threshold = threshold
+        self._key = self._recent = ""
+        self._expires = float("-inf")
+
+    def refresh(self) -> None:
+        """Move the cutoff to `threshold` before now."""
+        now = time.monotonic()
+        if now >= self._expires:
+            cutoff = datetime.datetime.now(datetime.timezone.utc) - self.threshold
+            cutoff = cutoff.replace(tzinfo=None)
+            self._key = cutoff.isoformat(timespec="seconds")
+            self._recent = (cutoff + _MAX_UTC_OFFSET).isoformat(timespec="seconds")
+            self._expires = now + 1
+
+    def is_older(self, created_at: str) -> bool:
+        """Whether `created_at` is before the cutoff of the last `refresh`; malformed dates are not."""
+        try:
+            if created_at >= self._recent:
+                return False
+        except TypeError:
+            return False
+        created = _utc_key(created_at)
+        return created is not None and created < self._key
+
+    def __call__(self, created_at: str) -> bool:
+        self.refresh()
+        return self.is_older(created_at)
+
+
+_cutoffs: dict[datetime.timedelta, ArchiveCutoff] = {}
+
+
+def is_archived(created_at: str, threshold: datetime.timedelta) -> bool:
+    cutoff = _cutoffs.get(threshold)
+    if cutoff is None:
+        cutoff = _cutoffs[threshold] = ArchiveCutoff(threshold)
+    return cutoff(created_at)
+
+
+class CompiledFilter:
+    """A `FilterSpec` compiled for evaluating many posts.
+
+    Rules run cheapest first: author sets, reply and language checks, the
+    archive check, then regex searches over the text: one for the exclude
+    rules and one for the include rules, plus one per pattern that cannot be
+    merged with the others.
+    """
+
+    __slots__ = (
+        "authors",
+        "exclude_authors",
+        "langs",
+        "ignore_replies",
+        "ignore_archived",
+        "archive_cutoff",
+        "include",
+        "exclude",
+    )
+
+    def __init__(self, spec: FilterSpec) -> None:
+        self.authors = frozenset(spec.authors)
+        self.exclude_authors = frozenset(spec.exclude_authors)
+        self.langs = frozenset(lang.lower() for lang in spec.langs)
+        self.ignore_replies = spec.ignore_replies
+        self.ignore_archived = spec.ignore_archived
+        self.archive_cutoff = ArchiveCutoff(spec.archive_threshold)
+        self.include = _merge(spec.keywords, spec.patterns)
+        self.exclude = _merge(spec.exclude_keywords, spec.exclude_patterns)
+
+    def _lang_matches(self, post_langs: list[str] | None) -> bool:
+        return any(
+            lang.lower() in self.langs or lang.split("-", 1)[0].lower() in self.langs
+            for lang in post_langs or ()
+        )
+
+    def __call__(self, created_post: dict) -> bool:
+        if self.ignore_archived:
+            self.archive_cutoff.refresh()
+        return self._matches(created_post)
+
+    def select(self, created_posts: list[dict]) -> list[int]:
+        """Indexes of the posts in `created_posts` that pass, reading the clock once."""
+        if self.ignore_archived:
+            self.archive_cutoff.refresh()
+        return [i for i, post in enumerate(created_posts) if self._matches(post)]
+
+    def _matches(self, created_post: dict) -> bool:
+        record = created_post["record"]
+        author = created_post.get("author")
+        if self.authors and author not in self.authors:
+            return False
+        if author in self.exclude_authors:
+            return False
+        if self.ignore_replies and record.reply:
+            return False
+        if self.langs and not self._lang_matches(record.langs):
+            return False
+        if self.ignore_archived and self.archive_cutoff.is_older(record.created_at):
+            return False
+
+        text = record.text or ""
+        for regex in self.exclude:
+            if regex.search(text):
+                return False
+        if not self.include:
+            return True
+        for regex in self.include:
+            if regex.search(text):
+                return True
+        return False
@@ -0,0 +1,251 @@
+"""Files of recorded firehose frames, for replaying ingestion offline.
+
+A frame log starts with MAGIC, followed by one record per frame:
+`seq (u64) | length (u32) | frame`, big-endian. `frame` is the websocket
+message as the relay sends it (a DAG-CBOR header followed by a DAG-CBOR
+body), so a replay goes through the same decoding as a live subscription.
+
+Logs whose name ends in ".gz" are gzip-compressed; each append adds a gzip
+member, which readers see as one stream. A recording (see SegmentRecorder) is
+a directory of compressed logs, one per segment of the firehose.
+"""
+
+import gzip
+import io
+import logging
+import queue
+import struct
+import threading
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import BinaryIO
+
+import libipld
+from atproto import firehose_models
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BSKYFRM1"
+_RECORD = struct.Struct(">QI")
+_GZIP_MAGIC = b"\x1f\x8b"
+SEGMENT_SUFFIX = ".frames.gz"
+
+
+def encode_frame(frame: firehose_models.MessageFrame) -> bytes:
+    """The websocket message `frame` was decoded from."""
+    header = {"op": 1, "t": frame.header.t}
+    return libipld.encode_dag_cbor(header) + libipld.encode_dag_cbor(frame.body)
+
+
+def decode_frame(data: bytes) -> firehose_models.MessageFrame:
+    """Decode a websocket message the way the firehose client does."""
+    frame = firehose_models.Frame.from_bytes(data)
+    if not isinstance(frame, firehose_models.MessageFrame):
+        raise ValueError(f"not a message frame: {frame}")
+    return frame
+
+
+class FrameLogWriter:
+    """Appends frames to a frame log, creating it if needed."""
+
+    def __init__(self, path: str | Path) -> None:
+        path = Path(path)
+        new = not path.exists() or path.stat().st_size == 0
+        self._file: io.BufferedIOBase
+        if path.suffix == ".gz":
+            # level 1: recording has to keep up with the firehose
+            self._file = gzip.open(path, "ab", compresslevel=1)
+        else:
+            self._file = open(path, "ab")
+        if new:
+            self._file.write(MAGIC)
+        self.frames = 0
+
+    def write(self, seq: int, data: bytes) -> None:
+        self._file.write(_RECORD.pack(seq, len(data)))
+        self._file.write(data)
+        self.frames += 1
+
+    def flush(self) -> None:
+        """Make everything written so far readable, even if the process dies."""
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "FrameLogWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_frame_log(path: str | Path, frames: Iterable[tuple[int, bytes]]) -> int:
+    """Append `(seq, frame)` pairs to `path`; returns the number written."""
+    with FrameLogWriter(path) as log:
+        for seq, data in frames:
+            log.write(seq, data)
+        return log.frames
+
+
+def read_frame_log(
+    path: str | Path, cursor: int | None = None
+) -> Iterator[tuple[int, bytes]]:
+    """Yield the `(seq, frame)` pairs of a frame log, only those after `cursor` if given."""
+    with _open(path) as f:
+        try:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a frame log")
+            while header := f.read(_RECORD.size):
+                if len(header) < _RECORD.size:
+                    raise ValueError(f"{path} ends in a truncated record")
+                seq, length = _RECORD.unpack(header)
+                if cursor is not None and seq <= cursor:
+                    f.seek(length, 1)
+                    continue
+                data = f.read(length)
+                if len(data) < length:
+                    raise ValueError(f"{path} ends in a truncated record")
+                yield seq, data
+        except EOFError:
+            # a gzip member cut short, e.g. by a crash while recording
+            raise ValueError(f"{path} ends in a truncated record") from None
+
+
+def _open(path: str | Path) -> BinaryIO:
+    f = open(path, "rb")
+    if f.read(len(_GZIP_MAGIC)) == _GZIP_MAGIC:
+        f.seek(0)
+        return gzip.GzipFile(fileobj=f, mode="rb")  # type: ignore[return-value]
+    f.seek(0)
+    return f
+
+
+class SegmentRecorder:
+    """Records frames into `directory` as compressed frame logs of `segment_frames` frames.
+
+    Segments are named after their first seq, so they sort in firehose order,
+    and are flushed every `flush_every` frames: a crash loses at most that many.
+    Frames the relay sends again after a reconnect are recorded once.
+
+    Encoding and compression run on a thread of their own, so the websocket
+    reader only queues frames. If `queue_size` frames are waiting, new ones are
+    dropped (and logged) rather than holding up ingestion.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        segment_frames: int = 100_000,
+        flush_every: int = 1000,
+        queue_size: int = 10_000,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_frames = segment_frames
+        self.flush_every = flush_every
+        self._log: FrameLogWriter | None = None
+        self._last_seq = -1
+        self.frames = 0
+        self.dropped = 0
+        self._queue: queue.Queue[
+            tuple[int, bytes | firehose_models.MessageFrame] | None
+        ] = queue.Queue(queue_size)
+        self._thread = threading.Thread(
+            target=self._run, name="frame-recorder", daemon=True
+        )
+        self._thread.start()
+
+    def record(self, frame: firehose_models.MessageFrame) -> None:
+        """Queue a decoded frame; it is encoded back to the relay's bytes when written."""
+        if (seq := frame.body.get("seq")) is not None:
+            self._put(seq, frame)
+
+    def write(self, seq: int, data: bytes) -> None:
+        """Queue the websocket message of frame `seq`."""
+        self._put(seq, data)
+
+    def _put(self, seq: int, frame: bytes | firehose_models.MessageFrame) -> None:
+        try:
+            self._queue.put_nowait((seq, frame))
+        except queue.Full:
+            if not self.dropped:
+                logger.warning("Frame recorder is falling behind; dropping frames")
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while (item := self._queue.get()) is not None:
+            seq, frame = item
+            if seq <= self._last_seq:
+                continue
+            try:
+                # the client only hands out decoded frames; re-encoding gives
+                # back the relay's bytes, since DAG-CBOR encoding is canonical
+                data = frame if isinstance(frame, bytes) else encode_frame(frame)
+                self._write(seq, data)
+            except Exception as e:
+                logger.error(f"Failed to record frame seq {seq}: {e}", exc_info=True)
+
+    def _write(self, seq: int, data: bytes) -> None:
+        self._last_seq = seq
+        if self._log is None or self._log.frames >= self.segment_frames:
+            self._rotate(seq)
+        self._log.write(seq, data)  # type: ignore[union-attr]
+        self.frames += 1
+        if self.frames % self.flush_every == 0:
+            self._log.flush()  # type: ignore[union-attr]
+
+    def _rotate(self, seq: int) -> None:
+        if self._log:
+            self._log.close()
+        path = self.directory / f"{seq:020d}{SEGMENT_SUFFIX}"
+        n = 0
+        while path.exists():
+            # restarted from the same cursor as an earlier recording
+            n += 1
+            path = self.directory / f"{seq:020d}.{n}{SEGMENT_SUFFIX}"
+        logger.info(f"Recording firehose frames to {path}")
+        self._log = FrameLogWriter(path)
+
+    def close(self) -> None:
+        """Write out the frames still queued and close the current segment."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._log:
+            self._log.close()
+            self._log = None
+        if self.dropped:
+            logger.warning(f"Frame recorder dropped {self.dropped} frames")
+
+    def __enter__(self) -> "SegmentRecorder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def read_recording(
+    path: str | Path, cursor: int | None = None
+) -> Iterator[tuple[int, bytes]]:
+    """Yield the `(seq, frame)` pairs after `cursor` of a recording or a single frame log.
+
+    Frames are yielded in increasing seq order. Segments overlap when recording
+    restarted from an older cursor; frames already yielded are skipped. A
+    segment cut short by a crash is read up to the cut, with a warning.
+    """
+    path = Path(path)
+    if not path.is_dir():
+        yield from read_frame_log(path, cursor)
+        return
+
+    last = cursor
+    for segment in sorted(path.glob(f"*{SEGMENT_SUFFIX}")):
+        try:
+            for seq, data in read_frame_log(segment, last):
+                if last is not None and seq <= last:
+                    continue
+                last = seq
+                yield seq, data
+        except ValueError as e:
+            logger.warning(f"Skipping the rest of a recording segment: {e}")
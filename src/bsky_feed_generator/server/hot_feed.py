@@ -0,0 +1,124 @@
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from bsky_feed_generator.server.config import settings
+from bsky_feed_generator.server.database import feed_page
+from bsky_feed_generator.server.feeds import DEFAULT_FEED
+
+# (indexed_at, cid, uri): sorts like the feed, oldest first
+FeedItem = tuple[datetime, str, str]
+
+
+class HotFeed:
+    """The newest `size` items of one feed, held in memory in feed order.
+
+    Warmed from the `Post` table on first use and then kept in sync by the post
+    writer after each committed flush. `page` answers any cursor whose page lies
+    entirely inside the window and returns None when the caller has to fall back
+    to SQLite.
+    """
+
+    def __init__(self, size: int, feed: str = DEFAULT_FEED) -> None:
+        self.size = size
+        self.feed = feed
+        self._lock = threading.Lock()
+        self._items: list[FeedItem] = []
+        self._keys: dict[str, FeedItem] = {}
+        self._warm = False
+        # True while the window holds every row of the table
+        self._complete = False
+
+    def reset(self) -> None:
+        """Forget the window; the next call re-warms it from the table."""
+        with self._lock:
+            self._items.clear()
+            self._keys.clear()
+            self._warm = self._complete = False
+
+    def _ensure_warm(self) -> None:
+        if self._warm:
+            return
+        loaded = feed_page(self.feed, None, self.size)
+        for item in loaded:
+            if item[2] not in self._keys:
+                insort(self._items, item)
+                self._keys[item[2]] = item
+        self._complete = len(loaded) < self.size
+        self._warm = True
+        self._evict()
+
+    def _evict(self) -> None:
+        overflow = len(self._items) - self.size
+        if overflow > 0:
+            for item in self._items[:overflow]:
+                del self._keys[item[2]]
+            del self._items[:overflow]
+            self._complete = False
+
+    def add(self, items: list[FeedItem]) -> None:
+        with self._lock:
+            self._ensure_warm()
+            for item in items:
+                if item[2] in self._keys:
+                    continue
+                if not self._items or item > self._items[-1]:
+                    self._items.append(item)
+                else:
+                    insort(self._items, item)
+                self._keys[item[2]] = item
+            self._evict()
+
+    def remove(self, uris: list[str]) -> None:
+        with self._lock:
+            if not self._warm:
+                return
+            for uri in uris:
+                if item := self._keys.pop(uri, None):
+                    del self._items[bisect_left(self._items, item)]
+
+    def page(
+        self, before: tuple[datetime, str] | None, limit: int
+    ) -> list[FeedItem] | None:
+        """Up to `limit` items older than `before`, newest first; None on a miss."""
+        with self._lock:
+            self._ensure_warm()
+            end = (
+                len(self._items) if before is None else bisect_left(self._items, before)
+            )
+            start = max(0, end - limit)
+            if end - start < limit and not self._complete:
+                # the page runs past the window; older rows only exist in SQLite
+                return None
+            return self._items[start:end][::-1]
+
+
+class HotFeeds:
+    """One lazily created `HotFeed` per feed partition."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._lock = threading.Lock()
+        self._feeds: dict[str, HotFeed] = {}
+
+    def __getitem__(self, feed: str) -> HotFeed:
+        hot = self._feeds.get(feed)
+        if hot is None:
+            with self._lock:
+                hot = self._feeds.setdefault(feed, HotFeed(self.size, feed))
+        return hot
+
+    def add(self, items_by_feed: dict[str, list[FeedItem]]) -> None:
+        for feed, items in items_by_feed.items():
+            self[feed].add(items)
+
+    def remove(self, uris: list[str]) -> None:
+        for hot in list(self._feeds.values()):
+            hot.remove(uris)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._feeds.clear()
+
+
+hot_feeds = HotFeeds(settings.HOT_FEED_SIZE)
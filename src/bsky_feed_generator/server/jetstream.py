@@ -0,0 +1,230 @@
+"""Client for Jetstream, a JSON re-encoding of the firehose.
+
+Jetstream (https://github.com/bluesky-social/jetstream) sends one small JSON
+object per record operation, with the record inline and filtered server-side
+by collection, so nothing has to decode CAR files or DAG-CBOR. Its cursor is
+the `time_us` of an event, a Unix timestamp in microseconds.
+
+With `compress=true` every message is a zstd frame compressed against
+Jetstream's dictionary (zstd_dictionary in the Jetstream repository); reading
+those needs the optional `zstandard` package:
+pip install 'bsky-feed-generator[jetstream]'.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import socket
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from urllib.parse import urlencode
+
+from websockets.asyncio.client import connect as aconnect
+from websockets.exceptions import (
+    ConnectionClosedError,
+    ConnectionClosedOK,
+    InvalidHandshake,
+    ProtocolError,
+)
+from websockets.sync.client import connect
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URI = "wss://jetstream2.us-east.bsky.network/subscribe"
+
+_MAX_MESSAGE_SIZE_BYTES = 1024 * 1024 * 5
+_MAX_RECONNECT_DELAY = 64
+# lost connections are retried; anything else ends `start` with the error
+_RECONNECT_ERRORS = (
+    TimeoutError,
+    ConnectionError,
+    ConnectionClosedError,
+    InvalidHandshake,
+    ProtocolError,
+    socket.gaierror,
+)
+
+
+class JetstreamEvent:
+    """A Jetstream commit event, shaped like a firehose `MessageFrame` for `IngestPipeline`.
+
+    `body` is the decoded event, with `repo` set to its `did` and `seq` to its
+    `time_us` (moved up a microsecond at a time when events share one).
+    """
+
+    __slots__ = ("body",)
+    type = "#commit"
+
+    def __init__(self, body: dict) -> None:
+        self.body = body
+
+    def __getstate__(self) -> dict:
+        return self.body
+
+    def __setstate__(self, body: dict) -> None:
+        self.body = body
+
+
+def zstd_decompressor(dictionary: bytes) -> Callable[[bytes], bytes]:
+    """Decompress messages of a `compress=true` subscription."""
+    try:
+        import zstandard  # type: ignore[import-not-found]
+    except ImportError:
+        raise RuntimeError(
+            "compressed Jetstream messages need zstandard: pip install 'bsky-feed-generator[jetstream]'"
+        ) from None
+
+    decompressor = zstandard.ZstdDecompressor(
+        dict_data=zstandard.ZstdCompressionDict(dictionary)
+    )
+    # Jetstream's frames do not always declare their decompressed size
+    return lambda data: decompressor.decompressobj().decompress(data)
+
+
+def subscribe_uri(
+    base_uri: str,
+    collections: Iterable[str] | None = None,
+    cursor: int | None = None,
+    compress: bool = False,
+) -> str:
+    params: list[tuple[str, str | int]] = [
+        ("wantedCollections", collection) for collection in sorted(collections or ())
+    ]
+    if cursor is not None:
+        params.append(("cursor", cursor))
+    if compress:
+        params.append(("compress", "true"))
+    return f"{base_uri}?{urlencode(params)}" if params else base_uri
+
+
+class _JetstreamClientBase:
+    """Mirrors atproto's firehose clients: `params` is `{"cursor": time_us}` or None.
+
+    Unlike those, a reconnect resumes from the last event received rather
+    than from `params`: everything received was handed to `on_message`.
+    """
+
+    def __init__(
+        self,
+        params: dict | None = None,
+        base_uri: str = DEFAULT_URI,
+        collections: Iterable[str] | None = None,
+        dictionary: bytes | None = None,
+    ) -> None:
+        self._params = dict(params or {})
+        self._base_uri = base_uri
+        self._collections = frozenset(collections or ())
+        self._decompress = zstd_decompressor(dictionary) if dictionary else None
+        self._reconnect_no = 0
+        self._last_seq = -1
+        self._received: int | None = None
+
+    def update_params(self, params: dict | None) -> None:
+        self._params = dict(params or {})
+
+    @property
+    def _uri(self) -> str:
+        cursor = self._params.get("cursor")
+        if self._received is not None:
+            # Jetstream sends the cursor's own event again; it is skipped as replayed
+            cursor = self._received
+        return subscribe_uri(
+            self._base_uri,
+            self._collections,
+            cursor,
+            compress=self._decompress is not None,
+        )
+
+    def _reconnect_delay(self) -> float:
+        return min(2**self._reconnect_no, _MAX_RECONNECT_DELAY) + random.uniform(
+            -0.5, 0.5
+        )
+
+    def _event(self, message: str | bytes) -> JetstreamEvent | None:
+        """The commit event in `message`, or None for other kinds and bad messages."""
+        try:
+            if self._decompress is not None and isinstance(message, bytes):
+                message = self._decompress(message)
+            body = json.loads(message)
+        except Exception as e:
+            logger.error(f"Skipping undecodable Jetstream message: {e}")
+            return None
+        if body.get("kind") != "commit":
+            return None
+        # events of one commit can share a time_us, but the pipeline skips an
+        # event whose seq is not above the last one as replayed
+        seq = max(body["time_us"], self._last_seq + 1)
+        self._last_seq = seq
+        self._received = body["time_us"]
+        body["seq"] = seq
+        body["repo"] = body["did"]
+        return JetstreamEvent(body)
+
+    def _connection_lost(self, e: Exception) -> None:
+        self._reconnect_no += 1
+        logger.warning(
+            f"Jetstream connection lost ({e!r}); reconnecting (attempt {self._reconnect_no})"
+        )
+
+
+class JetstreamClient(_JetstreamClientBase):
+    """Blocking Jetstream subscription, like `FirehoseSubscribeReposClient`."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._stopped = False
+
+    def start(self, on_message: Callable[[JetstreamEvent], None]) -> None:
+        """Call `on_message` with every commit event until `stop` or a normal close."""
+        while not self._stopped:
+            try:
+                if self._reconnect_no:
+                    time.sleep(self._reconnect_delay())
+                with connect(
+                    self._uri, max_size=_MAX_MESSAGE_SIZE_BYTES, close_timeout=0.1
+                ) as websocket:
+                    self._reconnect_no = 0
+                    self._last_seq = -1
+                    while not self._stopped:
+                        if event := self._event(websocket.recv()):
+                            on_message(event)
+            except ConnectionClosedOK:
+                return
+            except _RECONNECT_ERRORS as e:
+                self._connection_lost(e)
+
+    def stop(self) -> None:
+        """Stop on the next message."""
+        self._stopped = True
+
+
+class AsyncJetstreamClient(_JetstreamClientBase):
+    """Jetstream subscription on the event loop, like `AsyncFirehoseSubscribeReposClient`."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._stop_event = asyncio.Event()
+
+    async def start(
+        self, on_message: Callable[[JetstreamEvent], Awaitable[None]]
+    ) -> None:
+        while not self._stop_event.is_set():
+            try:
+                if self._reconnect_no:
+                    await asyncio.sleep(self._reconnect_delay())
+                async with aconnect(
+                    self._uri, max_size=_MAX_MESSAGE_SIZE_BYTES, close_timeout=0.1
+                ) as websocket:
+                    self._reconnect_no = 0
+                    self._last_seq = -1
+                    while not self._stop_event.is_set():
+                        if event := self._event(await websocket.recv()):
+                            await on_message(event)
+            except ConnectionClosedOK:
+                return
+            except _RECONNECT_ERRORS as e:
+                self._connection_lost(e)
+
+    async def stop(self) -> None:
+        self._stop_event.set()
@@ -0,0 +1,353 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from datetime import datetime
+from typing import Literal
+
+from atproto import firehose_models
+
+from bsky_feed_generator.server import metrics
+
+logger = logging.getLogger(__name__)
+
+BatchHandler = Callable[[list[firehose_models.MessageFrame]], None]
+
+FRAMES = metrics.counter(
+    "feedgen_stream_frames_total",
+    "Stream frames by what the pipeline did with them (queued, replayed, dropped, skipped, other)",
+    ["result"],
+)
+_QUEUED = FRAMES.labels("queued")
+_REPLAYED = FRAMES.labels("replayed")
+_DROPPED = FRAMES.labels("dropped")
+_SKIPPED = FRAMES.labels("skipped")
+_OTHER = FRAMES.labels("other")
+QUEUE_DEPTH = metrics.gauge(
+    "feedgen_ingest_queue_depth", "Frames waiting in the ingest lanes"
+)
+LAST_SEQ = metrics.gauge(
+    "feedgen_stream_last_seq", "Seq of the newest commit received from the stream"
+)
+LAG_SECONDS = metrics.gauge(
+    "feedgen_stream_lag_seconds",
+    "How long before it was received the newest commit was made, by its commit time",
+)
+CATCHING_UP = metrics.gauge(
+    "feedgen_stream_catching_up", "1 while ingestion is in catch-up mode, else 0"
+)
+
+
+def commit_time(body: dict) -> float | None:
+    """When the commit of a frame `body` was made, as a Unix timestamp.
+
+    That is its `time` for a relay frame and its `time_us` for a Jetstream event.
+    """
+    try:
+        if (time_us := body.get("time_us")) is not None:
+            return time_us / 1_000_000
+        return datetime.fromisoformat(body["time"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, AttributeError, TypeError, ValueError):
+        return None
+
+
+class SeqTracker:
+    """Tracks in-flight commit seqs so the cursor never advances past unfinished work.
+
+    Seqs must be started in the order the relay delivers them. They may finish in
+    any order; `watermark` is the highest seq for which it and every earlier seq
+    have finished.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: deque[int] = deque()
+        self._finished: set[int] = set()
+        self.watermark: int | None = None
+
+    def start(self, seq: int) -> None:
+        with self._lock:
+            self._pending.append(seq)
+
+    def finish(self, seq: int) -> int | None:
+        with self._lock:
+            self._finished.add(seq)
+            while self._pending and self._pending[0] in self._finished:
+                self.watermark = self._pending.popleft()
+                self._finished.discard(self.watermark)
+            return self.watermark
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+
+class CursorCheckpointer:
+    """Saves the tracker's watermark every `every_events` frames or `every_seconds`.
+
+    `save` is only called when the watermark moved past the last saved cursor,
+    so a restart replays at most one interval of already processed commits.
+    """
+
+    def __init__(
+        self,
+        tracker: SeqTracker,
+        save: Callable[[int], None],
+        every_events: int,
+        every_seconds: float,
+        saved: int | None = None,
+    ) -> None:
+        self._tracker = tracker
+        self._save = save
+        self.every_events = every_events
+        self.every_seconds = every_seconds
+        self.saved = saved
+        self._events = 0
+        self._last = time.monotonic()
+
+    def tick(self) -> None:
+        """Count one frame and save the watermark if an interval has elapsed."""
+        self._events += 1
+        if (
+            self._events >= self.every_events
+            or time.monotonic() - self._last >= self.every_seconds
+        ):
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        self._events = 0
+        self._last = time.monotonic()
+        watermark = self._tracker.watermark
+        if watermark is None or (self.saved is not None and watermark <= self.saved):
+            return
+        self.saved = watermark
+        self._save(watermark)
+
+
+class CatchUpMonitor:
+    """Switches ingestion into catch-up mode while the stream lags behind.
+
+    A background thread reads the pipeline's `lag_seconds` every `interval`.
+    Past `enter_lag` it calls `on_change(True, lag)`; only once the lag is back
+    under `exit_lag` does it call `on_change(False, lag)`. The gap between the
+    two thresholds keeps a lag hovering around one of them from flapping
+    between modes. Stopping the monitor leaves catch-up mode, with a lag of None.
+    """
+
+    def __init__(
+        self,
+        pipeline: "IngestPipeline",
+        on_change: Callable[[bool, float | None], None],
+        enter_lag: float,
+        exit_lag: float,
+        interval: float = 1.0,
+    ) -> None:
+        self._pipeline = pipeline
+        self._on_change = on_change
+        self.enter_lag = enter_lag
+        self.exit_lag = min(exit_lag, enter_lag)
+        self.interval = interval
+        self.active = False
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def check(self) -> bool:
+        """Switch modes if the lag crossed a threshold; True while catching up."""
+        lag = self._pipeline.lag_seconds
+        if lag is not None:
+            if not self.active and lag > self.enter_lag:
+                self._switch(True, lag)
+            elif self.active and lag < self.exit_lag:
+                self._switch(False, lag)
+        return self.active
+
+    def _switch(self, active: bool, lag: float | None) -> None:
+        self.active = active
+        CATCHING_UP.set(int(active))
+        self._on_change(active, lag)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="catch-up-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self.active:
+            self._switch(False, None)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Catch-up mode check failed: {e}", exc_info=True)
+
+
+class IngestPipeline:
+    """Reader -> bounded lanes -> worker threads.
+
+    The reader only hands frames to `submit`. Commits are sharded across lanes by
+    repo DID, so operations from one repo are always handled in order, while
+    different repos are decoded and filtered concurrently. Each worker hands
+    whatever has queued up in its lane (up to `batch_size` frames) to
+    `handle_batch` in one call.
+    """
+
+    def __init__(
+        self,
+        handle_batch: BatchHandler,
+        workers: int,
+        queue_size: int,
+        backpressure: Literal["block", "drop"] = "block",
+        batch_size: int = 1,
+    ) -> None:
+        self._handle_batch = handle_batch
+        self._backpressure = backpressure
+        self._batch_size = batch_size
+        self._lanes: list[queue.Queue[firehose_models.MessageFrame | None]] = [
+            queue.Queue(maxsize=queue_size) for _ in range(workers)
+        ]
+        self._threads = [
+            threading.Thread(
+                target=self._work, args=(lane,), name=f"ingest-worker-{i}", daemon=True
+            )
+            for i, lane in enumerate(self._lanes)
+        ]
+        self._last_seq = -1
+        self._last_body: dict | None = None
+        self._last_received = 0.0
+        self.tracker = SeqTracker()
+        self.dropped = 0
+        # commits for which this returns True are counted as done without
+        # being queued (see CatchUpMonitor)
+        self.skip: Callable[[firehose_models.MessageFrame], bool] | None = None
+
+    def start(self) -> None:
+        QUEUE_DEPTH.set_function(lambda: self.queue_depth)
+        LAST_SEQ.set_function(lambda: self._last_seq)
+        LAG_SECONDS.set_function(lambda: self.lag_seconds or 0)
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Drain queued frames and wait for the workers to exit."""
+        for lane in self._lanes:
+            lane.put(None)
+        for thread in self._threads:
+            thread.join()
+        for gauge in (QUEUE_DEPTH, LAST_SEQ, LAG_SECONDS):
+            gauge.set_function(None)
+
+    @property
+    def last_seq(self) -> int | None:
+        """Seq of the newest commit received."""
+        return self._last_seq if self._last_seq >= 0 else None
+
+    @property
+    def lag_seconds(self) -> float | None:
+        """How long before it was received the newest commit was made."""
+        if self._last_body is None or (made := commit_time(self._last_body)) is None:
+            return None
+        return max(self._last_received - made, 0.0)
+
+    def _lane(
+        self, frame: firehose_models.MessageFrame
+    ) -> "queue.Queue[firehose_models.MessageFrame | None]":
+        return self._lanes[hash(frame.body.get("repo")) % len(self._lanes)]
+
+    def would_block(self, frame: firehose_models.MessageFrame) -> bool:
+        """True if `submit(frame)` would wait for room in a full lane.
+
+        Lets an event-loop reader hand only those frames to a thread.
+        """
+        return (
+            self._backpressure == "block"
+            and frame.type == "#commit"
+            and self._lane(frame).full()
+        )
+
+    def submit(self, frame: firehose_models.MessageFrame) -> bool:
+        """Queue a commit frame for processing. Returns False if it was skipped."""
+        if frame.type != "#commit":
+            _OTHER.inc()
+            return False
+
+        seq = frame.body["seq"]
+        if seq <= self._last_seq:
+            # replayed by the relay after a reconnect; already queued or processed
+            _REPLAYED.inc()
+            return False
+
+        self.tracker.start(seq)
+        self._last_seq = seq
+        self._last_body = frame.body
+        self._last_received = time.time()
+        if self.skip is not None and self.skip(frame):
+            self.tracker.finish(seq)
+            _SKIPPED.inc()
+            return False
+
+        lane = self._lane(frame)
+        if self._backpressure == "block":
+            lane.put(frame)
+            _QUEUED.inc()
+            return True
+
+        try:
+            lane.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+            _DROPPED.inc()
+            self.tracker.finish(seq)
+            if self.dropped % 1000 == 1:
+                logger.warning(
+                    f"Ingest lane full, dropping frames (dropped so far: {self.dropped})"
+                )
+            return False
+        _QUEUED.inc()
+        return True
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(lane.qsize() for lane in self._lanes)
+
+    def _work(self, lane: "queue.Queue[firehose_models.MessageFrame | None]") -> None:
+        while batch := self._next_batch(lane):
+            try:
+                self._handle_batch(batch)
+            except Exception as e:
+                logger.error(
+                    f"CRITICAL ERROR while processing commits {batch[0].body['seq']}..{batch[-1].body['seq']}: {e}",
+                    exc_info=True,
+                )
+            finally:
+                for frame in batch:
+                    self.tracker.finish(frame.body["seq"])
+
+    def _next_batch(
+        self, lane: "queue.Queue[firehose_models.MessageFrame | None]"
+    ) -> list[firehose_models.MessageFrame]:
+        """Block for one frame, then take whatever else is already queued."""
+        frame = lane.get()
+        batch = []
+        while frame is not None:
+            batch.append(frame)
+            if len(batch) >= self._batch_size:
+                break
+            try:
+                frame = lane.get_nowait()
+            except queue.Empty:
+                break
+        else:
+            # stop sentinel: finish the partial batch, then let the next call exit
+            if batch:
+                lane.put(None)
+        return batch
@@ -0,0 +1,139 @@
+"""Lightweight views of post records for the ingestion hot path.
+
+Validating every post of the firehose into a pydantic
+`models.AppBskyFeedPost.Record` costs more than filtering it, and most posts
+are rejected by the first filter. `PostView` reads the fields filters use
+straight from the decoded record and builds the full model only when some
+other attribute is asked for.
+"""
+
+from typing import NamedTuple
+
+from atproto import models
+
+_POST_TYPE = models.ids.AppBskyFeedPost
+
+
+class StrongRef(NamedTuple):
+    uri: str
+    cid: str
+
+
+class ReplyRef(NamedTuple):
+    root: StrongRef
+    parent: StrongRef
+
+
+class ByteSlice(NamedTuple):
+    byte_start: int
+    byte_end: int
+
+
+class FacetFeature(NamedTuple):
+    py_type: str  # e.g. "app.bsky.richtext.facet#tag"
+    uri: str | None = None
+    did: str | None = None
+    tag: str | None = None
+
+
+class Facet(NamedTuple):
+    # named like the model's field, shadowing tuple.index
+    index: ByteSlice  # pyright: ignore[reportIncompatibleMethodOverride]
+    features: tuple[FacetFeature, ...]
+
+
+def _strong_ref(raw) -> StrongRef | None:
+    if (
+        isinstance(raw, dict)
+        and isinstance(uri := raw.get("uri"), str)
+        and isinstance(cid := raw.get("cid"), str)
+    ):
+        return StrongRef(uri, cid)
+    return None
+
+
+def _facet(raw: dict) -> Facet:
+    index = raw["index"]
+    return Facet(
+        ByteSlice(index["byteStart"], index["byteEnd"]),
+        tuple(
+            FacetFeature(
+                feature.get("$type", ""),
+                feature.get("uri"),
+                feature.get("did"),
+                feature.get("tag"),
+            )
+            for feature in raw.get("features", ())
+        ),
+    )
+
+
+class PostView:
+    """A post record as decoded from the firehose or Jetstream, without validation.
+
+    `text`, `created_at`, `langs` and `reply` read like the model's fields;
+    `facets` are `Facet` tuples with the model's attribute names. Any other
+    attribute comes from `model`, the full pydantic record, built on first use.
+    Create views with `parse`, which rejects records those fields would not
+    validate for.
+    """
+
+    __slots__ = ("_raw", "_model", "_facets", "text", "created_at", "langs", "reply")
+
+    def __init__(self, raw: dict, reply: ReplyRef | None = None) -> None:
+        self._raw = raw
+        self._model = None
+        self._facets = None
+        self.text: str = raw["text"]
+        self.created_at: str = raw["createdAt"]
+        self.langs: list[str] | None = raw.get("langs")
+        self.reply = reply
+
+    @classmethod
+    def parse(cls, raw) -> "PostView | None":
+        """A view of `raw`, or None if it is not a post the view can represent."""
+        if (
+            not isinstance(raw, dict)
+            or raw.get("$type") != _POST_TYPE
+            or not isinstance(raw.get("text"), str)
+            or not isinstance(raw.get("createdAt"), str)
+        ):
+            return None
+        reply = None
+        if (raw_reply := raw.get("reply")) is not None:
+            if not isinstance(raw_reply, dict):
+                return None
+            root = _strong_ref(raw_reply.get("root"))
+            parent = _strong_ref(raw_reply.get("parent"))
+            if root is None or parent is None:
+                return None
+            reply = ReplyRef(root, parent)
+        return cls(raw, reply)
+
+    @property
+    def facets(self) -> tuple[Facet, ...] | None:
+        if self._facets is None and (raw := self._raw.get("facets")) is not None:
+            self._facets = tuple(_facet(facet) for facet in raw)
+        return self._facets
+
+    @property
+    def model(self) -> "models.AppBskyFeedPost.Record":
+        if self._model is None:
+            self._model = models.get_or_create(self._raw, strict=False)
+        return self._model  # type: ignore[return-value]
+
+    def __getattr__(self, name: str):
+        # only reached for attributes the view does not have
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __getstate__(self) -> dict:
+        # ops travel between decode workers and the main process; send the raw record only
+        return self._raw
+
+    def __setstate__(self, raw: dict) -> None:
+        self.__init__(raw, self.parse(raw).reply)  # type: ignore[union-attr]
+
+    def __repr__(self) -> str:
+        return f"PostView(text={self.text!r}, created_at={self.created_at!r})"
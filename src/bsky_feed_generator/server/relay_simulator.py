@@ -0,0 +1,358 @@
+"""A local stand-in for the relay's `com.atproto.sync.subscribeRepos` websocket.
+
+Serves frames from a frame log or recording (see `frame_log`) or from
+`synthetic_frames`, so ingestion can be tested and benchmarked without network
+access:
+
+    python -m bsky_feed_generator.server.relay_simulator --synthetic 100000 --rate 2000
+
+and point the feed generator at it with FIREHOSE_URI=ws://127.0.0.1:8765/xrpc.
+
+Like the relay, it sends the frames after `cursor` when one is given. Without a
+cursor it starts from the first frame rather than the live head. Once the
+frames run out the connection stays open, as it would on a quiet relay.
+
+Faults can be injected every `fault_every` frames of a connection:
+- "drop": the TCP connection is cut without a close handshake (the client
+  reconnects on its own with its current cursor)
+- "close": a normal close, as when the relay restarts
+- "error": an error frame followed by a close
+
+JetstreamSimulator serves the same commits the way Jetstream does (see
+`jetstream_events`), for STREAM_SOURCE=jetstream:
+
+    python -m bsky_feed_generator.server.relay_simulator --synthetic 100000 --jetstream
+
+with JETSTREAM_URI=ws://127.0.0.1:8765/subscribe.
+"""
+
+import argparse
+import base64
+import json
+import logging
+import socket
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from datetime import datetime
+from http import HTTPStatus
+from pathlib import Path
+from typing import Literal
+from urllib.parse import parse_qs, urlsplit
+
+import libipld
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.server import Server, ServerConnection, serve
+
+from bsky_feed_generator.server.frame_log import decode_frame, read_recording
+from bsky_feed_generator.server.synthetic_frames import synthetic_frames
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBE_REPOS_PATH = "/xrpc/com.atproto.sync.subscribeRepos"
+JETSTREAM_PATH = "/subscribe"
+
+# frames after the given cursor (None: from the start), as (seq, websocket message)
+FrameSource = Callable[[int | None], Iterable[tuple[int, bytes | str]]]
+Fault = Literal["drop", "close", "error"]
+
+
+def frame_log_source(path: str | Path) -> FrameSource:
+    return lambda cursor: read_recording(path, cursor)
+
+
+def memory_source(frames: list[tuple[int, bytes | str]]) -> FrameSource:
+    return lambda cursor: (
+        (seq, data) for seq, data in frames if cursor is None or seq > cursor
+    )
+
+
+def error_frame(error: str, message: str) -> bytes:
+    return libipld.encode_dag_cbor({"op": -1}) + libipld.encode_dag_cbor(
+        {"error": error, "message": message}
+    )
+
+
+class RelaySimulator:
+    """Serves `source` over websocket at `rate` frames per second (0: as fast as possible)."""
+
+    path = SUBSCRIBE_REPOS_PATH
+
+    def __init__(
+        self,
+        source: FrameSource,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        rate: float = 0,
+        fault: Fault | None = None,
+        fault_every: int = 0,
+    ) -> None:
+        self.source = source
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.fault = fault
+        self.fault_every = fault_every
+        self._server: Server | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._connections: set[ServerConnection] = set()
+        self.connections = 0
+        self.cursors: list[int | None] = []  # cursor of every subscription, in order
+        self.frames_sent = 0
+        self.faults = 0
+        # set once a subscription has been sent every frame of the source
+        self.drained = threading.Event()
+
+    @property
+    def uri(self) -> str:
+        """Base URI for FIREHOSE_URI / the firehose client's `base_uri`."""
+        return f"ws://{self.host}:{self.port}/xrpc"
+
+    def messages(self, cursor: int | None, query: dict[str, list[str]]):
+        """The messages of a subscription with `cursor` and the other `query` parameters."""
+        return self.source(cursor)
+
+    def start(self) -> "RelaySimulator":
+        self._stopped.clear()
+        self._server = serve(
+            self._handle,
+            self.host,
+            self.port,
+            process_request=self._check_path,
+            compression=None,
+            max_size=None,
+        )
+        self.port = self._server.socket.getsockname()[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="relay-simulator", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Relay simulator listening on {self.uri}")
+        return self
+
+    def stop(self) -> None:
+        """Close every subscription normally and stop listening."""
+        self._stopped.set()
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            connection.close()
+        if self._server:
+            self._server.shutdown()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "RelaySimulator":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _check_path(self, connection: ServerConnection, request):
+        if urlsplit(request.path).path != self.path:
+            return connection.respond(HTTPStatus.NOT_FOUND, "Not Found\n")
+        return None
+
+    def _handle(self, connection: ServerConnection) -> None:
+        # set by the handshake, which is done before handlers run
+        request = connection.request
+        query = parse_qs(urlsplit(request.path).query) if request else {}
+        cursor = int(query["cursor"][0]) if "cursor" in query else None
+        with self._lock:
+            self._connections.add(connection)
+            self.connections += 1
+            self.cursors.append(cursor)
+        try:
+            if not self._stream(connection, self.messages(cursor, query)):
+                return
+            self.drained.set()
+            # out of frames: stay open like a quiet relay until stopped
+            while not self._stopped.is_set():
+                try:
+                    connection.recv(timeout=0.1)
+                except TimeoutError:
+                    continue
+        except ConnectionClosed:
+            pass
+        finally:
+            with self._lock:
+                self._connections.discard(connection)
+
+    def _stream(
+        self, connection: ServerConnection, messages: Iterable[tuple[int, bytes | str]]
+    ) -> bool:
+        """Send `messages`; False if the connection was ended early."""
+        started = time.monotonic()
+        sent = 0
+        for _, data in messages:
+            if self._stopped.is_set():
+                return False
+            if self.rate:
+                delay = started + sent / self.rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            connection.send(data)
+            sent += 1
+            with self._lock:
+                self.frames_sent += 1
+            if self.fault and self.fault_every and sent % self.fault_every == 0:
+                self._inject(connection)
+                return False
+        return True
+
+    def _inject(self, connection: ServerConnection) -> None:
+        with self._lock:
+            self.faults += 1
+        logger.info(f"Relay simulator injecting fault: {self.fault}")
+        if self.fault == "drop":
+            connection.socket.shutdown(socket.SHUT_RDWR)
+            return
+        if self.fault == "error":
+            connection.send(error_frame("InternalError", "injected by relay simulator"))
+        connection.close()
+
+
+def _json_value(value):
+    """A decoded DAG-CBOR value in the JSON form of the atproto data model."""
+    if isinstance(value, dict):
+        return {key: _json_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_json_value(item) for item in value]
+    if isinstance(value, bytes):
+        try:
+            return {"$link": libipld.encode_cid(value)}
+        except ValueError:
+            return {"$bytes": base64.b64encode(value).decode().rstrip("=")}
+    return value
+
+
+def jetstream_events(frames: Iterable[tuple[int, bytes]]) -> Iterator[tuple[int, str]]:
+    """The `(time_us, event)` pairs Jetstream sends for relay `frames`.
+
+    One JSON event per operation of each commit, with the record inline.
+    `time_us` is the commit's `time`, moved up to keep every event's unique.
+    """
+    last = 0
+    for _, data in frames:
+        frame = decode_frame(data)
+        if frame.type != "#commit":
+            continue
+        body = frame.body
+        blocks = libipld.decode_car(body["blocks"])[1] if body["blocks"] else {}
+        committed = datetime.fromisoformat(body["time"].replace("Z", "+00:00"))
+        for op in body["ops"]:
+            last = max(int(committed.timestamp() * 1_000_000), last + 1)
+            collection, rkey = op["path"].split("/", 1)
+            commit = {
+                "rev": body["rev"],
+                "operation": op["action"],
+                "collection": collection,
+                "rkey": rkey,
+            }
+            if op["action"] != "delete":
+                commit["record"] = _json_value(blocks[op["cid"]])
+                commit["cid"] = libipld.encode_cid(op["cid"])
+            event = {"did": body["repo"], "time_us": last, "kind": "commit"}
+            yield last, json.dumps({**event, "commit": commit}, separators=(",", ":"))
+
+
+class JetstreamSimulator(RelaySimulator):
+    """Serves `source`, `(time_us, event)` pairs such as `jetstream_events`, like Jetstream.
+
+    Subscriptions get the events of their `wantedCollections` from `cursor`
+    on (inclusive, as Jetstream does), zstd-compressed against `dictionary`
+    when they ask for `compress=true`. "error" faults close the connection
+    with an error status.
+    """
+
+    path = JETSTREAM_PATH
+
+    def __init__(
+        self, source: FrameSource, *args, dictionary: bytes | None = None, **kwargs
+    ) -> None:
+        super().__init__(source, *args, **kwargs)
+        self.dictionary = dictionary
+
+    @property
+    def uri(self) -> str:
+        """JETSTREAM_URI / the Jetstream client's `base_uri`."""
+        return f"ws://{self.host}:{self.port}{JETSTREAM_PATH}"
+
+    def messages(self, cursor: int | None, query: dict[str, list[str]]):
+        wanted = frozenset(query.get("wantedCollections", ()))
+        compress = None
+        if query.get("compress") == ["true"] and self.dictionary:
+            import zstandard  # type: ignore[import-not-found]
+
+            compress = zstandard.ZstdCompressor(
+                dict_data=zstandard.ZstdCompressionDict(self.dictionary)
+            ).compress
+        for time_us, event in self.source(None if cursor is None else cursor - 1):
+            if wanted and json.loads(event)["commit"]["collection"] not in wanted:
+                continue
+            if compress:
+                event = compress(event.encode() if isinstance(event, str) else event)
+            yield time_us, event
+
+    def _inject(self, connection: ServerConnection) -> None:
+        if self.fault != "error":
+            return super()._inject(connection)
+        with self._lock:
+            self.faults += 1
+        logger.info("Jetstream simulator injecting fault: error")
+        connection.close(1011, "injected by relay simulator")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").split("\n\n")[0])
+    frames = parser.add_mutually_exclusive_group(required=True)
+    frames.add_argument("--frames", type=Path, help="frame log or recording to serve")
+    frames.add_argument(
+        "--synthetic", type=int, metavar="N", help="serve N synthetic commits"
+    )
+    parser.add_argument(
+        "--jetstream", action="store_true", help="serve the commits as Jetstream events"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="frames per second (default: unlimited)"
+    )
+    parser.add_argument("--fault", choices=["drop", "close", "error"])
+    parser.add_argument(
+        "--fault-every", type=int, default=0, metavar="N", help="frames per connection"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.jetstream:
+        frames = (
+            read_recording(args.frames)
+            if args.frames
+            else synthetic_frames(args.synthetic)
+        )
+        source = memory_source(list(jetstream_events(frames)))
+    elif args.frames:
+        source = frame_log_source(args.frames)
+    else:
+        source = memory_source(list(synthetic_frames(args.synthetic)))
+    simulator = (JetstreamSimulator if args.jetstream else RelaySimulator)(
+        source,
+        host=args.host,
+        port=args.port,
+        rate=args.rate,
+        fault=args.fault,
+        fault_every=args.fault_every,
+    )
+    with simulator:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+
+from bsky_feed_generator.server.config import settings
+
+CacheKey = tuple[str, str | None, int]  # (feed, cursor, limit)
+
+
+class ResponseCache:
+    """LRU cache of serialized getFeedSkeleton bodies, capped at `max_bytes`.
+
+    Entries belong to a generation of their feed. The post writer calls `bump`
+    for every feed a flush inserted into or deleted from, which drops that
+    feed's entries. A body computed before a bump is never stored: callers read
+    `generation(feed)` before building the response and pass it back to `put`.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[CacheKey, bytes] = OrderedDict()
+        self._bytes = 0
+        # a feed's generation is the epoch (bumped for all feeds) plus its own count
+        self._epoch = 0
+        self._generations: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CacheKey) -> bytes | None:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: CacheKey, generation: int, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self.generation(key[0]):
+                return  # the feed changed while this body was being built
+            if (old := self._entries.pop(key, None)) is not None:
+                self._bytes -= len(old)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def generation(self, feed: str) -> int:
+        return self._epoch + self._generations.get(feed, 0)
+
+    def bump(self, feed: str | None = None) -> None:
+        """Start a new generation of `feed` (or of every feed), invalidating its bodies."""
+        with self._lock:
+            if feed is None:
+                self._epoch += 1
+                stale = list(self._entries)
+            else:
+                self._generations[feed] = self._generations.get(feed, 0) + 1
+                stale = [key for key in self._entries if key[0] == feed]
+            for key in stale:
+                self._bytes -= len(self._entries.pop(key))
+
+    def stats(self) -> dict:
+        return {
+            "epoch": self._epoch,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_BYTES)
@@ -0,0 +1,222 @@
+import logging
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from bsky_feed_generator.server.config import settings
+from bsky_feed_generator.server.database import writer_connection
+from bsky_feed_generator.server.hot_feed import hot_feeds
+from bsky_feed_generator.server.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+# one index seek per feed partition, rather than scanning for DISTINCT feed
+_NEXT_FEED_SQL = "SELECT MIN(feed) FROM post WHERE feed > ?"
+_FIRST_FEED_SQL = "SELECT MIN(feed) FROM post"
+# (indexed_at, cid) of the newest post to keep past `max_posts`
+_NTH_NEWEST_SQL = (
+    "SELECT indexed_at, cid FROM post WHERE feed = ?"
+    " ORDER BY indexed_at DESC, cid DESC LIMIT 1 OFFSET ?"
+)
+_DELETE_BATCH_SQL = (
+    "DELETE FROM post WHERE id IN ("
+    " SELECT id FROM post WHERE feed = ? AND (indexed_at, cid) < (?, ?)"
+    " ORDER BY indexed_at, cid LIMIT ?"
+    ") RETURNING uri"
+)
+
+
+class Retention:
+    """Deletes posts past `max_age` or beyond each feed's newest `max_posts`, then compacts.
+
+    Each run deletes in transactions of at most `batch_size` rows, pausing
+    between them so the post writer is never locked out for long. Every run
+    then returns free pages to the filesystem (incremental vacuum) and truncates
+    the WAL. A limit of 0 disables it.
+
+    Compaction also runs every `compact_interval` seconds on its own, so the
+    WAL and free pages stay bounded with both limits off (0 disables that).
+    """
+
+    def __init__(
+        self,
+        max_age: timedelta | None,
+        max_posts: int,
+        interval: float,
+        batch_size: int,
+        pause: float = 0.05,
+        compact_interval: float = 0,
+    ) -> None:
+        self.max_age = max_age
+        self.max_posts = max_posts
+        self.interval = interval
+        self.compact_interval = compact_interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._conn: sqlite3.Connection | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.runs = 0
+        self.rows_deleted = 0
+        self.bytes_reclaimed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_age or self.max_posts)
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "rows_deleted": self.rows_deleted,
+            "bytes_reclaimed": self.bytes_reclaimed,
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = writer_connection()
+        return self._conn
+
+    def _feeds(self, conn: sqlite3.Connection) -> list[str]:
+        feeds = []
+        feed = conn.execute(_FIRST_FEED_SQL).fetchone()[0]
+        while feed is not None:
+            feeds.append(feed)
+            feed = conn.execute(_NEXT_FEED_SQL, (feed,)).fetchone()[0]
+        return feeds
+
+    def _cutoff(self, conn: sqlite3.Connection, feed: str) -> tuple[str, str] | None:
+        """Posts sorting before this (indexed_at, cid) key are past retention."""
+        cutoffs = []
+        if self.max_age:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            # "" sorts before every cid, so this keeps everything at the boundary
+            cutoffs.append((str(now - self.max_age), ""))
+        if self.max_posts:
+            row = conn.execute(_NTH_NEWEST_SQL, (feed, self.max_posts - 1)).fetchone()
+            if row:
+                cutoffs.append(tuple(row))
+        return max(cutoffs, default=None)
+
+    def _delete_batch(
+        self, conn: sqlite3.Connection, feed: str, cutoff: tuple[str, str]
+    ) -> list[str]:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            uris = [
+                uri
+                for (uri,) in conn.execute(
+                    _DELETE_BATCH_SQL, (feed, *cutoff, self.batch_size)
+                ).fetchall()
+            ]
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return uris
+
+    def _compact(self, conn: sqlite3.Connection) -> int:
+        """Release free pages and truncate the WAL; returns bytes freed from the file."""
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:  # INCREMENTAL
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        pages_after = conn.execute("PRAGMA page_count").fetchone()[0]
+        return (pages_before - pages_after) * page_size
+
+    def _prune(self, conn: sqlite3.Connection, feed: str) -> int:
+        deleted = 0
+        cutoff = self._cutoff(conn, feed)
+        while cutoff and not self._stop.is_set():
+            uris = self._delete_batch(conn, feed, cutoff)
+            if uris:
+                deleted += len(uris)
+                hot_feeds[feed].remove(uris)
+                response_cache.bump(feed)
+            if len(uris) < self.batch_size:
+                break
+            # let the post writer in between batches
+            self._stop.wait(self.pause)
+        return deleted
+
+    def compact(self) -> int:
+        """Release free pages and truncate the WAL now; returns bytes freed from the file."""
+        reclaimed = self._compact(self._connection())
+        self.bytes_reclaimed += reclaimed
+        return reclaimed
+
+    def run_once(self) -> int:
+        """Apply retention now; returns the number of posts deleted."""
+        if not self.enabled:
+            return 0
+        started = time.perf_counter()
+        conn = self._connection()
+        deleted = 0
+        for feed in self._feeds(conn):
+            deleted += self._prune(conn, feed)
+
+        # the WAL also grows with the post writer's commits, so truncate it
+        # on every run, not only after deletes
+        reclaimed = self.compact()
+        self.runs += 1
+        self.rows_deleted += deleted
+        if deleted:
+            logger.info(
+                f"Retention deleted {deleted} posts and reclaimed {reclaimed} bytes"
+                f" in {(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+        return deleted
+
+    def start(self) -> None:
+        if not (self.enabled or self.compact_interval) or (
+            self._thread and self._thread.is_alive()
+        ):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        now = time.monotonic()
+        next_run = now + self.interval if self.enabled else math.inf
+        next_compact = (
+            now + self.compact_interval if self.compact_interval else math.inf
+        )
+        while not self._stop.wait(min(next_run, next_compact) - time.monotonic()):
+            now = time.monotonic()
+            try:
+                if now >= next_run:
+                    next_run = now + self.interval
+                    self.run_once()  # compacts as well
+                    if self.compact_interval:
+                        next_compact = now + self.compact_interval
+                elif now >= next_compact:
+                    next_compact = now + self.compact_interval
+                    self.compact()
+            except Exception as e:
+                logger.error(f"Retention run failed: {e}", exc_info=True)
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+
+
+retention = Retention(
+    max_age=(
+        timedelta(hours=settings.RETENTION_MAX_AGE_HOURS)
+        if settings.RETENTION_MAX_AGE_HOURS
+        else None
+    ),
+    max_posts=settings.RETENTION_MAX_POSTS,
+    interval=settings.RETENTION_INTERVAL,
+    batch_size=settings.RETENTION_BATCH_SIZE,
+    compact_interval=settings.COMPACT_INTERVAL,
+)
@@ -1,6 +1,3 @@
-from waitress import serve
-
-from bsky_feed_generator.server.app import app
 from bsky_feed_generator.server.config import settings
 from bsky_feed_generator.server.logger import logger
 
@@ -9,6 +6,26 @@ def main():
     logger.critical("APPLICATION RUNSERVER MAIN HAS STARTED - VERSION 1")
     # The database module now handles its own directory creation if needed.
     # Run the server
+    if settings.SERVER_MODE == "asgi":
+        try:
+            import uvicorn
+        except ImportError:
+            raise SystemExit(
+                "SERVER_MODE=asgi requires uvicorn: pip install 'bsky-feed-generator[asgi]'"
+            ) from None
+
+        uvicorn.run(
+            "bsky_feed_generator.server.asgi:app",
+            host=str(settings.LISTEN_HOST),
+            port=settings.LISTEN_PORT,
+            log_level=settings.LOG_LEVEL.lower(),
+        )
+        return
+
+    from waitress import serve
+
+    from bsky_feed_generator.server.app import app
+
     serve(app, host=str(settings.LISTEN_HOST), port=settings.LISTEN_PORT)
 
 
@@ -0,0 +1,194 @@
+"""Synthetic firehose commit frames for offline benchmarks and tests.
+
+Frames are encoded like the relay's: DAG-CBOR header and body, with the
+records in a CAR file of blocks addressed by their real CIDs, so they
+exercise the same decoding as live traffic.
+"""
+
+import hashlib
+import random
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+
+import libipld
+
+_TID_CHARS = "234567abcdefghijklmnopqrstuvwxyz"
+_DID_CHARS = "abcdefghijklmnopqrstuvwxyz234567"
+_WORDS = (
+    "the quick brown fox jumps over lazy dog bluesky feed post today really great "
+    "news about python rust sqlite firehose https://example.com/some/path #hashtag "
+    "www.test.org héllo wörld 日本語 🦋 🎉"
+).split()
+_SPONGEBOB_WORDS = ["sPoNgEbOb", "wHaTeVeR", "aBcDeFg", "rEaLlYnOw", "SuReThInG"]
+
+# share of commits per kind, roughly the firehose's mix
+DEFAULT_MIX = {
+    "post": 0.2,
+    "like": 0.5,
+    "follow": 0.1,
+    "repost": 0.1,
+    "delete": 0.1,
+}
+
+
+def _cid(block: bytes) -> bytes:
+    """CIDv1, dag-cbor codec, sha2-256 multihash."""
+    return b"\x01\x71\x12\x20" + hashlib.sha256(block).digest()
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, n = n & 0x7F, n >> 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _car(root: bytes, blocks: list[tuple[bytes, bytes]]) -> bytes:
+    header = libipld.encode_dag_cbor({"version": 1, "roots": [root]})
+    parts = [_varint(len(header)), header]
+    for cid, block in blocks:
+        parts += [_varint(len(cid) + len(block)), cid, block]
+    return b"".join(parts)
+
+
+def _tid(micros: int, clock_id: int = 0) -> str:
+    n = (micros << 10) | clock_id
+    return "".join(_TID_CHARS[(n >> shift) & 31] for shift in range(60, -1, -5))
+
+
+def _iso(when: datetime) -> str:
+    return when.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+class SyntheticFirehose:
+    """Generates `#commit` frames with consecutive seqs from a seeded RNG.
+
+    Each commit is one operation by one of `repos` accounts, picked by `mix`
+    (post, like, follow, repost or delete of an earlier post). About
+    `spongebob_ratio` of the posts contain alternating-case text. Timestamps
+    advance from `start` (default now); pass it for byte-identical output.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        repos: int = 1000,
+        mix: dict[str, float] | None = None,
+        spongebob_ratio: float = 0.1,
+        start: datetime | None = None,
+    ) -> None:
+        self._rng = random.Random(seed)
+        self._dids = [
+            "did:plc:" + "".join(self._rng.choices(_DID_CHARS, k=24))
+            for _ in range(repos)
+        ]
+        mix = mix or DEFAULT_MIX
+        self._kinds = list(mix)
+        self._weights = list(mix.values())
+        self.spongebob_ratio = spongebob_ratio
+        self._now = start or datetime.now(timezone.utc)
+        self._posts: list[tuple[str, str, str]] = []  # (did, rkey, cid) of recent posts
+
+    def _text(self) -> str:
+        words: list[str] = self._rng.choices(_WORDS, k=self._rng.randint(3, 40))
+        if self._rng.random() < self.spongebob_ratio:
+            words.insert(
+                self._rng.randrange(len(words)), self._rng.choice(_SPONGEBOB_WORDS)
+            )
+        return " ".join(words)
+
+    def _strong_ref(self) -> dict | None:
+        if not self._posts:
+            return None
+        did, rkey, cid = self._rng.choice(self._posts)
+        return {"uri": f"at://{did}/app.bsky.feed.post/{rkey}", "cid": cid}
+
+    def _post(self, created_at: str) -> tuple[str, dict]:
+        record = {
+            "$type": "app.bsky.feed.post",
+            "text": self._text(),
+            "createdAt": created_at,
+            "langs": ["en"],
+        }
+        if (parent := self._strong_ref()) and self._rng.random() < 0.3:
+            record["reply"] = {"root": parent, "parent": parent}
+        return "app.bsky.feed.post", record
+
+    def _record(self, kind: str) -> tuple[str, dict]:
+        """A record of `kind`, or a post if there is nothing to like or repost yet."""
+        created_at = _iso(self._now)
+        if kind == "post":
+            return self._post(created_at)
+        if kind in ("like", "repost"):
+            if (subject := self._strong_ref()) is None:
+                return self._post(created_at)
+            return f"app.bsky.feed.{kind}", {
+                "$type": f"app.bsky.feed.{kind}",
+                "subject": subject,
+                "createdAt": created_at,
+            }
+        if kind == "follow":
+            return "app.bsky.graph.follow", {
+                "$type": "app.bsky.graph.follow",
+                "subject": self._rng.choice(self._dids),
+                "createdAt": created_at,
+            }
+        raise ValueError(f"unknown commit kind: {kind}")
+
+    def frame(self, seq: int) -> bytes:
+        """The websocket message of commit `seq`."""
+        self._now += timedelta(microseconds=self._rng.randint(100, 5000))
+        micros = int(self._now.timestamp() * 1_000_000)
+        kind = self._rng.choices(self._kinds, self._weights)[0]
+        did = self._rng.choice(self._dids)
+        rev = _tid(micros)
+        blocks = []
+
+        if kind == "delete" and self._posts:
+            did, rkey, _ = self._posts.pop(self._rng.randrange(len(self._posts)))
+            op = {"action": "delete", "path": f"app.bsky.feed.post/{rkey}", "cid": None}
+        else:
+            collection, record = self._record("post" if kind == "delete" else kind)
+            block = libipld.encode_dag_cbor(record)
+            cid = _cid(block)
+            blocks.append((cid, block))
+            rkey = _tid(micros, self._rng.randrange(1024))
+            op = {"action": "create", "path": f"{collection}/{rkey}", "cid": cid}
+            if collection == "app.bsky.feed.post":
+                self._posts.append((did, rkey, libipld.encode_cid(cid)))
+                if len(self._posts) > 10_000:
+                    del self._posts[: len(self._posts) // 2]
+
+        commit = libipld.encode_dag_cbor(
+            {"did": did, "rev": rev, "version": 3, "data": None, "prev": None}
+        )
+        commit_cid = _cid(commit)
+        blocks.insert(0, (commit_cid, commit))
+        body = {
+            "seq": seq,
+            "rebase": False,
+            "tooBig": False,
+            "repo": did,
+            "commit": commit_cid,
+            "rev": rev,
+            "since": None,
+            "blocks": _car(commit_cid, blocks),
+            "ops": [op],
+            "blobs": [],
+            "time": _iso(self._now),
+        }
+        header = {"op": 1, "t": "#commit"}
+        return libipld.encode_dag_cbor(header) + libipld.encode_dag_cbor(body)
+
+
+def synthetic_frames(
+    count: int, start_seq: int = 1, **kwargs
+) -> Iterator[tuple[int, bytes]]:
+    """`count` `(seq, frame)` pairs from a `SyntheticFirehose(**kwargs)`."""
+    firehose = SyntheticFirehose(**kwargs)
+    for seq in range(start_seq, start_seq + count):
+        yield seq, firehose.frame(seq)
@@ -0,0 +1,235 @@
+import contextlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from bsky_feed_generator.server import metrics
+from bsky_feed_generator.server.config import settings
+from bsky_feed_generator.server.database import writer_connection
+from bsky_feed_generator.server.feeds import DEFAULT_FEED
+from bsky_feed_generator.server.hot_feed import FeedItem, hot_feeds
+from bsky_feed_generator.server.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+# constant statements, so the connection's statement cache keeps them prepared
+_INSERT_POST_SQL = (
+    "INSERT INTO post (feed, uri, cid, reply_parent, reply_root, indexed_at)"
+    " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (uri, feed) DO NOTHING"
+)
+# a post is stored once per feed it matched
+_DELETE_POST_SQL = "DELETE FROM post WHERE uri = ? RETURNING feed"
+_UPSERT_CURSOR_SQL = (
+    "INSERT INTO subscriptionstate (service, cursor) VALUES (?, ?)"
+    " ON CONFLICT (service) DO UPDATE SET cursor = excluded.cursor"
+)
+
+
+FLUSH_SECONDS = metrics.histogram(
+    "feedgen_writer_flush_seconds", "Time a write transaction took, commit included"
+)
+FLUSH_ROWS = metrics.histogram(
+    "feedgen_writer_flush_rows",
+    "Posts and deletes written per transaction",
+    buckets=metrics.SIZE_BUCKETS,
+)
+PENDING_ROWS = metrics.gauge(
+    "feedgen_writer_pending_rows", "Posts and deletes waiting for the next flush"
+)
+ROWS = metrics.counter(
+    "feedgen_writer_rows_total", "Post rows inserted and deleted", ["op"]
+)
+SAVED_SEQ = metrics.gauge(
+    "feedgen_stream_saved_seq", "Last stream cursor committed to the database"
+)
+
+
+class PostWriter:
+    """Write-behind buffer for accepted posts, deletes and the firehose cursor.
+
+    Ingestion hands rows to `add` and moves on; a background thread flushes them
+    over its own connection in a single transaction once `max_batch` rows are
+    pending or `max_delay` seconds have passed. A cursor
+    recorded with `checkpoint` is written in the same transaction as the rows
+    that precede it, so a crash can only replay commits, never skip them.
+    """
+
+    def __init__(self, max_batch: int, max_delay: float) -> None:
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        # flushes are serialized so a cursor never commits ahead of earlier rows
+        self._flush_lock = threading.Lock()
+        self._creates: list[dict] = []
+        self._deletes: list[str] = []
+        self._cursor: tuple[str, int] | None = None
+        self._conn: sqlite3.Connection | None = None
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self.inserted = 0
+        self.deleted = 0
+        self.flushes = 0
+        # last cursor committed
+        self.saved_cursor: int | None = None
+
+    def add(self, creates: list[dict], deletes: list[str]) -> None:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        # millisecond precision, so feed cursors (ms::cid) round-trip exactly
+        indexed_at = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        with self._cond:
+            self._creates.extend({**post, "indexed_at": indexed_at} for post in creates)
+            self._deletes.extend(deletes)
+            if self.pending >= self.max_batch:
+                self._cond.notify()
+
+    def checkpoint(self, service: str, cursor: int) -> None:
+        """Persist `cursor` for `service` with the next flush."""
+        with self._cond:
+            self._cursor = (service, cursor)
+
+    @property
+    def pending(self) -> int:
+        return len(self._creates) + len(self._deletes)
+
+    def stats(self) -> dict:
+        return {
+            "inserted": self.inserted,
+            "deleted": self.deleted,
+            "flushes": self.flushes,
+            "pending": self.pending,
+        }
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._cond:
+                creates, self._creates = self._creates, []
+                deletes, self._deletes = self._deletes, []
+                cursor, self._cursor = self._cursor, None
+            if not (creates or deletes or cursor):
+                return
+            try:
+                self._write(creates, deletes, cursor)
+            except Exception:
+                self._discard_connection()
+                # put everything back in front of newer rows so the next flush retries it
+                with self._cond:
+                    self._creates[:0] = creates
+                    self._deletes[:0] = deletes
+                    if self._cursor is None:
+                        self._cursor = cursor
+                raise
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = writer_connection()
+        return self._conn
+
+    def _discard_connection(self) -> None:
+        # a failed flush may leave the connection unusable; reopen on the next one
+        if self._conn is not None:
+            with contextlib.suppress(sqlite3.Error):
+                self._conn.close()
+            self._conn = None
+
+    def _write(
+        self, creates: list[dict], deletes: list[str], cursor: tuple[str, int] | None
+    ) -> None:
+        started = time.perf_counter()
+        inserted: dict[str, list[FeedItem]] = defaultdict(list)
+        deleted: dict[str, list[str]] = defaultdict(list)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for post in creates:
+                # replayed commits re-deliver posts we already stored
+                row = conn.execute(
+                    _INSERT_POST_SQL,
+                    (
+                        post.get("feed", DEFAULT_FEED),
+                        post["uri"],
+                        post["cid"],
+                        post.get("reply_parent"),
+                        post.get("reply_root"),
+                        str(post["indexed_at"]),
+                    ),
+                )
+                if row.rowcount:
+                    inserted[post.get("feed", DEFAULT_FEED)].append(
+                        (post["indexed_at"], post["cid"], post["uri"])
+                    )
+            for uri in deletes:
+                for (feed,) in conn.execute(_DELETE_POST_SQL, (uri,)):
+                    deleted[feed].append(uri)
+            if cursor:
+                conn.execute(_UPSERT_CURSOR_SQL, cursor)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        elapsed = time.perf_counter() - started
+        FLUSH_SECONDS.observe(elapsed)
+        FLUSH_ROWS.observe(len(creates) + len(deletes))
+        if cursor:
+            self.saved_cursor = cursor[1]
+            SAVED_SEQ.set(cursor[1])
+        hot_feeds.add(inserted)
+        for feed, uris in deleted.items():
+            hot_feeds[feed].remove(uris)
+        for feed in inserted.keys() | deleted.keys():
+            response_cache.bump(feed)
+
+        inserted_count = sum(map(len, inserted.values()))
+        deleted_count = sum(map(len, deleted.values()))
+        self.inserted += inserted_count
+        self.deleted += deleted_count
+        self.flushes += 1
+        logger.debug(
+            f"Flushed {inserted_count} posts, {deleted_count} deletes"
+            f"{f', cursor {cursor[1]}' if cursor else ''}"
+            f" in {elapsed * 1000:.1f}ms"
+        )
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="post-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Flush everything still buffered and stop the background thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping and self.pending < self.max_batch:
+                    self._cond.wait(self.max_delay)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush post writer: {e}", exc_info=True)
+                if not stopping:
+                    time.sleep(self.max_delay)
+            if stopping:
+                return
+
+
+writer = PostWriter(
+    max_batch=settings.WRITE_BATCH_SIZE, max_delay=settings.WRITE_FLUSH_INTERVAL
+)
+PENDING_ROWS.set_function(lambda: writer.pending)
+ROWS.labels("insert").set_function(lambda: writer.inserted)
+ROWS.labels("delete").set_function(lambda: writer.deleted)
@@ -0,0 +1,97 @@
+"""Feed generator endpoints, independent of the web framework serving them.
+
+Both the Flask app (`app.py`) and the ASGI app (`asgi.py`) route requests
+here, so they answer identically.
+"""
+
+import json
+from datetime import datetime, timezone
+
+from bsky_feed_generator.server import metrics
+from bsky_feed_generator.server.algos import algos, partitions
+from bsky_feed_generator.server.config import settings
+from bsky_feed_generator.server.response_cache import CacheKey, response_cache
+
+DEFAULT_LIMIT = 20
+
+SKELETON_SECONDS = metrics.histogram(
+    "feedgen_feed_skeleton_seconds",
+    "getFeedSkeleton response time, by whether the body came from the response cache",
+    ["cache"],
+)
+SKELETON_HIT = SKELETON_SECONDS.labels("hit")
+SKELETON_MISS = SKELETON_SECONDS.labels("miss")
+
+
+class XrpcError(Exception):
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def did_document() -> dict | None:
+    service_did = settings.SERVICE_DID
+    hostname = settings.HOSTNAME
+    if not service_did or not service_did.endswith(str(hostname)):
+        return None
+
+    return {
+        "@context": ["https://www.w3.org/ns/did/v1"],
+        "id": service_did,
+        "service": [
+            {
+                "id": "#bsky_fg",
+                "type": "BskyFeedGenerator",
+                "serviceEndpoint": f"https://{hostname}",
+            }
+        ],
+    }
+
+
+def describe_feed_generator() -> dict:
+    feeds = [{"uri": uri} for uri in algos]
+    return {
+        "encoding": "application/json",
+        "body": {"did": settings.SERVICE_DID, "feeds": feeds},
+    }
+
+
+def _cache_key(feed: str, cursor: str | None, limit: int) -> CacheKey:
+    # keyed by partition, which is what the writer invalidates
+    return (partitions.get(feed, feed), cursor, limit)
+
+
+def cached_feed_skeleton(
+    feed: str | None, cursor: str | None, limit: int
+) -> bytes | None:
+    """The cached response body for this page, if the feed hasn't changed since."""
+    if feed is None or not response_cache.max_bytes or feed not in algos:
+        return None
+    return response_cache.get(_cache_key(feed, cursor, limit))
+
+
+def build_feed_skeleton(feed: str | None, cursor: str | None, limit: int) -> bytes:
+    """Run the feed algorithm and serialize (and cache) the response body.
+
+    May query SQLite, so async callers should run it in a thread.
+    """
+    if feed is None:
+        raise XrpcError("Feed parameter missing")
+
+    algo = algos.get(feed)
+    if not algo:
+        raise XrpcError("Unsupported algorithm")
+
+    key = _cache_key(feed, cursor, limit)
+    generation = response_cache.generation(key[0])
+    try:
+        body = algo(cursor, limit)
+    except ValueError:
+        raise XrpcError("Malformed cursor") from None
+
+    body["generation_timestamp_utc"] = datetime.now(timezone.utc).isoformat()
+    data = json.dumps(body, separators=(",", ":")).encode()
+    if response_cache.max_bytes:
+        response_cache.put(key, generation, data)
+    return data
@@ -0,0 +1,11 @@
+"""Point the server at a throwaway database before any test imports it.
+
+Fixtures across the suite empty the post and subscription tables, so the
+default feed_database.db in the working directory must never be the one they
+open; DATABASE_URI from the environment is overridden for the same reason.
+"""
+
+import os
+import tempfile
+
+os.environ["DATABASE_URI"] = os.path.join(tempfile.mkdtemp(), "feed_database.db")
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from bsky_feed_generator.server import config, xrpc
+from bsky_feed_generator.server.asgi import app
+from bsky_feed_generator.server.response_cache import response_cache
+
+FEED = "at://did:plc:test/app.bsky.feed.generator/x"
+
+
+async def _get(path: str, query: str = "", method: str = "GET"):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query.encode(),
+    }
+    await app(scope, receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"]), sent[1]["body"]
+
+
+@pytest.fixture
+def algo(monkeypatch):
+    calls = []
+
+    def handler(cursor, limit):
+        calls.append((cursor, limit))
+        return {"cursor": "eof", "feed": [{"post": "at://did:plc:a/p/1"}]}
+
+    monkeypatch.setitem(xrpc.algos, FEED, handler)
+    response_cache.bump()
+    yield calls
+    response_cache.bump()
+
+
+async def test_feed_skeleton_is_served_and_cached(algo):
+    status, headers, body = await _get(
+        "/xrpc/app.bsky.feed.getFeedSkeleton", f"feed={FEED}&limit=5"
+    )
+    again = await _get("/xrpc/app.bsky.feed.getFeedSkeleton", f"feed={FEED}&limit=5")
+
+    assert status == 200
+    assert headers[b"content-type"] == b"application/json"
+    assert json.loads(body)["feed"] == [{"post": "at://did:plc:a/p/1"}]
+    assert again[2] == body
+    assert algo == [(None, 5)]
+
+
+async def test_feed_skeleton_errors_match_flask_app(algo):
+    missing = await _get("/xrpc/app.bsky.feed.getFeedSkeleton")
+    unknown = await _get("/xrpc/app.bsky.feed.getFeedSkeleton", "feed=at://nope")
+
+    assert (missing[0], missing[2]) == (400, b"Feed parameter missing")
+    assert (unknown[0], unknown[2]) == (400, b"Unsupported algorithm")
+
+
+async def test_describe_lists_feeds_and_unknown_routes_404(algo):
+    status, _, body = await _get("/xrpc/app.bsky.feed.describeFeedGenerator")
+
+    assert status == 200
+    assert {"uri": FEED} in json.loads(body)["body"]["feeds"]
+    assert (await _get("/nope"))[0] == 404
+    assert (await _get("/", method="POST"))[0] == 405
+
+
+async def test_head_sends_headers_only(algo):
+    query = f"feed={FEED}&limit=5"
+    status, headers, body = await _get(
+        "/xrpc/app.bsky.feed.getFeedSkeleton", query, method="HEAD"
+    )
+    get = await _get("/xrpc/app.bsky.feed.getFeedSkeleton", query)
+
+    assert (status, body) == (200, b"")
+    assert headers[b"content-length"] == str(len(get[2])).encode()
+
+
+async def test_metrics_endpoint(algo, monkeypatch):
+    await _get("/xrpc/app.bsky.feed.getFeedSkeleton", f"feed={FEED}")
+    await _get("/xrpc/app.bsky.feed.getFeedSkeleton", f"feed={FEED}")
+
+    status, headers, body = await _get("/metrics")
+
+    assert status == 200
+    assert headers[b"content-type"].startswith(b"text/plain; version=0.0.4")
+    lines = body.decode().splitlines()
+    for cache in ("hit", "miss"):
+        assert any(
+            line.startswith(f'feedgen_feed_skeleton_seconds_count{{cache="{cache}"}}')
+            for line in lines
+        )
+    assert "# TYPE feedgen_stream_frames_total counter" in lines
+
+    monkeypatch.setattr(config.settings, "METRICS_ENABLED", False)
+    assert (await _get("/metrics"))[0] == 404
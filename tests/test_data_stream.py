@@ -0,0 +1,192 @@
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from atproto import firehose_models, models, parse_subscribe_repos_message
+
+from bsky_feed_generator.server import config, data_stream
+from bsky_feed_generator.server.data_filter import (
+    FILTER_POSTS,
+    operations_callback,
+    prefilter_ops,
+)
+from bsky_feed_generator.server.data_stream import (
+    DECODE_SECONDS,
+    _CatchUpMode,
+    _decode_frame,
+    _decode_jetstream_event,
+    _get_ops_by_type,
+    _process_frames_in_pool,
+    subscribes,
+)
+from bsky_feed_generator.server.database import Post, SubscriptionState
+from bsky_feed_generator.server.filter_spec import FilterSpec
+from bsky_feed_generator.server.frame_log import decode_frame, write_frame_log
+from bsky_feed_generator.server.jetstream import JetstreamEvent
+from bsky_feed_generator.server.pipeline import IngestPipeline
+from bsky_feed_generator.server.records import PostView
+from bsky_feed_generator.server.relay_simulator import jetstream_events
+from bsky_feed_generator.server.synthetic_frames import synthetic_frames
+from bsky_feed_generator.server.writer import writer
+
+POSTS = frozenset({models.ids.AppBskyFeedPost})
+# CIDv1, dag-cbor, sha2-256 of b"x"
+_CID = bytes.fromhex(
+    "017112202d711642b726b04401627ca9fbac32f5c8530fb1903cc4db02258717921a4881"
+)
+
+
+def _commit_frame(*ops: tuple[str, str]) -> firehose_models.MessageFrame:
+    # blocks are deliberately not a valid CAR: decoding them would raise
+    return firehose_models.MessageFrame(
+        header=firehose_models.MessageFrameHeader(t="#commit"),
+        body={
+            "seq": 1,
+            "repo": "did:plc:test",
+            "rev": "3l",
+            "since": None,
+            "commit": _CID,
+            "rebase": False,
+            "tooBig": False,
+            "blocks": b"not a car",
+            "blobs": [],
+            "time": "2024-01-01T00:00:00.000Z",
+            "ops": [
+                {"action": action, "path": path, "cid": None} for action, path in ops
+            ],
+        },
+    )
+
+
+def test_commit_outside_subscribed_collections_is_skipped():
+    frame = _commit_frame(("create", "app.bsky.feed.like/3k"))
+    assert _decode_frame(frame, POSTS) is None
+
+
+def test_deletes_do_not_need_block_decoding():
+    frame = _commit_frame(
+        ("delete", "app.bsky.feed.post/3k"), ("delete", "app.bsky.graph.follow/3j")
+    )
+
+    seq, ops = _decode_frame(frame, POSTS)
+
+    assert seq == 1
+    assert ops[models.ids.AppBskyFeedPost]["deleted"] == [
+        {"uri": "at://did:plc:test/app.bsky.feed.post/3k"}
+    ]
+    assert models.ids.AppBskyGraphFollow not in ops
+
+
+def test_subscribes_declares_collections():
+    @subscribes(models.ids.AppBskyFeedPost, models.ids.AppBskyFeedLike)
+    def callback(ops):
+        pass
+
+    assert callback.collections == {
+        models.ids.AppBskyFeedPost,
+        models.ids.AppBskyFeedLike,
+    }
+    assert callback.prefilter is None
+
+
+def test_catch_up_mode_batches_writes_and_skips_old_commits(monkeypatch):
+    monkeypatch.setattr(config.settings, "STREAM_CATCHUP_SKIP_AGE", 3600)
+    monkeypatch.setattr(writer, "max_batch", 10)
+    package_logger = logging.getLogger("bsky_feed_generator")
+    monkeypatch.setattr(package_logger, "level", logging.DEBUG)
+    pipeline = IngestPipeline(lambda frames: None, 1, 10)
+    mode = _CatchUpMode(pipeline)
+    old = _commit_frame(("create", "app.bsky.feed.post/3k"))
+    old_delete = _commit_frame(("delete", "app.bsky.feed.post/3k"))
+    recent = _commit_frame(("create", "app.bsky.feed.post/3k"))
+    recent.body["time"] = datetime.now(timezone.utc).isoformat()
+
+    mode(True, 7200)
+
+    assert writer.max_batch == config.settings.STREAM_CATCHUP_WRITE_BATCH_SIZE
+    assert package_logger.level == logging.INFO
+    assert pipeline.skip(old)
+    assert not pipeline.skip(old_delete)
+    assert not pipeline.skip(recent)
+
+    mode(False, 5)
+
+    assert writer.max_batch == 10
+    assert package_logger.level == logging.DEBUG
+    assert pipeline.skip is None
+
+
+def _python_posts(frames) -> set[str]:
+    uris = set()
+    for _, data in frames:
+        ops = _get_ops_by_type(parse_subscribe_repos_message(decode_frame(data)))
+        for post in ops[models.ids.AppBskyFeedPost]["created"]:
+            if "python" in post["record"].text.split():
+                uris.add(post["uri"])
+    return uris
+
+
+def _decoded_batches() -> int:
+    return sum(DECODE_SECONDS.labels().snapshot()[0])
+
+
+def _process_mode(monkeypatch):
+    # spawned workers read their settings from the environment
+    monkeypatch.setenv("FILTER_SPEC", '{"keywords": ["python"]}')
+    monkeypatch.setattr(config.settings, "FILTER_SPEC", FilterSpec(keywords=["python"]))
+    monkeypatch.setattr(config.settings, "STREAM_DECODE_MODE", "process")
+    monkeypatch.setattr(config.settings, "STREAM_WORKERS", 1)
+
+
+def test_process_mode_replay_writes_posts_and_cursor(monkeypatch, tmp_path):
+    _process_mode(monkeypatch)
+    frames = list(synthetic_frames(200, start_seq=100, mix={"post": 1.0}))
+    write_frame_log(tmp_path / "frames.log", frames)
+    Post.delete().execute()
+    SubscriptionState.delete().execute()
+    passed = FILTER_POSTS.labels("default", "passed").value
+    batches = _decoded_batches()
+
+    try:
+        submitted = data_stream.replay(
+            tmp_path / "frames.log", operations_callback, name="replay"
+        )
+        uris = {post.uri for post in Post.select()}
+        cursor = SubscriptionState.get(SubscriptionState.service == "replay").cursor
+    finally:
+        Post.delete().execute()
+        SubscriptionState.delete().execute()
+
+    expected = _python_posts(frames)
+    assert submitted == 200
+    assert expected and uris == expected
+    assert cursor == 299
+    # filtering ran in the worker; its metrics were merged back
+    assert FILTER_POSTS.labels("default", "passed").value - passed == len(expected)
+    assert _decoded_batches() > batches
+
+
+def test_process_mode_ships_jetstream_events_and_views(monkeypatch):
+    _process_mode(monkeypatch)
+    frames = list(synthetic_frames(100, mix={"post": 0.5, "like": 0.5}))
+    events = [
+        JetstreamEvent({**json.loads(event), "seq": time_us})
+        for time_us, event in jetstream_events(frames)
+    ]
+    received = []
+
+    @subscribes(models.ids.AppBskyFeedPost, prefilter=prefilter_ops)
+    def callback(ops):
+        received.extend(ops[models.ids.AppBskyFeedPost]["created"])
+
+    with ProcessPoolExecutor(
+        1, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        _process_frames_in_pool(events, pool, callback, _decode_jetstream_event)
+
+    assert received
+    assert {post["uri"] for post in received} == _python_posts(frames)
+    assert all(post["feeds"] == [""] for post in received)
+    assert all(isinstance(post["record"], PostView) for post in received)
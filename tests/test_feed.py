@@ -0,0 +1,109 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from bsky_feed_generator.server import database
+from bsky_feed_generator.server.algos import feed
+from bsky_feed_generator.server.database import Post, db
+from bsky_feed_generator.server.hot_feed import HotFeed, hot_feeds
+
+
+@pytest.fixture
+def posts(monkeypatch):
+    monkeypatch.setattr(feed, "uri", "at://did:plc:test/app.bsky.feed.generator/x")
+    Post.delete().execute()
+    hot_feeds.reset()
+    base = datetime(2024, 1, 1)
+    rows = [
+        {
+            "uri": f"at://did:plc:test/app.bsky.feed.post/{n}",
+            "cid": f"cid{n % 3}",
+            # groups of three posts share a timestamp, so cid breaks the tie
+            "indexed_at": base + timedelta(milliseconds=n // 3),
+        }
+        for n in range(25)
+    ]
+    Post.insert_many(rows).execute()
+    yield sorted(rows, key=lambda r: (r["indexed_at"], r["cid"]), reverse=True)
+    Post.delete().execute()
+    hot_feeds.reset()
+
+
+@pytest.mark.parametrize("hot_feed_size", [0, 10, 100])
+def test_cursor_walk_returns_every_post_once_in_order(
+    posts, monkeypatch, hot_feed_size
+):
+    monkeypatch.setattr(hot_feeds, "size", hot_feed_size)
+    seen, cursor = [], None
+    while cursor != feed.CURSOR_EOF:
+        page = feed.handler(cursor, 4)
+        seen.extend(item["post"] for item in page["feed"])
+        cursor = page["cursor"]
+
+    assert seen == [row["uri"] for row in posts]
+
+
+def test_cursor_round_trip_is_exact():
+    indexed_at = datetime(2024, 5, 6, 7, 8, 9, 123000)
+    assert feed.decode_cursor(feed.encode_cursor(indexed_at, "cid")) == (
+        indexed_at,
+        "cid",
+    )
+
+
+def test_malformed_cursor_raises_value_error(posts):
+    with pytest.raises(ValueError):
+        feed.handler("not-a-cursor", 10)
+
+
+@pytest.mark.parametrize(
+    "sql, params",
+    [
+        (database._FEED_HEAD_SQL, ("", 5)),
+        (database._FEED_PAGE_SQL, ("", "2024-01-01 00:00:00.004000", "cid1", 5)),
+    ],
+)
+def test_page_query_is_an_index_range_scan(sql, params):
+    plan = " ".join(
+        str(row[-1]) for row in db.execute_sql(f"EXPLAIN QUERY PLAN {sql}", params)
+    )
+
+    assert "USING COVERING INDEX post_feed_indexed_at_cid_uri" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_hot_feed_serves_window_and_misses_past_it(posts):
+    window = HotFeed(size=10)
+
+    first = window.page(None, 4)
+    assert [uri for *_, uri in first] == [row["uri"] for row in posts[:4]]
+    assert window.page(first[-1][:2], 6) is not None  # ends exactly at the window edge
+    assert window.page(first[-1][:2], 7) is None  # needs rows only SQLite has
+
+
+def test_hot_feed_tracks_adds_and_deletes(posts):
+    window = HotFeed(size=10)
+    newest = (datetime(2030, 1, 1), "cidz", "at://did:plc:test/app.bsky.feed.post/new")
+
+    window.add([newest, newest])
+    window.remove([posts[0]["uri"]])
+
+    page = window.page(None, 3)
+    assert [uri for *_, uri in page] == [newest[2], posts[1]["uri"], posts[2]["uri"]]
+
+
+def test_hot_feed_holding_whole_table_answers_every_page(posts):
+    window = HotFeed(size=100)
+
+    last = window.page(None, 30)
+    assert len(last) == len(posts)
+    assert window.page(last[-1][:2], 10) == []
+
+
+def test_reader_connection_is_reused_and_read_only():
+    conn = database.reader()
+
+    assert database.reader() is conn
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        conn.execute("DELETE FROM post")
@@ -0,0 +1,114 @@
+import datetime
+from collections import defaultdict
+from unittest.mock import patch
+
+import pytest
+from atproto_client import models
+from pydantic import ValidationError
+
+from bsky_feed_generator.server import config
+from bsky_feed_generator.server.algos import feed
+from bsky_feed_generator.server.config import Settings
+from bsky_feed_generator.server.data_filter import operations_callback, prefilter_ops
+from bsky_feed_generator.server.database import Post
+from bsky_feed_generator.server.feeds import FeedConfig
+from bsky_feed_generator.server.filter_spec import FilterSpec
+from bsky_feed_generator.server.hot_feed import hot_feeds
+from bsky_feed_generator.server.writer import PostWriter
+
+PYTHON = FeedConfig(
+    uri="at://did:plc:me/app.bsky.feed.generator/python",
+    filter=FilterSpec(keywords=["python"]),
+)
+RUST = FeedConfig(
+    uri="at://did:plc:me/app.bsky.feed.generator/rust",
+    filter=FilterSpec(keywords=["rust"]),
+)
+
+
+def _created(n: int, text: str) -> dict:
+    record = models.AppBskyFeedPost.Record(
+        text=text, created_at=datetime.datetime.now(datetime.timezone.utc).isoformat()
+    )
+    return {
+        "uri": f"at://did:plc:a/app.bsky.feed.post/{n}",
+        "cid": f"cid{n}",
+        "author": "did:plc:a",
+        "record": record,
+    }
+
+
+@pytest.fixture
+def two_feeds(monkeypatch):
+    monkeypatch.setattr(config.settings, "FEEDS", [PYTHON, RUST])
+    Post.delete().execute()
+    hot_feeds.reset()
+    yield
+    Post.delete().execute()
+    hot_feeds.reset()
+
+
+def test_feed_key_is_the_record_key():
+    assert PYTHON.key == "python"
+
+
+def test_feeds_must_have_distinct_record_keys():
+    other = FeedConfig(uri="at://did:plc:other/app.bsky.feed.generator/python")
+
+    with pytest.raises(ValidationError, match="share the record key 'python'"):
+        Settings(FEEDS=[PYTHON, RUST, other])
+
+
+def test_each_post_is_stored_once_per_matching_feed(two_feeds):
+    ops = defaultdict(lambda: defaultdict(list))
+    ops[models.ids.AppBskyFeedPost]["created"] += [
+        _created(1, "python and rust"),
+        _created(2, "just python"),
+        _created(3, "go"),
+    ]
+
+    with patch("bsky_feed_generator.server.data_filter.writer") as writer:
+        operations_callback(ops)
+
+    creates, _ = writer.add.call_args.args
+    assert [(p["feed"], p["cid"]) for p in creates] == [
+        ("python", "cid1"),
+        ("rust", "cid1"),
+        ("python", "cid2"),
+    ]
+
+
+def test_prefilter_records_matched_feeds(two_feeds):
+    ops = defaultdict(lambda: defaultdict(list))
+    ops[models.ids.AppBskyFeedPost]["created"] += [
+        _created(1, "rust"),
+        _created(2, "go"),
+    ]
+
+    created = prefilter_ops(ops)[models.ids.AppBskyFeedPost]["created"]
+
+    assert [(p["cid"], p["feeds"]) for p in created] == [("cid1", ["rust"])]
+
+
+def test_feeds_are_served_from_their_own_partition(two_feeds):
+    writer = PostWriter(max_batch=100, max_delay=60)
+    shared = "at://did:plc:a/app.bsky.feed.post/1"
+    writer.add(
+        [
+            {"feed": "python", "uri": shared, "cid": "cid1"},
+            {"feed": "rust", "uri": shared, "cid": "cid1"},
+            {"feed": "rust", "uri": "at://did:plc:a/app.bsky.feed.post/2", "cid": "c2"},
+        ],
+        [],
+    )
+    writer.flush()
+
+    python_page = feed.handler(None, 10, feed="python")
+    assert [item["post"] for item in python_page["feed"]] == [shared]
+    assert len(feed.handler(None, 10, feed="rust")["feed"]) == 2
+
+    writer.add([], [shared])
+    writer.flush()
+
+    assert feed.handler(None, 10, feed="python")["feed"] == []
+    assert len(feed.handler(None, 10, feed="rust")["feed"]) == 1
@@ -0,0 +1,132 @@
+import datetime
+
+import pytest
+from atproto_client import models
+from pydantic import ValidationError
+
+from bsky_feed_generator.server import config, data_filter
+from bsky_feed_generator.server.filter_spec import ArchiveCutoff, FilterSpec
+
+
+def _post(text: str, author: str = "did:plc:a", langs=None, reply=False, days_old=0):
+    reply_ref = None
+    if reply:
+        ref = models.ComAtprotoRepoStrongRef.Main(uri="at://root", cid="cid")
+        reply_ref = models.AppBskyFeedPost.ReplyRef(root=ref, parent=ref)
+    created_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        days=days_old
+    )
+    record = models.AppBskyFeedPost.Record(
+        text=text, created_at=created_at.isoformat(), langs=langs, reply=reply_ref
+    )
+    return {"uri": "at://post", "cid": "cid", "author": author, "record": record}
+
+
+def test_keywords_match_whole_words_ignoring_case():
+    matches = FilterSpec(keywords=["rust", "c++"]).compile()
+
+    assert matches(_post("Learning RUST today"))
+    assert matches(_post("modern C++ is fine"))
+    assert not matches(_post("trusty old tools"))
+
+
+def test_patterns_and_excludes():
+    matches = FilterSpec(
+        patterns=[r"\bv\d+\.\d+\b"],
+        exclude_keywords=["beta"],
+        exclude_patterns=["rc\\d"],
+    ).compile()
+
+    assert matches(_post("released v1.2"))
+    assert not matches(_post("released v1.2 beta"))
+    assert not matches(_post("v1.2rc1 is out"))
+    assert not matches(_post("no version here"))
+
+
+def test_patterns_with_global_flags_or_backreferences_keep_their_meaning():
+    matches = FilterSpec(
+        keywords=["rust"], patterns=["(?i)python", r"(a)\1", r"(b)\1", "zig"]
+    ).compile()
+
+    assert matches(_post("PYTHON"))
+    assert matches(_post("aa")) and matches(_post("bb"))
+    assert matches(_post("Rust")) and matches(_post("zig"))
+    assert not matches(_post("ab and ba, no snakes"))
+
+    excludes = FilterSpec(exclude_patterns=["(?i)spam", r"(x)\1"]).compile()
+    assert not excludes(_post("SPAM")) and not excludes(_post("xx"))
+    assert excludes(_post("fine"))
+
+
+def test_invalid_patterns_fail_when_the_spec_loads():
+    with pytest.raises(ValidationError, match="invalid pattern 'unclosed\\('"):
+        FilterSpec(patterns=["ok", "unclosed("])
+    with pytest.raises(ValidationError, match="invalid pattern"):
+        FilterSpec(exclude_patterns=["fine(?i)late flags"])
+
+
+def test_langs_authors_replies_and_archived():
+    matches = FilterSpec(
+        langs=["en"],
+        exclude_authors=["did:plc:spam"],
+        ignore_replies=True,
+        ignore_archived=True,
+    ).compile()
+
+    assert matches(_post("hi", langs=["en-US"]))
+    assert not matches(_post("hallo", langs=["de"]))
+    assert not matches(_post("hi", langs=None))
+    assert not matches(_post("hi", langs=["en"], author="did:plc:spam"))
+    assert not matches(_post("hi", langs=["en"], reply=True))
+    assert not matches(_post("hi", langs=["en"], days_old=2))
+
+    only = FilterSpec(authors=["did:plc:a"]).compile()
+    assert only(_post("x")) and not only(_post("x", author="did:plc:b"))
+
+
+def test_spec_alone_includes_posts_and_custom_function_runs_last(monkeypatch):
+    monkeypatch.setattr(config.settings, "FILTER_SPEC", FilterSpec(keywords=["python"]))
+    monkeypatch.setattr(config.settings, "CUSTOM_FILTER_FUNCTION", None)
+
+    assert data_filter.matching_feeds_batch(
+        [_post("I like python"), _post("I like snakes")]
+    ) == [[""], []]
+
+    calls = []
+
+    def custom(record, created_post):
+        calls.append(record.text)
+        return "3.13" in record.text
+
+    monkeypatch.setattr(config.settings, "CUSTOM_FILTER_FUNCTION", custom)
+
+    posts = [_post("python 3.13"), _post("python 2"), _post("snakes 3.13")]
+    assert data_filter.matching_feeds_batch(posts) == [[""], [], []]
+    assert calls == ["python 3.13", "python 2"]
+
+
+def test_archive_cutoff_compares_dates_without_parsing_them():
+    cutoff = ArchiveCutoff(datetime.timedelta(days=1))
+    now = datetime.datetime.now(datetime.timezone.utc)
+    old = now - datetime.timedelta(days=2)
+
+    assert cutoff(old.isoformat())
+    assert cutoff(old.strftime("%Y-%m-%dT%H:%M:%S.%fZ"))
+    assert not cutoff(now.isoformat())
+    assert not cutoff(now.strftime("%Y-%m-%dT%H:%M:%SZ"))
+    # other offsets and naive datetimes (taken as UTC) are parsed
+    east = datetime.timezone(datetime.timedelta(hours=14))
+    assert not cutoff((now - datetime.timedelta(hours=20)).astimezone(east).isoformat())
+    assert cutoff((now - datetime.timedelta(hours=25)).astimezone(east).isoformat())
+    assert cutoff(old.replace(tzinfo=None).isoformat())
+    # malformed dates are never archived
+    for malformed in ("", "yesterday", "2024-13-45T99:99:99", None, 1700000000):
+        assert not cutoff(malformed)
+
+
+def test_select_matches_calling_the_filter_per_post():
+    matches = FilterSpec(keywords=["hi"], ignore_archived=True).compile()
+    posts = [_post("hi"), _post("hi", days_old=2), _post("bye"), _post("hi there")]
+
+    assert matches.select(posts) == [i for i, p in enumerate(posts) if matches(p)]
+    assert matches.select(posts) == [0, 3]
@@ -1,5 +1,6 @@
 import datetime
 import logging
+import random
 from collections import defaultdict
 from unittest.mock import patch
 
@@ -7,10 +8,20 @@ import pytest
 from atproto_client import models
 
 from bsky_feed_generator.server import config
-from bsky_feed_generator.server.data_filter import operations_callback
+from bsky_feed_generator.server.data_filter import (
+    matching_feeds_batch,
+    operations_callback,
+    prefilter_ops,
+)
 from example_custom_filters import (  # type: ignore
     spongebob_filter as example_spongebob_filter,
 )
+from example_custom_filters import (  # type: ignore
+    spongebob_filter_batch as example_spongebob_filter_batch,
+)
+from example_custom_filters import (  # type: ignore
+    spongebob_filter_regex as example_spongebob_filter_regex,
+)
 
 
 # Helper to create mock post data
@@ -50,18 +61,15 @@ def _create_mock_post(
 
 @pytest.fixture
 def mock_db_operations():
-    with (
-        patch("src.bsky_feed_generator.server.data_filter.Post.create") as mock_create,
-        patch("src.bsky_feed_generator.server.data_filter.Post.delete") as mock_delete,
-    ):
-        yield mock_create, mock_delete
+    with patch("bsky_feed_generator.server.data_filter.writer") as mock_writer:
+        yield mock_writer.add, mock_writer
 
 
 # --- Tests for Spongebob filter via CUSTOM_FILTER_FUNCTION ---
 def test_custom_spongebob_filter_positive_case(monkeypatch, mock_db_operations, caplog):
     mock_create, _ = mock_db_operations
     monkeypatch.setattr(
-        "src.bsky_feed_generator.server.data_filter.settings",
+        "bsky_feed_generator.server.data_filter.settings",
         config.Settings(
             CUSTOM_FILTER_FUNCTION=example_spongebob_filter,
             IGNORE_ARCHIVED_POSTS=False,
@@ -86,7 +94,7 @@ def test_custom_spongebob_filter_negative_case(  # Renamed for clarity
 ):
     mock_create, _ = mock_db_operations
     monkeypatch.setattr(
-        "src.bsky_feed_generator.server.data_filter.settings",
+        "bsky_feed_generator.server.data_filter.settings",
         config.Settings(
             CUSTOM_FILTER_FUNCTION=example_spongebob_filter,
             IGNORE_ARCHIVED_POSTS=False,
@@ -109,7 +117,7 @@ def test_custom_spongebob_filter_negative_case(  # Renamed for clarity
 def test_no_custom_filter_configured(monkeypatch, mock_db_operations):
     mock_create, _ = mock_db_operations
     monkeypatch.setattr(
-        "src.bsky_feed_generator.server.data_filter.settings",
+        "bsky_feed_generator.server.data_filter.settings",
         config.Settings(
             CUSTOM_FILTER_FUNCTION=None,
             IGNORE_ARCHIVED_POSTS=False,
@@ -234,6 +242,126 @@ def test_invalid_custom_filter_path(monkeypatch, mock_db_operations, caplog):
     assert "No CUSTOM_FILTER_FUNCTION configured" in caplog.text
 
 
+def test_prefilter_ops_keeps_only_passing_posts_and_deletes(monkeypatch):
+    monkeypatch.setattr(
+        config.settings, "CUSTOM_FILTER_FUNCTION", example_spongebob_filter
+    )
+    monkeypatch.setattr(config.settings, "IGNORE_ARCHIVED_POSTS", False)
+    monkeypatch.setattr(config.settings, "IGNORE_REPLY_POSTS", False)
+
+    ops = defaultdict(lambda: defaultdict(list))
+    ops[models.ids.AppBskyFeedPost]["created"].append(_create_mock_post("tEsTiNg"))
+    ops[models.ids.AppBskyFeedPost]["created"].append(_create_mock_post("normal"))
+    ops[models.ids.AppBskyFeedPost]["deleted"].append({"uri": "at://deleted"})
+    ops[models.ids.AppBskyFeedLike]["created"].append({"uri": "at://like"})
+
+    reduced = prefilter_ops(ops)
+
+    assert list(reduced) == [models.ids.AppBskyFeedPost]
+    posts = reduced[models.ids.AppBskyFeedPost]
+    assert [p["record"].text for p in posts["created"]] == ["tEsTiNg"]
+    assert posts["deleted"] == [{"uri": "at://deleted"}]
+
+    ops[models.ids.AppBskyFeedPost]["created"].pop(0)
+    ops[models.ids.AppBskyFeedPost]["deleted"].clear()
+    assert prefilter_ops(ops) == {}
+
+
+def test_spongebob_filter_batch_matches_scalar_filter():
+    posts = [
+        _create_mock_post(text)
+        for text in [
+            "tEsTiNg",
+            "normal text",
+            "",
+            "macro:sPoNgEbObTeXt",
+            "http://example.com/aBcDeFgHi only a link",
+            "line one\nwith aLtErNaTeS on line two",
+            "aBcDeF",
+            "AaAaAaA",
+        ]
+    ]
+    records = [post["record"] for post in posts]
+
+    assert example_spongebob_filter_batch(records, posts) == [
+        example_spongebob_filter(post["record"], post) for post in posts
+    ]
+
+
+def test_spongebob_filter_regex_matches_scalar_filter():
+    # fragments that straddle the filter's edge cases: case runs, URLs,
+    # hashtags, digits and punctuation inside runs, and the macro: prefix
+    fragments = [
+        "aB",
+        "Cd",
+        "eF",
+        "g",
+        "H",
+        "xYz",
+        " ",
+        "\n",
+        "1",
+        ",",
+        "#",
+        "#tag",
+        "http://",
+        "https://x.co/",
+        "www.",
+        ".com/",
+        "macro:",
+        "MACRO:",
+        "é",
+        "🦋",
+    ]
+    rng = random.Random(0)
+    for _ in range(5000):
+        text = "".join(rng.choices(fragments, k=rng.randint(0, 12)))
+        post = _create_mock_post(text)
+        assert example_spongebob_filter_regex(
+            post["record"], post
+        ) == example_spongebob_filter(post["record"], post), repr(text)
+
+
+def test_batch_filter_is_called_once_per_batch(monkeypatch):
+    calls = []
+
+    def scalar(record, created_post):
+        raise AssertionError("the per-post filter should not be called")
+
+    def batch(records, created_posts):
+        calls.append(len(records))
+        return ["keep" in record.text for record in records]
+
+    scalar.filter_batch = batch
+    monkeypatch.setattr(config.settings, "CUSTOM_FILTER_FUNCTION", scalar)
+    monkeypatch.setattr(config.settings, "IGNORE_ARCHIVED_POSTS", False)
+    monkeypatch.setattr(config.settings, "IGNORE_REPLY_POSTS", False)
+
+    posts = [_create_mock_post(text) for text in ["keep 1", "drop", "keep 2"]]
+
+    assert matching_feeds_batch(posts) == [[""], [], [""]]
+    assert calls == [3]
+
+
+def test_failing_batch_filter_falls_back_to_per_post(monkeypatch, caplog):
+    def scalar(record, created_post):
+        return "keep" in record.text
+
+    def batch(records, created_posts):
+        raise RuntimeError("Intentional batch error")
+
+    scalar.filter_batch = batch
+    monkeypatch.setattr(config.settings, "CUSTOM_FILTER_FUNCTION", scalar)
+    monkeypatch.setattr(config.settings, "IGNORE_ARCHIVED_POSTS", False)
+    monkeypatch.setattr(config.settings, "IGNORE_REPLY_POSTS", False)
+    caplog.set_level(logging.ERROR, logger="bsky_feed_generator.server.data_filter")
+
+    posts = [_create_mock_post(text) for text in ["keep", "drop"]]
+
+    assert matching_feeds_batch(posts) == [[""], []]
+    assert "Error executing batch filter scalar" in caplog.text
+
+
 # Example of how you might test deleted posts (if logic becomes more complex)
 # def test_deleted_posts_are_removed(mock_db_operations):
 #     _, mock_delete = mock_db_operations
@@ -0,0 +1,114 @@
+from datetime import datetime, timezone
+
+import pytest
+from atproto import models, parse_subscribe_repos_message
+
+from bsky_feed_generator.server.data_stream import _get_ops_by_type
+from bsky_feed_generator.server.frame_log import (
+    SegmentRecorder,
+    decode_frame,
+    encode_frame,
+    read_frame_log,
+    read_recording,
+    write_frame_log,
+)
+from bsky_feed_generator.server.synthetic_frames import synthetic_frames
+
+
+def test_synthetic_frames_decode_like_relay_frames():
+    created = deleted = 0
+    for seq, data in synthetic_frames(500, start_seq=10):
+        frame = decode_frame(data)
+        assert frame.type == "#commit"
+        assert frame.body["seq"] == seq
+
+        ops = _get_ops_by_type(parse_subscribe_repos_message(frame))
+        posts = ops[models.ids.AppBskyFeedPost]
+        created += len(posts["created"])
+        deleted += len(posts["deleted"])
+        for post in posts["created"]:
+            assert post["uri"].startswith(f"at://{frame.body['repo']}/")
+            assert post["record"].text
+
+    assert created and deleted
+
+
+def test_synthetic_frames_are_deterministic():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def frames(seed):
+        return list(synthetic_frames(50, seed=seed, start=start))
+
+    assert frames(1) == frames(1)
+    assert frames(1) != frames(2)
+
+
+def test_frame_log_round_trip(tmp_path):
+    path = tmp_path / "frames.log"
+    frames = list(synthetic_frames(20))
+
+    assert write_frame_log(path, frames[:10]) == 10
+    assert write_frame_log(path, frames[10:]) == 10  # appends
+
+    assert list(read_frame_log(path)) == frames
+    assert [seq for seq, _ in read_frame_log(path, cursor=15)] == [16, 17, 18, 19, 20]
+    assert all(encode_frame(decode_frame(data)) == data for _, data in frames)
+
+
+def test_truncated_frame_log_is_rejected(tmp_path):
+    path = tmp_path / "frames.log"
+    write_frame_log(path, synthetic_frames(2))
+    path.write_bytes(path.read_bytes()[:-5])
+
+    with pytest.raises(ValueError, match="truncated"):
+        list(read_frame_log(path))
+
+
+def test_compressed_frame_log_round_trip(tmp_path):
+    path = tmp_path / "frames.log.gz"
+    frames = list(synthetic_frames(20))
+
+    write_frame_log(path, frames[:10])
+    write_frame_log(path, frames[10:])
+
+    assert list(read_frame_log(path)) == frames
+    assert path.stat().st_size < sum(len(data) for _, data in frames) / 2
+
+
+def test_recording_rotates_segments_and_resumes_after_cursor(tmp_path):
+    frames = list(synthetic_frames(25))
+    with SegmentRecorder(tmp_path, segment_frames=10) as recorder:
+        for seq, data in frames:
+            recorder.write(seq, data)
+    # restarts resume from older cursors and record some frames again
+    for resumed in (15, 20):
+        with SegmentRecorder(tmp_path, segment_frames=10) as recorder:
+            for seq, data in frames[resumed:] + frames[resumed:]:
+                recorder.write(seq, data)
+
+    assert len(list(tmp_path.iterdir())) == 5
+    assert list(read_recording(tmp_path)) == frames
+    assert [seq for seq, _ in read_recording(tmp_path, cursor=22)] == [23, 24, 25]
+
+
+def test_recorder_encodes_decoded_frames_back_to_the_relay_bytes(tmp_path):
+    frames = list(synthetic_frames(30))
+    with SegmentRecorder(tmp_path, segment_frames=20) as recorder:
+        for _, data in frames:
+            recorder.record(decode_frame(data))
+
+    assert recorder.frames == 30 and not recorder.dropped
+    assert list(read_recording(tmp_path)) == frames
+
+
+def test_truncated_segment_is_read_up_to_the_cut(tmp_path, caplog):
+    with SegmentRecorder(tmp_path, segment_frames=20) as recorder:
+        for seq, data in synthetic_frames(30):
+            recorder.write(seq, data)
+    # as if the process died while writing the last segment
+    last = sorted(tmp_path.iterdir())[-1]
+    last.write_bytes(last.read_bytes()[:-100])
+
+    seqs = [seq for seq, _ in read_recording(tmp_path)]
+    assert seqs == list(range(1, len(seqs) + 1)) and 20 <= len(seqs) < 30
+    assert "truncated" in caplog.text
@@ -0,0 +1,187 @@
+import json
+import threading
+from collections import Counter
+
+import pytest
+from atproto import models, parse_subscribe_repos_message
+
+from bsky_feed_generator.server import config, data_stream
+from bsky_feed_generator.server.data_stream import (
+    _decode_jetstream_event,
+    _get_ops_by_type,
+    subscribes,
+)
+from bsky_feed_generator.server.database import SubscriptionState
+from bsky_feed_generator.server.frame_log import decode_frame
+from bsky_feed_generator.server.jetstream import (
+    JetstreamClient,
+    JetstreamEvent,
+    subscribe_uri,
+)
+from bsky_feed_generator.server.relay_simulator import (
+    JetstreamSimulator,
+    jetstream_events,
+    memory_source,
+)
+from bsky_feed_generator.server.synthetic_frames import synthetic_frames
+
+FRAMES = list(synthetic_frames(300))
+EVENTS = list(jetstream_events(FRAMES))
+
+
+def _event(time_us: int, message: str) -> JetstreamEvent:
+    body = json.loads(message)
+    return JetstreamEvent({**body, "seq": time_us, "repo": body["did"]})
+
+
+def _summary(ops) -> dict:
+    return {
+        collection: (
+            [
+                (op["uri"], op["cid"], op["author"], op["record"].model_dump())
+                for op in by_action["created"]
+            ],
+            by_action["deleted"],
+        )
+        for collection, by_action in ops.items()
+    }
+
+
+def test_jetstream_events_decode_to_the_firehose_ops():
+    firehose, jetstream = {}, {}
+    for _, data in FRAMES:
+        ops = _get_ops_by_type(parse_subscribe_repos_message(decode_frame(data)))
+        for collection, summary in _summary(ops).items():
+            firehose.setdefault(collection, []).append(summary)
+    for time_us, message in EVENTS:
+        _, ops = _decode_jetstream_event(_event(time_us, message))
+        for collection, summary in _summary(ops).items():
+            jetstream.setdefault(collection, []).append(summary)
+
+    assert jetstream == firehose
+    assert firehose[models.ids.AppBskyFeedPost]
+
+
+def test_jetstream_events_of_other_collections_are_skipped():
+    collections = frozenset([models.ids.AppBskyFeedPost])
+    decoded = [_decode_jetstream_event(_event(*e), collections) for e in EVENTS]
+
+    assert None in decoded
+    for decoded_event in filter(None, decoded):
+        assert set(decoded_event[1]) <= collections
+
+
+def test_events_sharing_a_time_us_get_increasing_seqs():
+    client = JetstreamClient()
+    event = {"did": "did:plc:a", "kind": "commit", "commit": {}}
+    seqs = [
+        client._event(json.dumps({**event, "time_us": time_us})).body["seq"]  # type: ignore[union-attr]
+        for time_us in (10, 10, 10, 20)
+    ]
+
+    assert seqs == [10, 11, 12, 20]
+    assert client._event(json.dumps({**event, "kind": "identity"})) is None
+
+
+def test_subscribe_uri():
+    uri = subscribe_uri(
+        "ws://jetstream/subscribe",
+        ["app.bsky.feed.post", "app.bsky.feed.like"],
+        cursor=1725911162329308,
+        compress=True,
+    )
+
+    assert uri == (
+        "ws://jetstream/subscribe?wantedCollections=app.bsky.feed.like"
+        "&wantedCollections=app.bsky.feed.post&cursor=1725911162329308&compress=true"
+    )
+
+
+def test_data_stream_ingests_jetstream_and_resumes_after_disconnects(monkeypatch):
+    expected = Counter()
+    for time_us, message in EVENTS:
+        _, ops = _decode_jetstream_event(_event(time_us, message))
+        expected.update(p["uri"] for p in ops[models.ids.AppBskyFeedPost]["created"])
+    seen = Counter()
+    done = threading.Event()
+
+    @subscribes(models.ids.AppBskyFeedPost)
+    def callback(ops):
+        seen.update(post["uri"] for post in ops[models.ids.AppBskyFeedPost]["created"])
+        if seen.keys() >= expected.keys():
+            done.set()
+
+    stop = threading.Event()
+    monkeypatch.setattr(config.settings, "STREAM_SOURCE", "jetstream")
+    with JetstreamSimulator(memory_source(EVENTS), fault="close", fault_every=20) as js:
+        monkeypatch.setattr(config.settings, "JETSTREAM_URI", js.uri)
+        stream = threading.Thread(
+            target=data_stream.run, args=("jetstream-test", callback, stop)
+        )
+        stream.start()
+        assert done.wait(30)
+        assert js.drained.wait(10)
+        stop.set()
+    stream.join(10)
+
+    assert not stream.is_alive()
+    assert seen == expected  # every post exactly once
+    # only post events were sent, in several connections resuming from the cursor
+    assert js.frames_sent < len(EVENTS)
+    assert js.faults >= 2 and js.cursors[0] is None
+    resumed = js.cursors[1:]
+    assert resumed == sorted(resumed) and all(cursor > 0 for cursor in resumed)
+    # kept apart from the firehose cursor of the same service
+    state = SubscriptionState.get(
+        SubscriptionState.service == "jetstream-test#jetstream"
+    )
+    assert state.cursor >= resumed[-1]
+
+
+def test_client_reconnects_from_the_last_event_received(monkeypatch):
+    monkeypatch.setattr(JetstreamClient, "_reconnect_delay", lambda self: 0)
+    received = []
+    done = threading.Event()
+
+    with JetstreamSimulator(memory_source(EVENTS), fault="error", fault_every=30) as js:
+        client = JetstreamClient(base_uri=js.uri)
+
+        def on_message(event):
+            received.append(event.body["seq"])
+            if len(received) == 65:
+                client.stop()
+                done.set()
+
+        threading.Thread(target=client.start, args=(on_message,), daemon=True).start()
+        assert done.wait(10)
+
+    times = [time_us for time_us, _ in EVENTS]
+    assert js.cursors == [None, times[29], times[58]]
+    # the cursor's event comes again, with a seq the pipeline skips as replayed
+    assert received == times[:30] + times[29:59] + times[58:63]
+
+
+def test_compressed_messages(monkeypatch, tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    samples = [message.encode() for _, message in EVENTS]
+    dictionary = zstandard.train_dictionary(4096, samples * 4).as_bytes()
+    path = tmp_path / "zstd_dictionary"
+    path.write_bytes(dictionary)
+    received = []
+    done = threading.Event()
+
+    with JetstreamSimulator(memory_source(EVENTS[:50]), dictionary=dictionary) as js:
+        monkeypatch.setattr(config.settings, "JETSTREAM_URI", js.uri)
+        monkeypatch.setattr(config.settings, "JETSTREAM_ZSTD_DICTIONARY", str(path))
+        client = data_stream.JetstreamSource().client(None)
+
+        def on_message(event):
+            received.append(event.body["time_us"])
+            if len(received) == 50:
+                client.stop()
+                done.set()
+
+        threading.Thread(target=client.start, args=(on_message,), daemon=True).start()
+        assert done.wait(10)
+
+    assert received == [time_us for time_us, _ in EVENTS[:50]]
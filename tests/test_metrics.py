@@ -0,0 +1,70 @@
+import time
+
+from bsky_feed_generator.server import metrics
+from bsky_feed_generator.server.pipeline import IngestPipeline, commit_time
+
+
+def _registry():
+    registry = metrics.Registry()
+    frames = registry.register(metrics.Counter("frames_total", "Frames", ["result"]))
+    depth = registry.register(metrics.Gauge("depth", "Queue depth"))
+    seconds = registry.register(
+        metrics.Histogram("flush_seconds", "Flushes", buckets=(0.1, 1))
+    )
+    return registry, frames, depth, seconds
+
+
+def test_render_prometheus_text():
+    registry, frames, depth, seconds = _registry()
+    frames.labels("queued").inc(3)
+    frames.labels('say "hi"').inc()
+    depth.set_function(lambda: 7)
+    for value in (0.05, 0.5, 0.5, 5):
+        seconds.observe(value)
+
+    assert registry.render().splitlines() == [
+        "# HELP frames_total Frames",
+        "# TYPE frames_total counter",
+        'frames_total{result="queued"} 3.0',
+        'frames_total{result="say \\"hi\\""} 1.0',
+        "# HELP depth Queue depth",
+        "# TYPE depth gauge",
+        "depth 7",
+        "# HELP flush_seconds Flushes",
+        "# TYPE flush_seconds histogram",
+        'flush_seconds_bucket{le="0.1"} 1',
+        'flush_seconds_bucket{le="1"} 3',
+        'flush_seconds_bucket{le="+Inf"} 4',
+        "flush_seconds_sum 6.05",
+        "flush_seconds_count 4",
+    ]
+
+
+def test_drained_counts_merge_into_another_registry():
+    worker, frames, depth, seconds = _registry()
+    main, main_frames, main_depth, main_seconds = _registry()
+    main_frames.labels("queued").inc()
+    frames.labels("queued").inc(2)
+    depth.set(5)
+    seconds.observe(0.5)
+
+    main.merge(worker.drain())
+
+    assert main_frames.labels("queued").value == 3
+    assert main_depth.value == 0  # gauges stay with their process
+    assert main_seconds.labels().snapshot() == ([0, 1, 0], 0.5)
+    assert worker.drain() == []
+
+
+def test_commit_time_and_pipeline_lag():
+    assert commit_time({"time": "2024-01-01T00:00:00.000Z"}) == 1704067200
+    assert commit_time({"time_us": 1704067200_500000}) == 1704067200.5
+    assert commit_time({"time": "not a time"}) is None
+
+    pipeline = IngestPipeline(lambda frames: None, workers=1, queue_size=10)
+    assert pipeline.lag_seconds is None
+    frame = type("Frame", (), {"type": "#commit"})()
+    frame.body = {"seq": 1, "repo": "did:plc:a", "time_us": (time.time() - 30) * 1e6}
+    pipeline.submit(frame)
+
+    assert 30 <= pipeline.lag_seconds < 60
@@ -0,0 +1,158 @@
+import threading
+
+from atproto import firehose_models
+
+from bsky_feed_generator.server.pipeline import (
+    CatchUpMonitor,
+    CursorCheckpointer,
+    IngestPipeline,
+    SeqTracker,
+)
+
+
+def _frame(seq: int, repo: str = "did:plc:a", type_: str = "#commit"):
+    return firehose_models.MessageFrame(
+        header=firehose_models.MessageFrameHeader(t=type_),
+        body={"seq": seq, "repo": repo},
+    )
+
+
+def test_watermark_waits_for_earlier_seqs():
+    tracker = SeqTracker()
+    for seq in (1, 2, 3):
+        tracker.start(seq)
+
+    assert tracker.finish(2) is None
+    assert tracker.finish(3) is None
+    assert tracker.finish(1) == 3
+    assert tracker.in_flight == 0
+
+
+def test_pipeline_preserves_per_repo_order():
+    seen: dict[str, list[int]] = {}
+    lock = threading.Lock()
+
+    def handle(frames):
+        with lock:
+            for frame in frames:
+                seen.setdefault(frame.body["repo"], []).append(frame.body["seq"])
+
+    pipeline = IngestPipeline(handle, workers=3, queue_size=10, batch_size=4)
+    pipeline.start()
+    for seq in range(1, 61):
+        pipeline.submit(_frame(seq, repo=f"did:plc:{seq % 4}"))
+    pipeline.stop()
+
+    assert sum(len(seqs) for seqs in seen.values()) == 60
+    assert all(seqs == sorted(seqs) for seqs in seen.values())
+    assert pipeline.tracker.watermark == 60
+
+
+def test_pipeline_skips_replayed_and_non_commit_frames():
+    handled = []
+    pipeline = IngestPipeline(
+        lambda fs: handled.extend(f.body["seq"] for f in fs), 1, 10
+    )
+    pipeline.start()
+
+    assert pipeline.submit(_frame(5))
+    assert not pipeline.submit(_frame(5))
+    assert not pipeline.submit(_frame(4))
+    assert not pipeline.submit(_frame(6, type_="#identity"))
+    pipeline.stop()
+
+    assert handled == [5]
+
+
+def test_drop_backpressure_releases_seq():
+    release = threading.Event()
+    pipeline = IngestPipeline(lambda fs: release.wait(), 1, 1, backpressure="drop")
+    pipeline.start()
+
+    pipeline.submit(_frame(1))  # picked up by the worker, which then blocks
+    while pipeline.queue_depth:
+        pass
+    assert pipeline.submit(_frame(2))  # fills the lane
+    assert not pipeline.submit(_frame(3))  # dropped
+    release.set()
+    pipeline.stop()
+
+    assert pipeline.dropped == 1
+    assert pipeline.tracker.watermark == 3
+
+
+def test_handler_errors_do_not_stall_the_cursor():
+    def handle(frames):
+        raise RuntimeError("boom")
+
+    pipeline = IngestPipeline(handle, 2, 10)
+    pipeline.start()
+    for seq in (1, 2, 3):
+        pipeline.submit(_frame(seq, repo=f"did:plc:{seq}"))
+    pipeline.stop()
+
+    assert pipeline.tracker.watermark == 3
+
+
+def test_checkpointer_saves_watermark_by_count_and_time():
+    tracker = SeqTracker()
+    saved = []
+    checkpointer = CursorCheckpointer(
+        tracker, saved.append, every_events=3, every_seconds=3600, saved=10
+    )
+    for seq in (11, 12, 13, 14):
+        tracker.start(seq)
+
+    tracker.finish(11)
+    checkpointer.tick()
+    checkpointer.tick()
+    assert saved == []
+
+    tracker.finish(13)  # 12 is still in flight
+    checkpointer.tick()
+    assert saved == [11]
+
+    tracker.finish(12)
+    checkpointer.every_seconds = 0
+    checkpointer.tick()
+    checkpointer.tick()  # nothing new finished: not saved again
+    assert saved == [11, 13]
+
+
+def test_skipped_frames_are_done_without_being_handled():
+    handled = []
+    pipeline = IngestPipeline(
+        lambda fs: handled.extend(f.body["seq"] for f in fs), 1, 10
+    )
+    pipeline.skip = lambda frame: frame.body["seq"] % 2 == 0
+    pipeline.start()
+    for seq in (1, 2, 3, 4):
+        pipeline.submit(_frame(seq))
+    pipeline.stop()
+
+    assert handled == [1, 3]
+    assert pipeline.tracker.watermark == 4
+
+
+def test_catch_up_mode_switches_with_hysteresis():
+    class Pipeline:
+        lag_seconds = None
+
+    pipeline = Pipeline()
+    changes = []
+    monitor = CatchUpMonitor(
+        pipeline,  # type: ignore[arg-type]
+        lambda active, lag: changes.append((active, lag)),
+        enter_lag=60,
+        exit_lag=10,
+    )
+    for lag in (None, 5, 61, 30, 70, 11, 9, 30, 59):
+        pipeline.lag_seconds = lag
+        monitor.check()
+
+    assert changes == [(True, 61), (False, 9)]
+
+    pipeline.lag_seconds = 100
+    assert monitor.check()
+    monitor.stop()  # leaves catch-up mode
+    assert changes[-1] == (False, None) and not monitor.active
@@ -0,0 +1,105 @@
+import pickle
+from collections import defaultdict
+
+from atproto import models
+
+from bsky_feed_generator.server import config
+from bsky_feed_generator.server.data_stream import _add_created, _empty_ops
+from bsky_feed_generator.server.filter_spec import FilterSpec
+from bsky_feed_generator.server.records import PostView
+
+POST = models.ids.AppBskyFeedPost
+_REF = {
+    "uri": "at://did:plc:a/app.bsky.feed.post/3k",
+    "cid": "bafyreib2rxk3rybk3aobmv5cjuql3bm2twh4jo5uxgf5y5ndi7spxhvsc4",
+}
+RAW = {
+    "$type": POST,
+    "text": "Python #tips",
+    "createdAt": "2024-01-01T00:00:00.000Z",
+    "langs": ["en-US"],
+    "reply": {"root": _REF, "parent": _REF},
+    "facets": [
+        {
+            "index": {"byteStart": 7, "byteEnd": 12},
+            "features": [{"$type": "app.bsky.richtext.facet#tag", "tag": "tips"}],
+        }
+    ],
+    "embed": {
+        "$type": "app.bsky.embed.external",
+        "external": {"uri": "https://example.com", "title": "t", "description": "d"},
+    },
+}
+
+
+def test_view_reads_like_the_model():
+    view = PostView.parse(RAW)
+    model = models.get_or_create(RAW, strict=False)
+
+    assert view is not None and view._model is None
+    assert (view.text, view.created_at, view.langs) == (
+        model.text,
+        model.created_at,
+        model.langs,
+    )
+    assert view.reply.root.uri == model.reply.root.uri
+    assert view.reply.parent.cid == model.reply.parent.cid
+    facet = view.facets[0]
+    assert facet.index.byte_start == model.facets[0].index.byte_start == 7
+    assert facet.features[0].tag == model.facets[0].features[0].tag == "tips"
+    assert view._model is None
+
+    # anything else comes from the model, built on first use
+    assert view.embed.external.uri == "https://example.com"
+    assert view._model == model
+
+
+def test_records_the_view_cannot_represent_are_rejected():
+    assert PostView.parse({**RAW, "$type": models.ids.AppBskyFeedLike}) is None
+    assert PostView.parse({**RAW, "text": None}) is None
+    assert PostView.parse({**RAW, "reply": {"root": _REF}}) is None
+    assert PostView.parse({k: v for k, v in RAW.items() if k != "reply"}).reply is None
+
+
+def test_view_pickles_as_its_record():
+    view = PostView.parse(RAW)
+    view.embed  # noqa: B018 - builds the model, which is not sent along
+
+    copy = pickle.loads(pickle.dumps(view))
+
+    assert copy._model is None
+    assert (copy.text, copy.reply, copy.facets) == (view.text, view.reply, view.facets)
+
+
+def test_filters_treat_views_and_models_alike():
+    records = [
+        RAW,
+        {**RAW, "reply": None, "langs": ["de"]},
+        {**RAW, "reply": None, "text": "nothing here"},
+        {**RAW, "createdAt": "2999-01-01T00:00:00+00:00"},
+    ]
+    compiled = FilterSpec(keywords=["python"], langs=["en"], ignore_replies=True)
+    compiled = compiled.compile()
+    for raw in records:
+        view = {"record": PostView.parse(raw), "author": "did:plc:a"}
+        model = {
+            "record": models.get_or_create(raw, strict=False),
+            "author": "did:plc:a",
+        }
+        assert compiled(view) == compiled(model)
+
+
+def test_add_created_falls_back_to_the_model(monkeypatch):
+    ops = defaultdict(_empty_ops)
+    info = {"uri": "at://did:plc:a/app.bsky.feed.post/1", "cid": "c", "author": "a"}
+
+    _add_created(ops, POST, RAW, info)
+    # a post the view cannot represent goes through the model as before
+    _add_created(ops, POST, {**RAW, "reply": "nope"}, info)
+    monkeypatch.setattr(config.settings, "STREAM_LAZY_RECORDS", False)
+    _add_created(ops, POST, RAW, info)
+
+    view, *rest = (op["record"] for op in ops[POST]["created"])
+    assert isinstance(view, PostView)
+    assert len(rest) == 2
+    assert not any(isinstance(record, PostView) for record in rest)
@@ -0,0 +1,115 @@
+import threading
+from collections import Counter
+
+import pytest
+from atproto import FirehoseSubscribeReposClient, models, parse_subscribe_repos_message
+from websockets.exceptions import InvalidStatus
+from websockets.sync.client import connect
+
+from bsky_feed_generator.server import config, data_stream
+from bsky_feed_generator.server.data_stream import _get_ops_by_type, subscribes
+from bsky_feed_generator.server.frame_log import decode_frame
+from bsky_feed_generator.server.relay_simulator import RelaySimulator, memory_source
+from bsky_feed_generator.server.synthetic_frames import synthetic_frames
+
+FRAMES = list(synthetic_frames(300))
+
+
+def _post_uris(frames) -> Counter:
+    uris = Counter()
+    for _, data in frames:
+        ops = _get_ops_by_type(parse_subscribe_repos_message(decode_frame(data)))
+        uris.update(post["uri"] for post in ops[models.ids.AppBskyFeedPost]["created"])
+    return uris
+
+
+def test_serves_frames_after_the_cursor():
+    seqs = []
+    with RelaySimulator(memory_source(FRAMES)) as relay:
+        client = FirehoseSubscribeReposClient(
+            models.ComAtprotoSyncSubscribeRepos.Params(cursor=250), base_uri=relay.uri
+        )
+
+        def on_message(message):
+            seqs.append(message.body["seq"])
+            if message.body["seq"] == 300:
+                client.stop()
+
+        client.start(on_message)
+
+    assert seqs == list(range(251, 301))
+    assert relay.cursors == [250]
+
+
+def test_unknown_path_is_not_found():
+    with RelaySimulator(memory_source(FRAMES)) as relay:
+        with pytest.raises(InvalidStatus):
+            connect(f"ws://127.0.0.1:{relay.port}/xrpc/com.atproto.sync.other")
+
+
+def test_data_stream_resumes_from_its_cursor_after_disconnects(monkeypatch):
+    expected = _post_uris(FRAMES)
+    seen = Counter()
+    done = threading.Event()
+
+    @subscribes(models.ids.AppBskyFeedPost)
+    def callback(ops):
+        seen.update(post["uri"] for post in ops[models.ids.AppBskyFeedPost]["created"])
+        if seen.keys() >= expected.keys():
+            done.set()
+
+    stop = threading.Event()
+    with RelaySimulator(memory_source(FRAMES), fault="close", fault_every=100) as relay:
+        monkeypatch.setattr(config.settings, "FIREHOSE_URI", relay.uri)
+        stream = threading.Thread(
+            target=data_stream.run, args=("relay-simulator-test", callback, stop)
+        )
+        stream.start()
+        assert done.wait(30)
+        # stop the relay while the stream is subscribed, not reconnecting
+        assert relay.drained.wait(10)
+        stop.set()
+    stream.join(10)
+
+    assert not stream.is_alive()
+    assert seen == expected  # every post exactly once
+    assert relay.faults >= 3
+    assert relay.cursors[0] is None
+    resumed = relay.cursors[1:]
+    assert resumed == sorted(resumed) and all(cursor > 0 for cursor in resumed)
+
+
+def test_recorded_stream_replays_to_the_same_posts(monkeypatch, tmp_path):
+    expected = _post_uris(FRAMES)
+    live, replayed = Counter(), Counter()
+    done = threading.Event()
+
+    def collect(seen):
+        @subscribes(models.ids.AppBskyFeedPost)
+        def callback(ops):
+            created = ops[models.ids.AppBskyFeedPost]["created"]
+            seen.update(post["uri"] for post in created)
+            if seen.keys() >= expected.keys():
+                done.set()
+
+        return callback
+
+    stop = threading.Event()
+    monkeypatch.setattr(config.settings, "FIREHOSE_RECORD_DIR", str(tmp_path))
+    monkeypatch.setattr(config.settings, "FIREHOSE_RECORD_SEGMENT_FRAMES", 100)
+    with RelaySimulator(memory_source(FRAMES), fault="close", fault_every=120) as relay:
+        monkeypatch.setattr(config.settings, "FIREHOSE_URI", relay.uri)
+        stream = threading.Thread(
+            target=data_stream.run, args=("recording-test", collect(live), stop)
+        )
+        stream.start()
+        assert done.wait(30)
+        assert relay.drained.wait(10)
+        stop.set()
+    stream.join(10)
+    monkeypatch.setattr(config.settings, "FIREHOSE_RECORD_DIR", None)
+
+    assert len(list(tmp_path.iterdir())) >= 3
+    # frames after the last post may arrive after the stop and go unrecorded
+    assert 200 < data_stream.replay(tmp_path, collect(replayed)) <= len(FRAMES)
+    assert replayed == live == expected
@@ -0,0 +1,59 @@
+from bsky_feed_generator.server.database import Post
+from bsky_feed_generator.server.hot_feed import hot_feeds
+from bsky_feed_generator.server.response_cache import ResponseCache, response_cache
+from bsky_feed_generator.server.writer import PostWriter
+
+FEED = "x"
+
+
+def test_hits_misses_and_lru_eviction_by_size():
+    cache = ResponseCache(max_bytes=10)
+    cache.put((FEED, None, 20), 0, b"aaaa")
+    cache.put((FEED, "c1", 20), 0, b"bbbb")
+    assert cache.get((FEED, None, 20)) == b"aaaa"  # now most recently used
+
+    cache.put((FEED, "c2", 20), 0, b"cccc")
+
+    assert cache.get((FEED, "c1", 20)) is None
+    assert cache.get((FEED, None, 20)) == b"aaaa"
+    assert cache.stats() == {
+        "epoch": 0,
+        "entries": 2,
+        "bytes": 8,
+        "hits": 2,
+        "misses": 1,
+    }
+
+
+def test_bump_invalidates_one_feed_and_rejects_stale_bodies():
+    cache = ResponseCache(max_bytes=100)
+    generation = cache.generation(FEED)
+    cache.put((FEED, None, 20), generation, b"old")
+    cache.put(("other", None, 20), cache.generation("other"), b"other")
+
+    cache.bump(FEED)
+    cache.put((FEED, "c1", 20), generation, b"built before the bump")
+
+    assert cache.get((FEED, None, 20)) is None
+    assert cache.get((FEED, "c1", 20)) is None
+    assert cache.get(("other", None, 20)) == b"other"
+
+    cache.bump()
+    assert cache.get(("other", None, 20)) is None
+
+
+def test_writer_bumps_generation_only_when_posts_change():
+    Post.delete().execute()
+    writer = PostWriter(max_batch=100, max_delay=60)
+    uri = "at://did:plc:test/app.bsky.feed.post/1"
+    before = response_cache.generation(FEED), response_cache.generation("")
+
+    writer.add([{"feed": FEED, "uri": uri, "cid": "cid1"}], [])
+    writer.flush()
+    writer.add([{"feed": FEED, "uri": uri, "cid": "cid1"}], [])  # replay: no insert
+    writer.flush()
+
+    after = response_cache.generation(FEED), response_cache.generation("")
+    assert after == (before[0] + 1, before[1])
+    Post.delete().execute()
+    hot_feeds.reset()
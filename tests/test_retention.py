@@ -0,0 +1,89 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bsky_feed_generator.server.config import settings
+from bsky_feed_generator.server.database import Post
+from bsky_feed_generator.server.hot_feed import hot_feeds
+from bsky_feed_generator.server.retention import Retention
+
+
+@pytest.fixture
+def posts():
+    Post.delete().execute()
+    hot_feeds.reset()
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    rows = [
+        {
+            "uri": f"at://did:plc:test/app.bsky.feed.post/{n}",
+            "cid": f"cid{n}",
+            "indexed_at": now - timedelta(hours=n),
+        }
+        for n in range(10)
+    ]
+    Post.insert_many(rows).execute()
+    yield rows  # newest first
+    Post.delete().execute()
+    hot_feeds.reset()
+
+
+def _remaining() -> list[str]:
+    return [p.uri for p in Post.select().order_by(Post.indexed_at.desc())]
+
+
+def test_max_posts_keeps_the_newest_in_small_batches(posts):
+    retention = Retention(max_age=None, max_posts=4, interval=60, batch_size=4)
+
+    assert retention.run_once() == 6
+    assert _remaining() == [row["uri"] for row in posts[:4]]
+    assert retention.run_once() == 0
+    assert retention.stats()["rows_deleted"] == 6
+
+
+def test_max_age_deletes_older_posts_and_updates_hot_feed(posts):
+    assert len(hot_feeds[""].page(None, 10)) == 10  # warm the window
+    retention = Retention(
+        max_age=timedelta(hours=2, minutes=30), max_posts=0, interval=60, batch_size=2
+    )
+
+    assert retention.run_once() == 7
+    assert _remaining() == [row["uri"] for row in posts[:3]]
+    assert [uri for *_, uri in hot_feeds[""].page(None, 10)] == _remaining()
+
+
+def test_disabled_retention_does_nothing(posts):
+    retention = Retention(max_age=None, max_posts=0, interval=60, batch_size=2)
+
+    assert not retention.enabled
+    assert retention.run_once() == 0
+    assert len(_remaining()) == 10
+
+
+def test_every_run_truncates_the_wal(posts):
+    wal = f"{settings.DATABASE_URI}-wal"
+    retention = Retention(max_age=None, max_posts=100, interval=60, batch_size=2)
+    assert os.path.getsize(wal)
+
+    assert retention.run_once() == 0
+    assert os.path.getsize(wal) == 0
+
+
+def test_compaction_runs_with_retention_limits_off(posts):
+    wal = f"{settings.DATABASE_URI}-wal"
+    retention = Retention(
+        max_age=None, max_posts=0, interval=60, batch_size=2, compact_interval=0.01
+    )
+    assert not retention.enabled and os.path.getsize(wal)
+
+    retention.start()
+    try:
+        deadline = time.monotonic() + 5
+        while os.path.getsize(wal) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        retention.stop()
+
+    assert os.path.getsize(wal) == 0
+    assert len(_remaining()) == 10
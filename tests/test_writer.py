@@ -0,0 +1,86 @@
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from bsky_feed_generator.server.database import Post, SubscriptionState
+from bsky_feed_generator.server.hot_feed import hot_feeds
+from bsky_feed_generator.server.writer import PostWriter
+
+
+@pytest.fixture(autouse=True)
+def empty_tables():
+    Post.delete().execute()
+    SubscriptionState.delete().execute()
+    hot_feeds.reset()
+    yield
+    Post.delete().execute()
+    SubscriptionState.delete().execute()
+    hot_feeds.reset()
+
+
+def _post(n: int) -> dict:
+    return {
+        "uri": f"at://did:plc:test/app.bsky.feed.post/{n}",
+        "cid": f"cid{n}",
+        "reply_parent": None,
+        "reply_root": None,
+    }
+
+
+def test_flush_inserts_deletes_and_checkpoints_together():
+    Post.create(**_post(0))
+    writer = PostWriter(max_batch=100, max_delay=60)
+    writer.add([_post(1), _post(2)], [])
+    writer.add([], [_post(0)["uri"], _post(1)["uri"]])
+    writer.checkpoint("did:web:test", 42)
+
+    assert Post.select().count() == 1  # nothing written until flush
+    writer.flush()
+
+    assert [p.uri for p in Post.select()] == [_post(2)["uri"]]
+    assert SubscriptionState.get(service="did:web:test").cursor == 42
+    assert writer.pending == 0
+
+
+def test_failed_flush_keeps_rows_for_retry():
+    writer = PostWriter(max_batch=100, max_delay=60)
+    writer.add([_post(1)], [])
+    writer.checkpoint("did:web:test", 7)
+
+    # the cursor upsert fails after the post insert, inside the same transaction
+    with (
+        patch(
+            "bsky_feed_generator.server.writer._UPSERT_CURSOR_SQL",
+            "INSERT INTO missing_table VALUES (?, ?)",
+        ),
+        pytest.raises(sqlite3.OperationalError),
+    ):
+        writer.flush()
+
+    assert Post.select().count() == 0
+    assert SubscriptionState.get_or_none(service="did:web:test") is None
+    writer.flush()
+    assert Post.select().count() == 1
+    assert SubscriptionState.get(service="did:web:test").cursor == 7
+
+
+def test_background_thread_flushes_on_batch_size_and_stop():
+    writer = PostWriter(max_batch=2, max_delay=60)
+    writer.start()
+    writer.add([_post(1), _post(2)], [])
+    writer.add([_post(3)], [])
+    writer.stop()
+
+    assert Post.select().count() == 3
+
+
+def test_replayed_posts_are_ignored_and_counted_once():
+    writer = PostWriter(max_batch=100, max_delay=60)
+    writer.add([_post(1)], [])
+    writer.flush()
+    writer.add([_post(1), _post(2)], [_post(3)["uri"]])
+    writer.flush()
+
+    assert Post.select().count() == 2
+    assert writer.stats() == {"inserted": 2, "deleted": 0, "flushes": 2, "pending": 0}